@@ -1,4 +1,5 @@
 import pandas as pd
+import numpy as np
 import logging
 import sys
 import os
@@ -6,10 +7,59 @@ import os
 # Add the project root directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+from data.preprocess_data import flatten_quiz_column
+from monitoring.metrics import instrument
+
 logger = logging.getLogger(__name__)
 
+# Aggregates reported per topic and per difficulty level:
+# output column -> (source column, statistic)
+DEFAULT_AGGREGATES = {
+    'average_accuracy': ('accuracy_percentage', 'mean'),
+}
+
+# A richer set that analyze_all can compute in the same pass
+EXTENDED_AGGREGATES = {
+    'average_accuracy': ('accuracy_percentage', 'mean'),
+    'attempts': ('accuracy_percentage', 'count'),
+    'accuracy_std': ('accuracy_percentage', 'std'),
+    'median_speed': ('speed', 'median'),
+}
+
+# Statistics that can be rolled up from per-(topic, difficulty) partials.
+# Anything else (e.g. 'median') is evaluated directly on each dimension.
+MERGEABLE_STATISTICS = {'count', 'sum', 'mean', 'std', 'min', 'max'}
+
+# Column that identifies a student in batched (cohort) mode
+STUDENT_COLUMN = 'user_id'
+
+# Trend bucket sizes, each labelled by its first day (weeks start on Monday)
+TREND_BUCKETS = ('day', 'week', 'month')
+
+# Rolling accuracy windows (days) and the half-life (days) of the exponentially weighted accuracy
+DEFAULT_TREND_WINDOWS = (7, 30)
+DEFAULT_TREND_HALFLIFE = 14
+MAX_TREND_WINDOW = 365
+
+def _with_quiz_columns(historical_quiz_df, columns):
+    """
+    Return a frame that has the flattened quiz columns, flattening only if preprocessing did not.
+    """
+    if all(column in historical_quiz_df.columns for column in columns):
+        return historical_quiz_df
+
+    logger.info("Quiz columns not flattened during preprocessing; flattening now.")
+    flat = flatten_quiz_column(historical_quiz_df)
+    return historical_quiz_df.assign(**{column: flat[column] for column in columns})
+
+def _group_keys(values):
+    """
+    Grouping/sort keys for a partition column. Categoricals already group and sort by
+    their labels, so they are used as-is instead of being expanded into strings.
+    """
+    return values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype(str)
+
+@instrument("analyze_topic_accuracy")
 def analyze_topic_accuracy(historical_quiz_df):
     """
     Analyze topic-wise accuracy from historical quiz data.
@@ -21,11 +71,11 @@ def analyze_topic_accuracy(historical_quiz_df):
         return None
 
     try:
-        # Extract topic data from the 'quiz' column and flatten
-        historical_quiz_df['topic'] = historical_quiz_df['quiz'].apply(lambda x: x.get('topic', 'Unknown') if isinstance(x, dict) else 'Unknown')
+        # Topic is flattened from the 'quiz' column during preprocessing
+        historical_quiz_df = _with_quiz_columns(historical_quiz_df, ['topic'])
         
         # Group by topic and calculate accuracy
-        topic_accuracy = historical_quiz_df.groupby('topic')['accuracy_percentage'].mean().reset_index()
+        topic_accuracy = historical_quiz_df.groupby('topic', observed=True)['accuracy_percentage'].mean().reset_index()
         topic_accuracy.rename(columns={'accuracy_percentage': 'average_accuracy'}, inplace=True)
         topic_accuracy.sort_values(by='average_accuracy', ascending=True, inplace=True)
         
@@ -36,6 +86,7 @@ def analyze_topic_accuracy(historical_quiz_df):
         logger.error(f"Error analyzing topic accuracy: {e}")
         return None
 
+@instrument("analyze_difficulty_performance")
 def analyze_difficulty_performance(historical_quiz_df):
     """
     Analyze performance by difficulty level from historical quiz data.
@@ -47,11 +98,11 @@ def analyze_difficulty_performance(historical_quiz_df):
         return None
 
     try:
-        # Extract difficulty level from the 'quiz' column and flatten
-        historical_quiz_df['difficulty_level'] = historical_quiz_df['quiz'].apply(lambda x: x.get('difficulty_level', 'Unknown') if isinstance(x, dict) else 'Unknown')
+        # Difficulty level is flattened from the 'quiz' column during preprocessing
+        historical_quiz_df = _with_quiz_columns(historical_quiz_df, ['difficulty_level'])
         
         # Group by difficulty level and calculate accuracy
-        difficulty_performance = historical_quiz_df.groupby('difficulty_level')['accuracy_percentage'].mean().reset_index()
+        difficulty_performance = historical_quiz_df.groupby('difficulty_level', observed=True)['accuracy_percentage'].mean().reset_index()
         difficulty_performance.rename(columns={'accuracy_percentage': 'average_accuracy'}, inplace=True)
         difficulty_performance.sort_values(by='average_accuracy', ascending=True, inplace=True)
         
@@ -62,6 +113,41 @@ def analyze_difficulty_performance(historical_quiz_df):
         logger.error(f"Error analyzing difficulty performance: {e}")
         return None
 
+def _cumulative_trend(historical_quiz_df, group_column=None):
+    """
+    Build the chronological trend frame, optionally restarting the cumulative mean per group.
+    The input frame is never modified.
+    """
+    # Chronological order (within each group) without sorting the caller's frame in place
+    submitted_at = pd.to_datetime(historical_quiz_df['submitted_at'])
+    columns = {'submitted_at': submitted_at}
+    sort_keys = ['submitted_at']
+    if group_column is not None:
+        columns = {group_column: _group_keys(historical_quiz_df[group_column]), **columns}
+        sort_keys = [group_column, 'submitted_at']
+    order = pd.DataFrame(columns).reset_index(drop=True).sort_values(
+        by=sort_keys, kind='mergesort').index.to_numpy()
+
+    trend = pd.DataFrame({
+        **{name: values.iloc[order] for name, values in columns.items()},
+        'accuracy_percentage': historical_quiz_df['accuracy_percentage'].iloc[order],
+    })
+
+    # Calculate cumulative accuracy trend (NaN-skipping, like expanding().mean())
+    # float64 so long running sums do not lose precision on float32 inputs
+    accuracy = pd.to_numeric(trend['accuracy_percentage'], errors='coerce').astype('float64')
+    valid = accuracy.notna()
+    if group_column is None:
+        running_sum = accuracy.fillna(0.0).cumsum()
+        running_count = valid.cumsum()
+    else:
+        groups = trend[group_column]
+        running_sum = accuracy.fillna(0.0).groupby(groups, sort=False, observed=True).cumsum()
+        running_count = valid.groupby(groups, sort=False, observed=True).cumsum()
+    trend['cumulative_accuracy'] = (running_sum / running_count).where(running_count > 0)
+    return trend
+
+@instrument("analyze_improvement_trends")
 def analyze_improvement_trends(historical_quiz_df):
     """
     Analyze improvement trends over time from historical quiz data.
@@ -73,37 +159,382 @@ def analyze_improvement_trends(historical_quiz_df):
         return None
 
     try:
-        # Sort data by submission time to ensure correct chronological order
-        historical_quiz_df['submitted_at'] = pd.to_datetime(historical_quiz_df['submitted_at'])
-        historical_quiz_df.sort_values(by='submitted_at', inplace=True)
-        
-        # Calculate cumulative accuracy trend
-        historical_quiz_df['cumulative_accuracy'] = historical_quiz_df['accuracy_percentage'].expanding().mean()
-        
+        trend = _cumulative_trend(historical_quiz_df)
         logger.info("Improvement trend analysis complete.")
-        return historical_quiz_df[['submitted_at', 'accuracy_percentage', 'cumulative_accuracy']]
+        return trend
 
     except Exception as e:
         logger.error(f"Error analyzing improvement trends: {e}")
         return None
 
-def analyze_all(historical_quiz_df):
+def _dated_accuracy(historical_quiz_df):
+    """
+    UTC day and float64 accuracy of every submission that has both, or None if there are none.
+    """
+    submitted_at = pd.to_datetime(historical_quiz_df['submitted_at'], errors='coerce', utc=True)
+    # float64 so long running sums do not lose precision on float32 inputs
+    accuracy = pd.to_numeric(historical_quiz_df['accuracy_percentage'], errors='coerce').astype('float64')
+    valid = submitted_at.notna() & accuracy.notna()
+    if not valid.any():
+        logger.warning("No dated submissions with an accuracy to build trends from.")
+        return None
+    return submitted_at[valid].dt.floor('D'), accuracy[valid]
+
+def _fill_calendar(daily):
+    # A regular calendar lets windows and decay be expressed in rows (= days)
+    calendar = pd.date_range(daily.index.min(), daily.index.max(), freq='D', name='day')
+    return daily.reindex(calendar, fill_value=0)
+
+@instrument("daily_accuracy")
+def daily_accuracy(historical_quiz_df):
+    """
+    Reduce the history to one row per UTC calendar day, the basis of every trend bucket and window.
+    :param historical_quiz_df: pd.DataFrame - Preprocessed historical quiz data.
+    :return: pd.DataFrame - Indexed by day from the first to the latest submission (days without
+        submissions included, with zero attempts); columns accuracy_sum and attempts.
+    """
+    if historical_quiz_df is None or historical_quiz_df.empty:
+        logger.warning("Historical quiz data is empty or None.")
+        return None
+
+    try:
+        dated = _dated_accuracy(historical_quiz_df)
+        if dated is None:
+            return None
+
+        days, accuracy = dated
+        daily = accuracy.groupby(days).agg(['sum', 'count'])
+        daily.columns = ['accuracy_sum', 'attempts']
+        daily = _fill_calendar(daily)
+        logger.info("Daily accuracy aggregation complete.")
+        return daily
+
+    except Exception as e:
+        logger.error(f"Error aggregating daily accuracy: {e}")
+        return None
+
+@instrument("daily_accuracy_by_student")
+def daily_accuracy_by_student(historical_quiz_df):
+    """
+    Per-student daily totals for the whole cohort in one grouped pass. Only days with
+    submissions are stored; student_daily_accuracy() fills in one student's calendar.
+    Submissions without a user_id are left out.
+    :param historical_quiz_df: pd.DataFrame - Preprocessed historical quiz data.
+    :return: pd.DataFrame - Indexed by (user_id as str, day), sorted; columns accuracy_sum and attempts.
+    """
+    if historical_quiz_df is None or historical_quiz_df.empty or STUDENT_COLUMN not in historical_quiz_df.columns:
+        logger.warning("Historical quiz data is empty, None or has no student column.")
+        return None
+
+    try:
+        dated = _dated_accuracy(historical_quiz_df[historical_quiz_df[STUDENT_COLUMN].notna()])
+        if dated is None:
+            return None
+
+        days, accuracy = dated
+        students = historical_quiz_df.loc[days.index, STUDENT_COLUMN].astype(str)
+        daily = accuracy.groupby([students, days]).agg(['sum', 'count'])
+        daily.columns = ['accuracy_sum', 'attempts']
+        daily.index.names = [STUDENT_COLUMN, 'day']
+        logger.info("Per-student daily accuracy aggregation complete.")
+        return daily.sort_index()
+
+    except Exception as e:
+        logger.error(f"Error aggregating per-student daily accuracy: {e}")
+        return None
+
+def student_daily_accuracy(daily_by_student, user_id):
+    """
+    One student's daily totals, shaped like daily_accuracy's output.
+    :param daily_by_student: pd.DataFrame - Output of daily_accuracy_by_student.
+    :param user_id: str - Student to select.
+    :return: pd.DataFrame or None - None if the student has no dated submissions.
+    """
+    if daily_by_student is None:
+        return None
+    try:
+        daily = daily_by_student.xs(str(user_id), level=STUDENT_COLUMN)
+    except KeyError:
+        return None
+    return _fill_calendar(daily)
+
+def _bucket_starts(days, bucket):
+    """
+    First day of the bucket each day falls in: the day itself, its week's Monday or its month's first day.
+    """
+    if bucket not in TREND_BUCKETS:
+        raise ValueError(f"Unknown trend bucket '{bucket}'. Available: {list(TREND_BUCKETS)}")
+    if bucket == 'day':
+        return days
+    offset = days.dayofweek if bucket == 'week' else days.day - 1
+    return days - pd.to_timedelta(offset, unit='D')
+
+def trend_buckets(daily, bucket='week', start=None, end=None, windows=DEFAULT_TREND_WINDOWS,
+                  halflife=DEFAULT_TREND_HALFLIFE, last=None):
+    """
+    Bucket daily accuracy by day, week or month, with rolling-window and exponentially weighted accuracy.
+    Windows and weights look back over the whole history, but only the requested buckets are returned,
+    so the result stays small however long the history is.
+    :param daily: pd.DataFrame - Output of daily_accuracy.
+    :param bucket: str - 'day', 'week' (starting Monday) or 'month'.
+    :param start: pd.Timestamp - Earliest bucket to return (the bucket containing it); None for the first.
+    :param end: pd.Timestamp - Latest bucket start to return; None for the last.
+    :param windows: tuple - Rolling window lengths in days; each adds rolling_<n>d_accuracy, the mean over
+        the n days up to the bucket's last day.
+    :param halflife: float - Days after which a submission's weight in ewm_accuracy has halved.
+    :param last: int - Return only the latest `last` buckets of the range.
+    :return: pd.DataFrame - One row per bucket: bucket_start, attempts, accuracy (within the bucket),
+        cumulative_accuracy, rolling_<n>d_accuracy and ewm_accuracy (as of the bucket's last day).
+    """
+    if daily is None or daily.empty:
+        return None
+
+    labels = _bucket_starts(daily.index, bucket)
+    sums, attempts = daily['accuracy_sum'], daily['attempts']
+
+    # Attempt-weighted running means over the daily calendar, evaluated as of every day
+    as_of = {'cumulative_accuracy': sums.cumsum() / attempts.cumsum()}
+    for window in windows:
+        window_attempts = attempts.rolling(window, min_periods=1).sum()
+        as_of[f'rolling_{window}d_accuracy'] = sums.rolling(window, min_periods=1).sum() / window_attempts
+    # Ratio of two equally weighted EWMs = mean accuracy with each day's attempts decayed by age
+    as_of['ewm_accuracy'] = sums.ewm(halflife=halflife).mean() / attempts.ewm(halflife=halflife).mean()
+    as_of = pd.DataFrame(as_of).replace([np.inf, -np.inf], np.nan)
+
+    # Per-bucket totals, and the running means as of each bucket's last day
+    totals = daily.groupby(labels).sum()
+    last_days = ~labels.duplicated(keep='last')
+    trends = pd.DataFrame({
+        'bucket_start': totals.index,
+        'attempts': totals['attempts'].to_numpy(),
+        'accuracy': (totals['accuracy_sum'] / totals['attempts']).where(totals['attempts'] > 0).to_numpy(),
+        **{column: values.to_numpy() for column, values in as_of[last_days].items()},
+    })
+
+    if start is not None:
+        trends = trends[trends['bucket_start'] >= _bucket_starts(pd.DatetimeIndex([start]), bucket)[0]]
+    if end is not None:
+        trends = trends[trends['bucket_start'] <= end]
+    if last is not None:
+        trends = trends.tail(last)
+    return trends.reset_index(drop=True)
+
+def trend_table(trends):
+    """
+    Response-ready trend_buckets() frame: bucket_start as ISO dates, accuracies rounded to 2 places.
+    """
+    if trends is None:
+        return None
+    table = trends.drop(columns=['bucket_start']).round(2)
+    table.insert(0, 'bucket_start', trends['bucket_start'].dt.strftime('%Y-%m-%d'))
+    return table
+
+def parse_trend_query(args):
+    """
+    Parse trend query parameters (e.g. /trends?bucket=week&start=2024-01-01&windows=7,30).
+    :param args: Mapping - bucket, start, end (ISO dates, UTC unless an offset is given),
+        windows (comma-separated days), halflife (days) and last (bucket count); all optional.
+    :return: dict - Keyword arguments for trend_buckets, with defaults filled in.
+    :raises ValueError: For unknown buckets or malformed values.
+    """
+    bucket = args.get('bucket') or 'week'
+    if bucket not in TREND_BUCKETS:
+        raise ValueError(f"Unknown trend bucket '{bucket}'. Available: {list(TREND_BUCKETS)}")
+    options = {'bucket': bucket, 'start': None, 'end': None, 'windows': DEFAULT_TREND_WINDOWS,
+               'halflife': DEFAULT_TREND_HALFLIFE, 'last': None}
+
+    for name in ('start', 'end'):
+        if args.get(name):
+            try:
+                timestamp = pd.Timestamp(args[name])
+            except ValueError:
+                raise ValueError(f"'{name}' must be an ISO date, got '{args[name]}'")
+            options[name] = timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
+
+    if args.get('windows'):
+        try:
+            windows = tuple(int(window) for window in args['windows'].split(',') if window.strip())
+        except ValueError:
+            windows = ()
+        if not windows or not all(1 <= window <= MAX_TREND_WINDOW for window in windows):
+            raise ValueError(f"'windows' must be comma-separated day counts between 1 and {MAX_TREND_WINDOW}")
+        options['windows'] = tuple(dict.fromkeys(windows))
+
+    if args.get('halflife'):
+        try:
+            options['halflife'] = float(args['halflife'])
+        except ValueError:
+            options['halflife'] = 0
+        if not options['halflife'] > 0:
+            raise ValueError("'halflife' must be a positive number of days")
+
+    if args.get('last'):
+        try:
+            options['last'] = int(args['last'])
+        except ValueError:
+            options['last'] = 0
+        if options['last'] < 1:
+            raise ValueError("'last' must be a positive number of buckets")
+    return options
+
+def _merged_std(cells, source, keys, count):
+    """
+    Sample standard deviation per combination of `keys`, merged from per-cell means and
+    squared deviations (Chan et al.): no sum of squares, so a small spread around a large
+    mean keeps its precision.
+    """
+    cell_count = cells[f'{source}__count']
+    cell_mean = cells[f'{source}__sum'] / cell_count
+    grouped = cells.groupby(level=keys, sort=False, observed=True)
+    mean = grouped[f'{source}__sum'].transform('sum') / grouped[f'{source}__count'].transform('sum')
+    # Within-cell squared deviations plus each cell's offset from the merged mean; empty cells add nothing
+    cell_m2 = cells[f'{source}__var'] * (cell_count - 1)
+    m2 = (cell_m2.fillna(0) + (cell_count * (cell_mean - mean) ** 2).fillna(0)).groupby(
+        level=keys, sort=False, observed=True).sum()
+    return np.sqrt(m2 / (count - 1)).where(count > 1)
+
+def _rollup(cells, narrow, keys, aggregates):
+    """
+    Reduce per-(topic, difficulty) partials to one row per combination of `keys`.
+    """
+    partial_sums = cells.filter(regex='__(count|sum)$').groupby(level=keys, sort=False, observed=True).sum()
+    report = pd.DataFrame(index=partial_sums.index)
+
+    for column, (source, statistic) in aggregates.items():
+        if statistic not in MERGEABLE_STATISTICS:
+            report[column] = narrow.groupby(keys, sort=False, observed=True)[source].agg(statistic)
+            continue
+
+        count = partial_sums[f'{source}__count']
+        total = partial_sums[f'{source}__sum']
+        if statistic == 'count':
+            report[column] = count.astype('int64')
+        elif statistic == 'sum':
+            report[column] = total
+        elif statistic == 'mean':
+            report[column] = (total / count).where(count > 0)
+        elif statistic == 'std':
+            report[column] = _merged_std(cells, source, keys, count)
+        else:
+            report[column] = cells[f'{source}__{statistic}'].groupby(level=keys, sort=False, observed=True).agg(statistic)
+
+    # Weakest first, per student in batched mode
+    sort_column = 'average_accuracy' if 'average_accuracy' in report.columns else report.columns[0]
+    sort_keys = keys[:-1] + [sort_column]
+    return report.reset_index().sort_values(by=sort_keys, ascending=True, kind='mergesort')
+
+def aggregate_history(historical_quiz_df, aggregates=None, group_column=None):
+    """
+    Compute topic and difficulty reports from a single grouped pass over the history.
+    The input frame is never modified.
+    :param historical_quiz_df: pd.DataFrame - Preprocessed historical quiz data.
+    :param aggregates: dict - Output column -> (source column, statistic); defaults to DEFAULT_AGGREGATES.
+    :param group_column: str - Optional partition column (e.g. 'user_id') kept as a leading key.
+    :return: dict - 'topic_accuracy' and 'difficulty_performance' reports.
+    """
+    aggregates = aggregates or DEFAULT_AGGREGATES
+    df = _with_quiz_columns(historical_quiz_df, ['topic', 'difficulty_level'])
+    prefix = [group_column] if group_column is not None else []
+
+    # Narrow working frame: grouping keys plus each numeric source column once
+    narrow = pd.DataFrame({'topic': df['topic'], 'difficulty_level': df['difficulty_level']})
+    if group_column is not None:
+        narrow[group_column] = _group_keys(df[group_column])
+    for source in {source for source, _ in aggregates.values()}:
+        narrow[source] = pd.to_numeric(df[source], errors='coerce')
+
+    # One groupby producing mergeable partials (count, sum, variance, min/max) for every source
+    # column. The row count is always included, so the rollups have their groups even when no
+    # statistic is mergeable.
+    spec = {'__rows__count': ('topic', 'size')}
+    for source, statistic in aggregates.values():
+        if statistic not in MERGEABLE_STATISTICS:
+            continue
+        spec[f'{source}__count'] = (source, 'count')
+        spec[f'{source}__sum'] = (source, 'sum')
+        if statistic == 'std':
+            spec[f'{source}__var'] = (source, 'var')
+        elif statistic in ('min', 'max'):
+            spec[f'{source}__{statistic}'] = (source, statistic)
+    cells = narrow.groupby(prefix + ['topic', 'difficulty_level'], sort=False, observed=True).agg(**spec)
+
+    return {
+        "topic_accuracy": _rollup(cells, narrow, prefix + ['topic'], aggregates),
+        "difficulty_performance": _rollup(cells, narrow, prefix + ['difficulty_level'], aggregates),
+    }
+
+@instrument("analyze_all", is_failure=lambda results: all(report is None for report in results.values()))
+def analyze_all(historical_quiz_df, aggregates=None, by_student=False):
     """
     Perform all analyses and return a comprehensive summary.
+    Topic and difficulty reports share one grouped pass; the input is not modified.
     :param historical_quiz_df: pd.DataFrame - Preprocessed historical quiz data.
+    :param aggregates: dict - Extra/alternative aggregates, see EXTENDED_AGGREGATES.
+    :param by_student: bool - Partition by user_id; every report then carries a user_id column.
     :return: dict - Contains topic accuracy, difficulty performance, and improvement trends.
     """
-    topic_accuracy = analyze_topic_accuracy(historical_quiz_df)
-    difficulty_performance = analyze_difficulty_performance(historical_quiz_df)
-    improvement_trends = analyze_improvement_trends(historical_quiz_df)
+    if historical_quiz_df is None or historical_quiz_df.empty:
+        logger.warning("Historical quiz data is empty or None.")
+        return {
+            "topic_accuracy": None,
+            "difficulty_performance": None,
+            "improvement_trends": None,
+        }
+
+    group_column = None
+    if by_student:
+        if STUDENT_COLUMN not in historical_quiz_df.columns:
+            logger.error(f"Batched analysis requires a '{STUDENT_COLUMN}' column.")
+            return {
+                "topic_accuracy": None,
+                "difficulty_performance": None,
+                "improvement_trends": None,
+            }
+        group_column = STUDENT_COLUMN
+
+    try:
+        reports = aggregate_history(historical_quiz_df, aggregates, group_column=group_column)
+        logger.info("Topic-wise accuracy and difficulty-level performance analysis complete.")
+    except Exception as e:
+        logger.error(f"Error aggregating historical data: {e}")
+        reports = {"topic_accuracy": None, "difficulty_performance": None}
+
+    if group_column is None:
+        improvement_trends = analyze_improvement_trends(historical_quiz_df)
+    else:
+        try:
+            improvement_trends = _cumulative_trend(historical_quiz_df, group_column=group_column)
+            logger.info("Per-student improvement trend analysis complete.")
+        except Exception as e:
+            logger.error(f"Error analyzing per-student improvement trends: {e}")
+            improvement_trends = None
     
     return {
-        "topic_accuracy": topic_accuracy,
-        "difficulty_performance": difficulty_performance,
+        "topic_accuracy": reports["topic_accuracy"],
+        "difficulty_performance": reports["difficulty_performance"],
         "improvement_trends": improvement_trends,
     }
 
+def split_by_student(batched_results):
+    """
+    Partition batched analysis results into one single-student result dict per user.
+    :param batched_results: dict - Output of analyze_all(..., by_student=True).
+    :return: dict - user_id -> analysis results shaped like analyze_all's single-student output.
+    """
+    per_student = {}
+    for key, frame in batched_results.items():
+        if frame is None or STUDENT_COLUMN not in frame.columns:
+            continue
+        for user_id, part in frame.groupby(STUDENT_COLUMN, sort=False, observed=True):
+            per_student.setdefault(user_id, {
+                "topic_accuracy": None,
+                "difficulty_performance": None,
+                "improvement_trends": None,
+            })[key] = part.drop(columns=[STUDENT_COLUMN])
+    return per_student
+
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     # Load preprocessed data (assuming it's already preprocessed)
     from data.preprocess_data import preprocess_all_data
     from data.fetch_data import fetch_all_data
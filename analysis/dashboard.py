@@ -0,0 +1,264 @@
+import logging
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from analysis.recommendations import DEFAULT_RULES, recommendation_frame
+from monitoring.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Difficulty levels from easiest to hardest, for recommending the next level
+DIFFICULTY_ORDER = ['easy', 'medium', 'hard']
+
+# Window compared against the window before it for the improvement rate
+IMPROVEMENT_WINDOW = pd.Timedelta(days=30)
+
+# Improvement (percentage points per window) beyond which progress counts as rising/falling
+PROGRESS_THRESHOLD = 2.0
+
+# Thresholds behind the achievements section
+ACHIEVEMENT_RULES = {
+    'quiz_milestones': (1000, 500, 100, 50, 10),
+    'mastery_accuracy': 90,
+    'max_mastered_topics': 3,
+    'streak_accuracy': DEFAULT_RULES['strong_topic_from'],
+    'min_streak': 3,
+}
+
+# Dashboard sections evaluated and cached per data fingerprint
+MAX_CACHED_SECTIONS = 64
+
+VISUALIZATION_URLS = {
+    "topic_accuracy": "/visualizations/topic_accuracy",
+    "improvement_trends": "/visualizations/improvement_trends",
+}
+
+def _topics(row, column):
+    return row[column] if isinstance(row[column], list) else []
+
+def topic_strengths(analysis_results):
+    """
+    Strong and weak topics, under the same thresholds as the recommendations (DEFAULT_RULES).
+    :param analysis_results: dict - Output of analyze_all for the whole history or one student.
+    :return: tuple - (strengths, areas for improvement), each a list of topics, weakest first.
+    """
+    row = recommendation_frame(analysis_results).iloc[0]
+    return _topics(row, "strong_topics"), _topics(row, "weak_topics")
+
+def _accuracy_series(results):
+    historical_quiz_df = results["historical_quiz_df"]
+    if historical_quiz_df is None or 'accuracy_percentage' not in historical_quiz_df.columns:
+        return None
+    return pd.to_numeric(historical_quiz_df['accuracy_percentage'], errors='coerce')
+
+def improvement_rate(historical_quiz_df, window=IMPROVEMENT_WINDOW):
+    """
+    Change in mean accuracy between the latest window and the window before it.
+    :param historical_quiz_df: pd.DataFrame - Preprocessed historical quiz data.
+    :param window: pd.Timedelta - Window length, ending at the latest submission.
+    :return: float - Percentage points (positive = improving), or None without data in both windows.
+    """
+    if historical_quiz_df is None or 'submitted_at' not in historical_quiz_df.columns:
+        return None
+    submitted_at = pd.to_datetime(historical_quiz_df['submitted_at'], errors='coerce', utc=True)
+    accuracy = pd.to_numeric(historical_quiz_df['accuracy_percentage'], errors='coerce')
+    latest = submitted_at.max()
+    if pd.isna(latest):
+        return None
+
+    recent = submitted_at > latest - window
+    previous = (submitted_at > latest - 2 * window) & ~recent
+    recent_mean, previous_mean = accuracy[recent].mean(), accuracy[previous].mean()
+    if pd.isna(recent_mean) or pd.isna(previous_mean):
+        return None
+    return round(float(recent_mean - previous_mean), 2)
+
+def _progress_label(rate):
+    if rate is None:
+        return "Not enough data"
+    if rate > PROGRESS_THRESHOLD:
+        return "Improving"
+    if rate < -PROGRESS_THRESHOLD:
+        return "Declining"
+    return "Steady"
+
+def recommended_difficulty(difficulty_performance, mastery=DEFAULT_RULES['strong_topic_from']):
+    """
+    The level to practise next: one above the hardest level at or above `mastery` accuracy,
+    or the easiest attempted level when none is mastered yet.
+    :param difficulty_performance: pd.DataFrame - Difficulty report from analyze_all.
+    :return: str - Difficulty level, or None without known levels.
+    """
+    if difficulty_performance is None or difficulty_performance.empty:
+        return None
+    levels = difficulty_performance.assign(
+        rank=difficulty_performance['difficulty_level'].astype(str).str.lower().map(
+            {level: i for i, level in enumerate(DIFFICULTY_ORDER)}))
+    levels = levels[levels['rank'].notna()]
+    if levels.empty:
+        return None
+
+    mastered = levels[levels['average_accuracy'] >= mastery]
+    if mastered.empty:
+        return DIFFICULTY_ORDER[int(levels['rank'].min())]
+    return DIFFICULTY_ORDER[min(int(mastered['rank'].max()) + 1, len(DIFFICULTY_ORDER) - 1)]
+
+def longest_streak(accuracy, threshold):
+    """
+    Longest run of consecutive submissions at or above threshold.
+    :param accuracy: array-like - Accuracy per submission, in chronological order.
+    :return: int - Length of the longest run.
+    """
+    good = np.asarray(pd.to_numeric(pd.Series(accuracy), errors='coerce') >= threshold)
+    if not good.any():
+        return 0
+    # Every miss starts a new run id; count the hits carrying each id
+    run_ids = np.cumsum(~good)
+    return int(np.bincount(run_ids[good]).max())
+
+def build_student_profile(results):
+    """
+    Strengths, areas for improvement, progress and the difficulty to practise next.
+    """
+    analysis_results = results["analysis_results"]
+    strengths, weak_topics = topic_strengths(analysis_results)
+    rate = improvement_rate(results["historical_quiz_df"])
+    return {
+        "strengths": strengths,
+        "areas_for_improvement": weak_topics,
+        "progress_rate": _progress_label(rate),
+        "recommended_difficulty": recommended_difficulty(analysis_results["difficulty_performance"]),
+    }
+
+def build_performance_metrics(results):
+    """
+    Overall accuracy, mastered topics, quizzes completed and the improvement rate.
+    """
+    accuracy = _accuracy_series(results)
+    overall = accuracy.mean() if accuracy is not None else None
+    return {
+        "overall_accuracy": round(float(overall), 2) if overall is not None and pd.notna(overall) else None,
+        "topics_mastered": len(topic_strengths(results["analysis_results"])[0]),
+        "total_quizzes_completed": len(results["historical_quiz_df"]) if results["historical_quiz_df"] is not None else 0,
+        "improvement_rate": improvement_rate(results["historical_quiz_df"]),
+    }
+
+def build_recommendations(results):
+    return results["recommendations"]
+
+def build_recent_achievements(results, rules=ACHIEVEMENT_RULES):
+    """
+    Milestones reached in the history: quizzes completed, mastered topics, best streak and best score.
+    """
+    achievements = []
+    historical_quiz_df = results["historical_quiz_df"]
+    total = len(historical_quiz_df) if historical_quiz_df is not None else 0
+    milestone = next((m for m in rules['quiz_milestones'] if total >= m), None)
+    if milestone is not None:
+        achievements.append(f"Completed {milestone}+ quizzes")
+
+    topic_accuracy = results["analysis_results"]["topic_accuracy"]
+    if topic_accuracy is not None and not topic_accuracy.empty:
+        mastered = topic_accuracy[topic_accuracy['average_accuracy'] >= rules['mastery_accuracy']]
+        mastered = mastered.sort_values('average_accuracy', ascending=False).head(rules['max_mastered_topics'])
+        achievements.extend(f"Achieved {rules['mastery_accuracy']}%+ in {topic}" for topic in mastered['topic'])
+
+    improvement_trends = results["analysis_results"]["improvement_trends"]
+    if improvement_trends is not None and not improvement_trends.empty:
+        streak = longest_streak(improvement_trends['accuracy_percentage'], rules['streak_accuracy'])
+        if streak >= rules['min_streak']:
+            achievements.append(f"{streak} quizzes in a row at {rules['streak_accuracy']}%+")
+
+    accuracy = _accuracy_series(results)
+    if accuracy is not None and accuracy.notna().any():
+        achievements.append(f"Personal best: {accuracy.max():.0f}% accuracy")
+    return achievements
+
+def build_visualization_urls(results):
+    return dict(VISUALIZATION_URLS)
+
+# Section name -> (builder, whether it reads pipeline results), in response order
+SECTIONS = OrderedDict([
+    ("student_profile", (build_student_profile, True)),
+    ("performance_metrics", (build_performance_metrics, True)),
+    ("recommendations", (build_recommendations, True)),
+    ("visualization_urls", (build_visualization_urls, False)),
+    ("recent_achievements", (build_recent_achievements, True)),
+])
+
+def parse_fields(value):
+    """
+    Parse a ?fields= value ("performance_metrics,recommendations").
+    :param value: str - Comma-separated section names; empty or None selects every section.
+    :return: list - Requested sections in response order.
+    :raises ValueError: For unknown section names.
+    """
+    if not value:
+        return list(SECTIONS)
+    requested = {field.strip() for field in value.split(',') if field.strip()}
+    unknown = requested - set(SECTIONS)
+    if unknown:
+        raise ValueError(f"Unknown dashboard fields: {sorted(unknown)}. Available: {list(SECTIONS)}")
+    return [name for name in SECTIONS if name in requested]
+
+def needs_results(fields):
+    """
+    Whether any requested section reads pipeline results (static sections do not).
+    """
+    return any(SECTIONS[name][1] for name in fields)
+
+class DashboardSections:
+    """
+    Builds dashboard sections on demand and caches each one by data fingerprint,
+    so a request only pays for the sections it asks for that are not cached yet.
+    """
+
+    def __init__(self, max_cached=MAX_CACHED_SECTIONS):
+        self.max_cached = max_cached
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, fields, load_results):
+        """
+        Return the requested sections.
+        :param fields: list - Section names from parse_fields().
+        :param load_results: callable - Returns pipeline results (a LazyResults from run());
+            only called when a requested section needs data.
+        :return: dict - Section name -> section body, in response order.
+        """
+        results = load_results() if needs_results(fields) else None
+        fingerprint = results["fingerprint"] if results is not None else None
+
+        sections = {}
+        for name in fields:
+            build, uses_results = SECTIONS[name]
+            key = (fingerprint if uses_results else None, name)
+            with self._lock:
+                cached = self._cache.get(key)
+                if cached is not None:
+                    self._cache.move_to_end(key)
+            if cached is None:
+                with stage_timer(f"dashboard_{name}"):
+                    cached = (build(results),)
+                with self._lock:
+                    self._cache[key] = cached
+                    while len(self._cache) > self.max_cached:
+                        self._cache.popitem(last=False)
+            sections[name] = cached[0]
+        return sections
+
+_dashboard_sections = None
+_dashboard_sections_lock = threading.Lock()
+
+def get_dashboard_sections():
+    """
+    Return the process-wide dashboard section cache used by the API.
+    """
+    global _dashboard_sections
+    with _dashboard_sections_lock:
+        if _dashboard_sections is None:
+            _dashboard_sections = DashboardSections()
+        return _dashboard_sections
@@ -0,0 +1,444 @@
+import json
+import logging
+import os
+import threading
+
+import pandas as pd
+
+from data.preprocess_data import QUIZ_FIELDS, preprocess_historical_chunks
+
+logger = logging.getLogger(__name__)
+
+# Default location of the persisted running aggregates
+STATE_PATH = os.environ.get("QUIZ_ANALYTICS_STATE", ".cache/analytics_state.json")
+
+STATE_VERSION = 1
+
+# Ingested submissions are appended to a journal next to the state file; the full
+# state is only rewritten (and the journal emptied) once this many have accumulated
+COMPACT_EVERY = int(os.environ.get("QUIZ_ANALYTICS_COMPACT_EVERY", 1000))
+
+
+def _parse_accuracy(value):
+    """
+    Parse an accuracy value such as ' 90 %' or 90 into a float, or None.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return None if pd.isna(value) else float(value)
+    try:
+        return float(str(value).strip().rstrip('%'))
+    except ValueError:
+        return None
+
+
+def _to_utc(value):
+    """
+    Normalise a timestamp to a tz-aware UTC pd.Timestamp so values compare safely.
+    """
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize('UTC') if timestamp.tzinfo is None else timestamp.tz_convert('UTC')
+
+
+def _quiz_field(submission, key):
+    """
+    Read a flattened quiz field from a raw or preprocessed submission record.
+    """
+    column, default, _ = QUIZ_FIELDS[key]
+    value = submission.get(column)
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        quiz = submission.get('quiz')
+        value = quiz.get(key) if isinstance(quiz, dict) else None
+    return default if value is None else value
+
+
+def _journal_path(path):
+    return f"{path}.journal"
+
+
+def parse_submission(submission):
+    """
+    Validate a submission and reduce it to what the aggregates need.
+    :param submission: dict - Raw or preprocessed submission record.
+    :return: dict or None - The submission's contribution, or None if it is unusable.
+    """
+    accuracy = _parse_accuracy(submission.get('accuracy_percentage', submission.get('accuracy')))
+    if accuracy is None:
+        logger.warning("Skipping submission without a usable accuracy value.")
+        return None
+
+    submitted_at = submission.get('submitted_at')
+    if submitted_at is not None:
+        try:
+            submitted_at = _to_utc(submitted_at)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Skipping submission with an unparseable submitted_at ({submitted_at!r}): {e}")
+            return None
+        submitted_at = None if pd.isna(submitted_at) else submitted_at.isoformat()
+
+    submission_id = submission.get('id')
+    user_id = submission.get('user_id')
+    return {
+        'id': None if submission_id is None else str(submission_id),
+        'user_id': None if user_id is None else str(user_id),
+        'topic': _quiz_field(submission, 'topic'),
+        'difficulty_level': _quiz_field(submission, 'difficulty_level'),
+        'accuracy': accuracy,
+        'submitted_at': submitted_at,
+    }
+
+
+def check_submissions(submissions):
+    """
+    Raise ValueError unless every submission is a dict, before any of them is applied.
+    :param submissions: list - Submission records.
+    """
+    invalid = [position for position, submission in enumerate(submissions) if not isinstance(submission, dict)]
+    if invalid:
+        raise ValueError(f"Submissions must be JSON objects (invalid at positions {invalid[:10]})")
+
+
+class AnalyticsState:
+    """
+    Running sums and counts per topic and per difficulty level.
+
+    Each new submission is folded in with O(1) work, so topic/difficulty
+    averages and the cumulative accuracy never need a full recompute.
+    Rebuild with from_history() only when starting from raw data.
+    """
+
+    def __init__(self):
+        self.topics = {}
+        self.difficulties = {}
+        self.total_sum = 0.0
+        self.total_count = 0
+        self.last_submitted_at = None
+        self.applied_ids = set()
+        self.track_ids = True
+        self._lock = threading.Lock()
+        # Serialises journal appends against save(), which empties the journal
+        self._persist_lock = threading.Lock()
+        self._journal_size = 0
+
+    @classmethod
+    def from_history(cls, historical_quiz_df):
+        """
+        Build the state from a full preprocessed history.
+        :param historical_quiz_df: pd.DataFrame - Preprocessed historical quiz data.
+        :return: AnalyticsState - State equivalent to applying every row in order.
+        """
+        state = cls()
+        state.merge_frame(historical_quiz_df)
+        if historical_quiz_df is not None:
+            logger.info(f"Analytics state rebuilt from {len(historical_quiz_df)} submissions.")
+        return state
+
+    @classmethod
+    def from_chunks(cls, historical_chunks, track_ids=False):
+        """
+        Build the state from a stream of preprocessed history chunks in bounded memory.
+        :param historical_chunks: iterable of pd.DataFrame - e.g. preprocess_historical_chunks(...).
+        :param track_ids: bool - Remember submission ids for de-duplication (memory grows with history).
+        :return: AnalyticsState
+        """
+        state = cls()
+        state.track_ids = track_ids
+        rows = 0
+        for chunk in historical_chunks:
+            state.merge_frame(chunk)
+            rows += len(chunk)
+        logger.info(f"Analytics state rebuilt from {rows} streamed submissions.")
+        return state
+
+    def merge_frame(self, historical_quiz_df):
+        """
+        Fold a whole preprocessed frame (or chunk) into the state with one grouped pass.
+        :param historical_quiz_df: pd.DataFrame - Preprocessed historical quiz data.
+        """
+        if historical_quiz_df is None or historical_quiz_df.empty:
+            return
+
+        from analysis.analyze_performance import aggregate_history
+
+        sums = {
+            'total': ('accuracy_percentage', 'sum'),
+            'attempts': ('accuracy_percentage', 'count'),
+        }
+        reports = aggregate_history(historical_quiz_df, sums)
+
+        latest = None
+        if 'submitted_at' in historical_quiz_df.columns:
+            latest = pd.to_datetime(historical_quiz_df['submitted_at']).max()
+
+        with self._lock:
+            for buckets, report, column in ((self.topics, reports['topic_accuracy'], 'topic'),
+                                            (self.difficulties, reports['difficulty_performance'], 'difficulty_level')):
+                for key, total, attempts in zip(report[column], report['total'], report['attempts']):
+                    bucket = buckets.setdefault(key, [0.0, 0])
+                    bucket[0] += float(total)
+                    bucket[1] += int(attempts)
+            self.total_sum += float(reports['topic_accuracy']['total'].sum())
+            self.total_count += int(reports['topic_accuracy']['attempts'].sum())
+
+            if latest is not None and not pd.isna(latest):
+                latest = _to_utc(latest)
+                if self.last_submitted_at is None or latest > pd.Timestamp(self.last_submitted_at):
+                    self.last_submitted_at = latest.isoformat()
+            if self.track_ids and 'id' in historical_quiz_df.columns:
+                self.applied_ids.update(str(i) for i in historical_quiz_df['id'].dropna())
+
+    def apply_submission(self, submission):
+        """
+        Fold one submission into the running aggregates.
+        :param submission: dict - Raw or preprocessed submission record.
+        :return: bool - False if the submission was skipped (already applied or unusable).
+        """
+        record = parse_submission(submission)
+        return record is not None and self._apply_record(record)
+
+    def _apply_record(self, record):
+        """
+        Fold a validated contribution (see parse_submission) into the aggregates.
+        """
+        with self._lock:
+            if record['id'] is not None and record['id'] in self.applied_ids:
+                return False
+
+            for buckets, key in ((self.topics, 'topic'), (self.difficulties, 'difficulty_level')):
+                bucket = buckets.setdefault(record[key], [0.0, 0])
+                bucket[0] += record['accuracy']
+                bucket[1] += 1
+            self.total_sum += record['accuracy']
+            self.total_count += 1
+
+            submitted_at = record['submitted_at']
+            if submitted_at is not None:
+                if self.last_submitted_at is None or pd.Timestamp(submitted_at) > pd.Timestamp(self.last_submitted_at):
+                    self.last_submitted_at = submitted_at
+            if record['id'] is not None and self.track_ids:
+                self.applied_ids.add(record['id'])
+            return True
+
+    def _unapplied(self, records):
+        """
+        The records _apply_record would apply, in order: ids already applied, or repeated
+        earlier in the batch, are left out.
+        """
+        pending, batch_ids = [], set()
+        with self._lock:
+            for record in records:
+                if record['id'] is not None:
+                    if record['id'] in self.applied_ids or record['id'] in batch_ids:
+                        continue
+                    if self.track_ids:
+                        batch_ids.add(record['id'])
+                pending.append(record)
+        return pending
+
+    def ingest(self, submissions, path=STATE_PATH):
+        """
+        Apply submissions and append the applied ones to the journal at path, so the cost
+        of persisting them does not grow with the state. The full state is rewritten
+        every COMPACT_EVERY journaled submissions.
+        :param submissions: iterable of dict - Raw or preprocessed submission records.
+        :param path: str - Location of the persisted state (None to skip persisting).
+        :return: list - The applied submissions, as returned by parse_submission().
+        :raises ValueError: If any submission is not a dict; nothing is applied then.
+        """
+        submissions = list(submissions)
+        check_submissions(submissions)
+        records = [record for record in map(parse_submission, submissions) if record is not None]
+        if not path:
+            return [record for record in records if self._apply_record(record)]
+
+        with self._persist_lock:
+            # Journal first, so a failed write leaves the aggregates untouched
+            pending = self._unapplied(records)
+            if not pending:
+                return pending
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with open(_journal_path(path), 'a', encoding='utf-8') as f:
+                f.writelines(json.dumps(record) + "\n" for record in pending)
+            self._journal_size += len(pending)
+            applied = [record for record in pending if self._apply_record(record)]
+            compact = self._journal_size >= COMPACT_EVERY
+        if compact:
+            self.save(path)
+        return applied
+
+    def apply_frame(self, submissions_df):
+        """
+        Fold every row of a submission frame (e.g. the QUIZ_SUBMISSION_DATA frame) into the state.
+        :param submissions_df: pd.DataFrame - Raw or preprocessed submissions.
+        :return: int - Number of submissions applied.
+        """
+        if submissions_df is None or submissions_df.empty:
+            return 0
+        return sum(self.apply_submission(record) for record in submissions_df.to_dict('records'))
+
+    @property
+    def cumulative_accuracy(self):
+        return self.total_sum / self.total_count if self.total_count else None
+
+    def _report(self, buckets, column):
+        rows = [
+            {column: key, 'average_accuracy': total / count}
+            for key, (total, count) in buckets.items() if count
+        ]
+        report = pd.DataFrame(rows, columns=[column, 'average_accuracy'])
+        return report.sort_values(by='average_accuracy', ascending=True, kind='mergesort')
+
+    def analysis_results(self):
+        """
+        Return results shaped like analyze_all's output, for generate_recommendations.
+        The trend frame holds a single row: the latest cumulative accuracy.
+        :return: dict - Contains topic accuracy, difficulty performance, and improvement trends.
+        """
+        with self._lock:
+            trends = None
+            if self.total_count:
+                trends = pd.DataFrame([{
+                    'submitted_at': pd.Timestamp(self.last_submitted_at) if self.last_submitted_at else pd.NaT,
+                    'cumulative_accuracy': self.cumulative_accuracy,
+                }])
+            return {
+                "topic_accuracy": self._report(self.topics, 'topic'),
+                "difficulty_performance": self._report(self.difficulties, 'difficulty_level'),
+                "improvement_trends": trends,
+            }
+
+    def to_dict(self):
+        # Copies, so the result can be serialised outside the lock while submissions keep arriving
+        with self._lock:
+            return {
+                "version": STATE_VERSION,
+                "topics": {key: list(value) for key, value in self.topics.items()},
+                "difficulties": {key: list(value) for key, value in self.difficulties.items()},
+                "total_sum": self.total_sum,
+                "total_count": self.total_count,
+                "last_submitted_at": self.last_submitted_at,
+                "applied_ids": list(self.applied_ids),
+                "track_ids": self.track_ids,
+            }
+
+    @classmethod
+    def from_dict(cls, payload):
+        if payload.get("version") != STATE_VERSION:
+            raise ValueError(f"Unsupported analytics state version: {payload.get('version')}")
+        state = cls()
+        state.topics = {key: list(value) for key, value in payload["topics"].items()}
+        state.difficulties = {key: list(value) for key, value in payload["difficulties"].items()}
+        state.total_sum = payload["total_sum"]
+        state.total_count = payload["total_count"]
+        state.last_submitted_at = payload["last_submitted_at"]
+        state.applied_ids = set(payload["applied_ids"])
+        state.track_ids = payload.get("track_ids", True)
+        return state
+
+    def save(self, path=STATE_PATH):
+        """
+        Persist the state as JSON, replacing any previous file atomically, and empty the journal.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._persist_lock:
+            payload = self.to_dict()
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f)
+            os.replace(tmp_path, path)
+            try:
+                os.remove(_journal_path(path))
+            except FileNotFoundError:
+                pass
+            self._journal_size = 0
+
+    @classmethod
+    def load(cls, path=STATE_PATH):
+        """
+        Load a persisted state and replay its journal, or return None if there is no usable file.
+        """
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                state = cls.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Ignoring unreadable analytics state at {path}: {e}")
+            return None
+
+        journal = _journal_path(path)
+        truncated = False
+        if os.path.exists(journal):
+            with open(journal, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A write cut short by a crash; everything before it is intact
+                        logger.warning(f"Ignoring truncated entry at the end of {journal}")
+                        truncated = True
+                        break
+                    state._apply_record(record)
+                    state._journal_size += 1
+        if truncated:
+            # Compact so later appends do not land on the end of the broken line
+            state.save(path)
+        return state
+
+
+def build_state(historical_quiz_df, current_quiz_df=None):
+    """
+    Full rebuild from raw data: fold in the history, then the current submission.
+    :param historical_quiz_df: pd.DataFrame - Preprocessed historical quiz data.
+    :param current_quiz_df: pd.DataFrame - Current submission frame (QUIZ_SUBMISSION_DATA), if any.
+    :return: AnalyticsState
+    """
+    state = AnalyticsState.from_history(historical_quiz_df)
+    state.apply_frame(current_quiz_df)
+    return state
+
+
+def build_state_from_stream(chunk_rows=None):
+    """
+    Full rebuild that streams the historical endpoint instead of loading it whole.
+    :param chunk_rows: int - Rows per streamed chunk; defaults to fetch_data.DEFAULT_CHUNK_ROWS.
+    :return: AnalyticsState - Built without submission id tracking, so memory stays bounded.
+    """
+    from data.fetch_data import DEFAULT_CHUNK_ROWS, HISTORICAL_DATA, stream_data_chunks
+
+    chunks = stream_data_chunks(HISTORICAL_DATA, chunk_rows or DEFAULT_CHUNK_ROWS)
+    return AnalyticsState.from_chunks(preprocess_historical_chunks(chunks))
+
+
+def load_or_build_state(build, path=STATE_PATH):
+    """
+    Load the persisted state, falling back to a full rebuild.
+    :param build: callable - Returns a fresh AnalyticsState; only called when nothing is persisted.
+    :param path: str - Location of the persisted state.
+    :return: AnalyticsState
+    """
+    state = AnalyticsState.load(path)
+    if state is None:
+        state = build()
+        state.save(path)
+    return state
+
+
+def ingest_submissions(state, submissions, path=STATE_PATH):
+    """
+    Push new submissions into the state without refetching history, journaling them at path.
+    :param state: AnalyticsState - State to update.
+    :param submissions: dict, list of dicts or pd.DataFrame - New submission records.
+    :param path: str - Where the state is persisted (None to skip persisting).
+    :return: list - The applied submissions, as returned by parse_submission().
+    :raises ValueError: If any submission is not a dict; nothing is applied then.
+    """
+    if isinstance(submissions, pd.DataFrame):
+        submissions = submissions.to_dict('records')
+    elif isinstance(submissions, dict):
+        submissions = [submissions]
+
+    applied = state.ingest(submissions, path)
+    logger.info(f"Ingested {len(applied)} new submission(s).")
+    return applied
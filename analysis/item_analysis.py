@@ -0,0 +1,288 @@
+import json
+import logging
+from itertools import chain
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from analysis.analyze_performance import STUDENT_COLUMN
+from monitoring.metrics import instrument
+
+logger = logging.getLogger(__name__)
+
+# Share of students (by overall item score) in the upper and lower groups of the discrimination index
+DISCRIMINATION_GROUP = 0.27
+
+# Questions answered by fewer students get no discrimination statistics
+MIN_ITEM_STUDENTS = 5
+
+# Questions listed per student for review, and the mastery below which a topic counts as weak
+MAX_REVIEW_QUESTIONS = 10
+WEAK_MASTERY_BELOW = 0.6
+
+class ResponseMatrix(NamedTuple):
+    """
+    Students x questions response counts in coordinate (COO) form: one entry per
+    (student, question) pair that has at least one scored response.
+    """
+    students: pd.Index  # row labels (user_id)
+    questions: pd.Index  # column labels (question id)
+    rows: np.ndarray  # row index of each entry
+    cols: np.ndarray  # column index of each entry
+    attempts: np.ndarray  # responses of the student to the question
+    correct: np.ndarray  # of which correct
+
+    @property
+    def shape(self):
+        return len(self.students), len(self.questions)
+
+    def row_sums(self, values):
+        return np.bincount(self.rows, weights=values, minlength=len(self.students))
+
+    def col_sums(self, values):
+        return np.bincount(self.cols, weights=values, minlength=len(self.questions))
+
+def _as_dict(value):
+    """
+    A nested dict cell, or None. Frames loaded from a snapshot keep nested cells as JSON text.
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return None
+    return value if isinstance(value, dict) else None
+
+def _quiz_dicts(quiz_df):
+    """
+    Quiz dicts from the quiz endpoint frame, whose rows are either a nested 'quiz' dict or the quiz itself.
+    """
+    if 'quiz' in quiz_df.columns:
+        return [quiz for quiz in map(_as_dict, quiz_df['quiz'].tolist()) if quiz is not None]
+    return quiz_df.to_dict('records')
+
+def answer_key(quizzes):
+    """
+    Correct options and topic of every question in the given quizzes.
+    :param quizzes: pd.DataFrame or list - Quiz endpoint data (processed or raw) or quiz dicts with 'questions'.
+    :return: pd.DataFrame - One row per (question_id, correct option_id) with the question's topic;
+        a question with several correct options has several rows. Empty without question data.
+    """
+    if isinstance(quizzes, pd.DataFrame):
+        quizzes = _quiz_dicts(quizzes)
+
+    rows = []
+    for quiz in quizzes or []:
+        for question in quiz.get('questions') or []:
+            if not isinstance(question, dict) or question.get('id') is None:
+                continue
+            topic = question.get('topic') or quiz.get('topic') or 'Unknown'
+            for option in question.get('options') or []:
+                if isinstance(option, dict) and option.get('is_correct') and option.get('id') is not None:
+                    rows.append((int(question['id']), int(option['id']), str(topic)))
+    return pd.DataFrame(rows, columns=['question_id', 'option_id', 'topic']).drop_duplicates()
+
+def _flatten_responses(historical_quiz_df):
+    """
+    Flatten the response_map dicts ({question id: chosen option id}) into parallel arrays.
+    """
+    maps = [_as_dict(m) or {} for m in historical_quiz_df['response_map'].tolist()]
+    lengths = np.fromiter((len(m) for m in maps), dtype=np.int64, count=len(maps))
+    submission = np.repeat(np.arange(len(maps)), lengths)
+    question = pd.to_numeric(pd.Series(list(chain.from_iterable(maps)), dtype=object), errors='coerce')
+    option = pd.to_numeric(pd.Series(list(chain.from_iterable(m.values() for m in maps)), dtype=object),
+                           errors='coerce')
+    return submission, question.to_numpy(dtype='float64'), option.to_numpy(dtype='float64')
+
+def response_matrix(historical_quiz_df, key):
+    """
+    Build the sparse students x questions correctness matrix from submission response maps.
+    Only questions in the answer key are scored; repeated responses to a question add up.
+    Submissions without a user_id are left out.
+    :param historical_quiz_df: pd.DataFrame - Preprocessed historical data with user_id and response_map.
+    :param key: pd.DataFrame - Output of answer_key().
+    :return: ResponseMatrix
+    """
+    questions = pd.Index(key['question_id'].unique())
+    # Submissions without a user_id belong to no student
+    historical_quiz_df = historical_quiz_df[historical_quiz_df[STUDENT_COLUMN].notna()]
+    submission, question, option = _flatten_responses(historical_quiz_df)
+
+    cols = questions.get_indexer(question)
+    scored = (cols >= 0) & ~np.isnan(option)
+    submission, cols, option = submission[scored], cols[scored], option[scored].astype(np.int64)
+
+    # A response is correct when (question, option) is one of the key's correct pairs
+    correct_pairs = questions.get_indexer(key['question_id']).astype(np.int64) << 32 | key['option_id'].to_numpy(np.int64)
+    is_correct = np.isin(cols.astype(np.int64) << 32 | option, correct_pairs)
+
+    student_codes, students = pd.factorize(historical_quiz_df[STUDENT_COLUMN].astype(str), sort=True)
+    rows = student_codes[submission]
+
+    # Sum duplicate (student, question) entries: group on the flattened cell index
+    cells, inverse = np.unique(rows.astype(np.int64) * len(questions) + cols, return_inverse=True)
+    return ResponseMatrix(
+        students=pd.Index(students, name=STUDENT_COLUMN),
+        questions=pd.Index(questions, name='question_id'),
+        rows=cells // len(questions),
+        cols=cells % len(questions),
+        attempts=np.bincount(inverse, minlength=len(cells)).astype('float64'),
+        correct=np.bincount(inverse, weights=is_correct, minlength=len(cells)),
+    )
+
+def item_statistics(matrix, key, group=DISCRIMINATION_GROUP, min_students=MIN_ITEM_STUDENTS):
+    """
+    Classical item analysis per question.
+    :param matrix: ResponseMatrix - Output of response_matrix().
+    :param key: pd.DataFrame - Output of answer_key(), for the question topics.
+    :param group: float - Share of students in each of the upper and lower score groups.
+    :return: pd.DataFrame - One row per question: topic, students, responses,
+        difficulty (share of responses correct; higher is easier), discrimination
+        (difficulty in the upper minus the lower score group) and point_biserial
+        (correlation of a student's result on the question with their score on the other questions).
+    """
+    cell_score = matrix.correct / matrix.attempts
+    students = matrix.col_sums(np.ones_like(cell_score))
+    responses = matrix.col_sums(matrix.attempts)
+    difficulty = matrix.col_sums(matrix.correct) / np.where(responses > 0, responses, np.nan)
+
+    # Student ability: share correct over every scored response
+    student_correct, student_attempts = matrix.row_sums(matrix.correct), matrix.row_sums(matrix.attempts)
+    ability = student_correct / np.where(student_attempts > 0, student_attempts, np.nan)
+
+    # Upper-lower discrimination index over the top and bottom `group` of students by ability
+    ranks = pd.Series(ability).rank(method='first', pct=True).to_numpy()
+    upper, lower = (ranks > 1 - group)[matrix.rows], (ranks <= group)[matrix.rows]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        discrimination = (matrix.col_sums(matrix.correct * upper) / matrix.col_sums(matrix.attempts * upper)
+                          - matrix.col_sums(matrix.correct * lower) / matrix.col_sums(matrix.attempts * lower))
+
+    # Corrected item-total correlation: the question's own responses are left out of the rest score
+    rest_attempts = student_attempts[matrix.rows] - matrix.attempts
+    rest_score = np.where(rest_attempts > 0, (student_correct[matrix.rows] - matrix.correct)
+                          / np.where(rest_attempts > 0, rest_attempts, 1), np.nan)
+    valid = ~np.isnan(rest_score)
+    x, y = np.where(valid, cell_score, 0.0), np.where(valid, rest_score, 0.0)
+    n = matrix.col_sums(valid.astype('float64'))
+    sx, sy = matrix.col_sums(x), matrix.col_sums(y)
+    cov = n * matrix.col_sums(x * y) - sx * sy
+    var = (n * matrix.col_sums(x * x) - sx * sx) * (n * matrix.col_sums(y * y) - sy * sy)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        point_biserial = np.where(var > 0, cov / np.sqrt(np.where(var > 0, var, 1)), np.nan)
+
+    topics = key.drop_duplicates('question_id').set_index('question_id')['topic']
+    enough = students >= min_students
+    return pd.DataFrame({
+        'question_id': matrix.questions,
+        'topic': topics.reindex(matrix.questions).to_numpy(),
+        'students': students.astype('int64'),
+        'responses': responses.astype('int64'),
+        'difficulty': difficulty,
+        'discrimination': np.where(enough, discrimination, np.nan),
+        'point_biserial': np.where(enough, point_biserial, np.nan),
+    })
+
+def topic_mastery(matrix, key):
+    """
+    Per-student mastery of every topic they answered keyed questions in.
+    :param matrix: ResponseMatrix - Output of response_matrix().
+    :param key: pd.DataFrame - Output of answer_key(), for the question topics.
+    :return: pd.DataFrame - Columns user_id, topic, attempts, correct and mastery (share correct).
+    """
+    topic_codes, topics = pd.factorize(
+        key.drop_duplicates('question_id').set_index('question_id')['topic'].reindex(matrix.questions))
+    # Collapse question columns onto topic columns: one entry per (student, topic)
+    cells, inverse = np.unique(matrix.rows.astype(np.int64) * len(topics) + topic_codes[matrix.cols],
+                               return_inverse=True)
+    attempts = np.bincount(inverse, weights=matrix.attempts, minlength=len(cells))
+    correct = np.bincount(inverse, weights=matrix.correct, minlength=len(cells))
+    return pd.DataFrame({
+        STUDENT_COLUMN: matrix.students[cells // len(topics)],
+        'topic': topics[cells % len(topics)],
+        'attempts': attempts.astype('int64'),
+        'correct': correct.astype('int64'),
+        'mastery': correct / attempts,
+    })
+
+@instrument("analyze_items", is_failure=lambda analysis: analysis is None)
+def analyze_items(historical_quiz_df, quiz_df):
+    """
+    Item-level analysis of the response maps against the quiz endpoint's answer key.
+    :param historical_quiz_df: pd.DataFrame - Preprocessed historical quiz data.
+    :param quiz_df: pd.DataFrame - Preprocessed quiz endpoint data (carries the questions).
+    :return: dict - 'matrix', 'item_statistics' and 'topic_mastery', or None without scorable responses.
+    """
+    if historical_quiz_df is None or historical_quiz_df.empty or quiz_df is None:
+        logger.warning("Item analysis needs historical submissions and quiz questions.")
+        return None
+    if 'response_map' not in historical_quiz_df.columns or STUDENT_COLUMN not in historical_quiz_df.columns:
+        logger.warning(f"Item analysis needs 'response_map' and '{STUDENT_COLUMN}' columns.")
+        return None
+
+    try:
+        key = answer_key(quiz_df)
+        if key.empty:
+            logger.warning("The quiz data has no questions with correct options.")
+            return None
+        matrix = response_matrix(historical_quiz_df, key)
+        if len(matrix.rows) == 0:
+            logger.warning("No responses to questions in the answer key.")
+            return None
+
+        logger.info(f"Item analysis complete: {matrix.shape[0]} students x {matrix.shape[1]} questions, "
+                    f"{len(matrix.rows)} answered pairs.")
+        return {
+            "matrix": matrix,
+            "item_statistics": item_statistics(matrix, key),
+            "topic_mastery": topic_mastery(matrix, key),
+        }
+
+    except Exception as e:
+        logger.error(f"Error analyzing items: {e}")
+        return None
+
+def student_item_report(item_analysis, user_id, max_questions=MAX_REVIEW_QUESTIONS, weak_below=WEAK_MASTERY_BELOW):
+    """
+    Item-level recommendations for one student.
+    :param item_analysis: dict - Output of analyze_items().
+    :param user_id: str - Student to report on.
+    :return: dict - topic_mastery (weakest first), weak_topics and questions_to_review (questions
+        answered incorrectly, those most students get right first), or None for an unknown student.
+    """
+    matrix = item_analysis["matrix"]
+    row = matrix.students.get_indexer([str(user_id)])[0]
+    if row < 0:
+        return None
+
+    mastery = item_analysis["topic_mastery"]
+    mastery = mastery[mastery[STUDENT_COLUMN] == str(user_id)].sort_values('mastery', kind='mergesort')
+
+    # This student's entries of the matrix, and the questions they missed at least once
+    entries = matrix.rows == row
+    missed = matrix.cols[entries][matrix.correct[entries] < matrix.attempts[entries]]
+    statistics = item_analysis["item_statistics"].iloc[missed]
+    review = statistics.sort_values('difficulty', ascending=False, kind='mergesort').head(max_questions)
+
+    return {
+        "topic_mastery": [
+            {"topic": topic, "attempts": int(attempts), "mastery": round(float(value) * 100, 2)}
+            for topic, attempts, value in zip(mastery['topic'], mastery['attempts'], mastery['mastery'])
+        ],
+        "weak_topics": mastery.loc[mastery['mastery'] < weak_below, 'topic'].tolist(),
+        "questions_to_review": [
+            {"question_id": int(question_id), "topic": topic, "cohort_difficulty": round(float(difficulty) * 100, 2)}
+            for question_id, topic, difficulty in zip(review['question_id'], review['topic'], review['difficulty'])
+        ],
+    }
+
+def item_table(item_analysis):
+    """
+    Item statistics for the API, rounded, hardest questions first.
+    :param item_analysis: dict - Output of analyze_items(), or None.
+    :return: pd.DataFrame - Rounded item statistics, or None.
+    """
+    if item_analysis is None:
+        return None
+    table = item_analysis["item_statistics"].sort_values('difficulty', kind='mergesort')
+    return table.round({'difficulty': 3, 'discrimination': 3, 'point_biserial': 3}).reset_index(drop=True)
@@ -0,0 +1,621 @@
+import logging
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from analysis.analyze_performance import STUDENT_COLUMN
+from analysis.recommendations import DEFAULT_RULES
+from monitoring.metrics import instrument
+
+logger = logging.getLogger(__name__)
+
+# Feature kind -> (report in the batched analysis, its label column, the history column it comes from)
+FEATURE_SOURCES = {
+    'topic': ('topic_accuracy', 'topic', 'topic'),
+    'difficulty': ('difficulty_performance', 'difficulty_level', 'difficulty_level'),
+}
+
+# Cohorts up to this size are searched exactly; larger ones through the partitioned (IVF) index
+EXACT_SEARCH_MAX = 20000
+
+# Partitioned index: k-means cells trained on a sample, and the cells scanned per query
+KMEANS_SAMPLE = 20000
+KMEANS_ITERATIONS = 10
+N_PROBE = 16
+
+# Rows assigned to cells per batch, which bounds the rows x cells distance matrix
+ASSIGN_BATCH_ROWS = 16384
+
+INITIAL_CAPACITY = 1024
+INDEX_VERSION = 1
+
+# Where the shared pipeline persists its peer model, keyed by the data it was built from
+PEER_MODEL_PATH = os.environ.get("QUIZ_PEER_MODEL", ".cache/peer_model.npz")
+
+# Submissions inserted through add_submissions() between saves of a persisted model
+SAVE_EVERY = int(os.environ.get("QUIZ_PEER_MODEL_SAVE_EVERY", 100))
+
+# Peer recommendation settings
+DEFAULT_PEERS = 10
+MAX_PEERS = 100
+MIN_IMPROVEMENT_ATTEMPTS = 2
+MIN_PEER_IMPROVEMENT = 5.0
+MAX_PEER_SUGGESTIONS = 3
+
+# Label preprocessing gives missing topics/levels; never suggested
+UNKNOWN_LABEL = 'Unknown'
+
+def _split_feature(name):
+    kind, _, label = name.partition(':')
+    return kind, label
+
+class PeerIndex:
+    """
+    In-memory nearest-neighbour index over student vectors (squared Euclidean distance).
+
+    Small cohorts are searched exactly with one matrix-vector product. Once the index
+    holds more than exact_max vectors it trains k-means cells and a query only scans
+    the n_probe cells closest to it (an inverted file index). Vectors can be added or
+    replaced one at a time; cells are retrained when the index has doubled in size.
+    """
+
+    def __init__(self, features, exact_max=EXACT_SEARCH_MAX, n_probe=N_PROBE, seed=0):
+        self.features = list(features)
+        self.exact_max = exact_max
+        self.n_probe = n_probe
+        self.seed = seed
+        self.ids = []
+        self._rows = {}
+        self._vectors = np.empty((INITIAL_CAPACITY, len(self.features)), dtype=np.float32)
+        self._sq_norms = np.empty(INITIAL_CAPACITY, dtype=np.float32)
+        self._cells = np.empty(INITIAL_CAPACITY, dtype=np.int32)
+        self.centroids = None
+        self._trained_size = 0
+        self._lists = []
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, student_id):
+        return str(student_id) in self._rows
+
+    @property
+    def partitioned(self):
+        return self.centroids is not None
+
+    def _reserve(self, size):
+        capacity = len(self._vectors)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        self._vectors = np.resize(self._vectors, (capacity, len(self.features)))
+        self._sq_norms = np.resize(self._sq_norms, capacity)
+        self._cells = np.resize(self._cells, capacity)
+
+    def add(self, student_ids, vectors):
+        """
+        Insert vectors, replacing the vector of any student already in the index.
+        :param student_ids: list - Student ids, one per row of vectors.
+        :param vectors: np.ndarray - Rows in the order of self.features.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, len(self.features))
+        student_ids = [str(student_id) for student_id in student_ids]
+        with self._lock:
+            rows = np.empty(len(student_ids), dtype=np.int64)
+            for i, student_id in enumerate(student_ids):
+                row = self._rows.get(student_id)
+                if row is None:
+                    row = self._rows[student_id] = len(self.ids)
+                    self.ids.append(student_id)
+                elif self.partitioned:
+                    self._remove_from_cell(row)
+                rows[i] = row
+            self._reserve(len(self.ids))
+            self._vectors[rows] = vectors
+            self._sq_norms[rows] = np.einsum('ij,ij->i', vectors, vectors)
+
+            if self.partitioned and len(self.ids) < 2 * self._trained_size:
+                cells = self._assign(vectors)
+                self._cells[rows] = cells
+                for row, cell in zip(rows.tolist(), cells.tolist()):
+                    self._pending[cell].append(row)
+            elif len(self.ids) > self.exact_max:
+                self._train()
+
+    def row(self, student_id):
+        """
+        The row of a student (rows are numbered in insertion order), or None if not in the index.
+        """
+        return self._rows.get(str(student_id))
+
+    def vector(self, student_id):
+        """
+        The stored vector of a student, or None if the student is not in the index.
+        """
+        row = self._rows.get(str(student_id))
+        return self._vectors[row].copy() if row is not None else None
+
+    def query(self, vector, k=DEFAULT_PEERS, exclude=()):
+        """
+        The k nearest students to a vector.
+        :param vector: np.ndarray - Query vector in the order of self.features.
+        :param k: int - Number of neighbours.
+        :param exclude: iterable - Student ids to leave out (e.g. the student asking).
+        :return: list - (student_id, squared distance) pairs, nearest first.
+        """
+        vector = np.asarray(vector, dtype=np.float32)
+        excluded = [self._rows[str(student_id)] for student_id in exclude if str(student_id) in self._rows]
+        with self._lock:
+            if self.partitioned:
+                cell_distances = ((self.centroids - vector) ** 2).sum(axis=1)
+                probed = np.argsort(cell_distances)[:self.n_probe]
+                rows = np.concatenate([self._cell_rows(cell) for cell in probed.tolist()])
+            else:
+                rows = np.arange(len(self.ids))
+            if excluded:
+                rows = rows[~np.isin(rows, excluded)]
+            distances = self._sq_norms[rows] - 2 * (self._vectors[rows] @ vector) + vector @ vector
+
+        if len(rows) > k:
+            nearest = np.argpartition(distances, k)[:k]
+            rows, distances = rows[nearest], distances[nearest]
+        order = np.argsort(distances, kind='stable')
+        return [(self.ids[row], max(float(distance), 0.0))
+                for row, distance in zip(rows[order].tolist(), distances[order].tolist())]
+
+    def _cell_rows(self, cell):
+        # Fold rows inserted since the last query into the cell's row array
+        if self._pending[cell]:
+            self._lists[cell] = np.concatenate([self._lists[cell], np.asarray(self._pending[cell], dtype=np.int64)])
+            self._pending[cell] = []
+        return self._lists[cell]
+
+    def _remove_from_cell(self, row):
+        cell = int(self._cells[row])
+        rows = self._cell_rows(cell)
+        self._lists[cell] = rows[rows != row]
+
+    def _assign(self, vectors):
+        cells = np.empty(len(vectors), dtype=np.int32)
+        centroid_norms = (self.centroids ** 2).sum(axis=1)
+        for start in range(0, len(vectors), ASSIGN_BATCH_ROWS):
+            batch = vectors[start:start + ASSIGN_BATCH_ROWS]
+            cells[start:start + len(batch)] = np.argmin(centroid_norms - 2 * (batch @ self.centroids.T), axis=1)
+        return cells
+
+    def _train(self):
+        """
+        Train k-means cells (about sqrt(n) of them) on a sample and rebuild the cell lists.
+        """
+        size = len(self.ids)
+        vectors = self._vectors[:size]
+        rng = np.random.default_rng(self.seed)
+        sample = vectors[rng.choice(size, min(size, KMEANS_SAMPLE), replace=False)]
+        n_cells = max(1, min(int(np.sqrt(size)), len(sample)))
+
+        self.centroids = sample[rng.choice(len(sample), n_cells, replace=False)].copy()
+        for _ in range(KMEANS_ITERATIONS):
+            cells = self._assign(sample)
+            counts = np.bincount(cells, minlength=n_cells)
+            sums = np.stack([np.bincount(cells, weights=sample[:, j], minlength=n_cells)
+                             for j in range(sample.shape[1])], axis=1)
+            filled = counts > 0  # empty cells keep their previous centroid
+            self.centroids[filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+
+        self._set_cells(self._assign(vectors))
+        self._trained_size = size
+        logger.info(f"Peer index partitioned: {size} students in {n_cells} cells.")
+
+    def _set_cells(self, cells):
+        self._cells[:len(cells)] = cells
+        order = np.argsort(cells, kind='stable')
+        bounds = np.cumsum(np.bincount(cells, minlength=len(self.centroids)))[:-1]
+        self._lists = np.split(order.astype(np.int64), bounds)
+        self._pending = [[] for _ in self._lists]
+
+    def to_arrays(self):
+        """
+        The index as a dict of plain arrays, for np.savez (no pickled objects).
+        """
+        with self._lock:
+            size = len(self.ids)
+            return {
+                "version": np.array(INDEX_VERSION),
+                "features": np.array(self.features, dtype=str),
+                "ids": np.array(self.ids, dtype=str),
+                "vectors": self._vectors[:size].copy(),
+                "cells": self._cells[:size].copy() if self.partitioned else np.empty(0, dtype=np.int32),
+                "centroids": self.centroids if self.partitioned else np.empty((0, len(self.features)), np.float32),
+                "settings": np.array([self.exact_max, self.n_probe, self.seed, self._trained_size]),
+            }
+
+    @classmethod
+    def from_arrays(cls, data):
+        """
+        Rebuild an index from to_arrays() output (or an opened .npz file holding it).
+        :raises ValueError: For arrays written by another index version.
+        """
+        if int(data['version']) != INDEX_VERSION:
+            raise ValueError(f"Unsupported peer index version {int(data['version'])}")
+        exact_max, n_probe, seed, trained_size = (int(value) for value in data['settings'])
+        index = cls(data['features'].tolist(), exact_max=exact_max, n_probe=n_probe, seed=seed)
+        index.ids = data['ids'].tolist()
+        index._rows = {student_id: row for row, student_id in enumerate(index.ids)}
+        vectors = data['vectors']
+        index._reserve(len(vectors))
+        index._vectors[:len(vectors)] = vectors
+        index._sq_norms[:len(vectors)] = np.einsum('ij,ij->i', vectors, vectors)
+        if len(data['centroids']):
+            index.centroids = data['centroids']
+            index._trained_size = trained_size
+            index._set_cells(data['cells'])
+        return index
+
+    def save(self, path):
+        """
+        Write the index to an .npz file (no pickled objects).
+        """
+        np.savez(path, **self.to_arrays())
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read an index written by save().
+        :raises ValueError: For files written by another index version.
+        """
+        with np.load(path, allow_pickle=False) as data:
+            return cls.from_arrays(data)
+
+def _codes(values):
+    # Integer codes and string labels; categoricals are factorized without touching every string
+    codes, uniques = pd.factorize(values)
+    return codes, pd.Index(uniques).astype(str)
+
+def student_vectors(student_analysis):
+    """
+    Embed every student as their topic and difficulty accuracies (0-1).
+    A student's missing features are filled with their own mean accuracy, so
+    unattempted topics do not read as 0% or pull peers apart.
+    :param student_analysis: dict - Batched output of analyze_all(..., by_student=True).
+    :return: tuple - (student ids, feature names, np.ndarray of shape students x features).
+    """
+    parts = []
+    for kind, (report, label_column, _) in FEATURE_SOURCES.items():
+        frame = student_analysis.get(report)
+        if frame is not None and not frame.empty:
+            parts.append((kind, _codes(frame[STUDENT_COLUMN]), _codes(frame[label_column]),
+                          frame['average_accuracy'].to_numpy(dtype='float64') / 100))
+    if not parts:
+        return [], [], np.empty((0, 0), dtype=np.float32)
+
+    students = pd.Index(np.concatenate([users.to_numpy() for _, (_, users), _, _ in parts])).unique()
+    features = pd.Index(sorted(f"{kind}:{label}" for kind, _, (_, labels), _ in parts for label in labels))
+    vectors = np.full((len(students), len(features)), np.nan)
+    for kind, (user_codes, users), (label_codes, labels), accuracy in parts:
+        rows = students.get_indexer(users)[user_codes]
+        columns = features.get_indexer(kind + ':' + labels)[label_codes]
+        vectors[rows, columns] = accuracy
+
+    known = ~np.isnan(vectors)
+    row_means = np.nansum(vectors, axis=1) / np.maximum(known.sum(axis=1), 1)
+    vectors = np.where(known, vectors, row_means[:, None])
+    return list(students), list(features), vectors.astype(np.float32)
+
+def improvement_frame(historical_quiz_df, min_attempts=MIN_IMPROVEMENT_ATTEMPTS):
+    """
+    How much each student improved in each topic and difficulty level: mean accuracy
+    over the later half of their attempts minus the earlier half.
+    :param historical_quiz_df: pd.DataFrame - Preprocessed historical quiz data.
+    :param min_attempts: int - Fewer attempts at a topic/level give no improvement.
+    :return: pd.DataFrame - Columns user_id, feature, attempts and improvement (percentage points);
+        each student's rows are contiguous.
+    """
+    history = historical_quiz_df.sort_values('submitted_at', kind='mergesort')
+    accuracy = pd.to_numeric(history['accuracy_percentage'], errors='coerce').to_numpy(dtype='float64')
+    student_codes, students = _codes(history[STUDENT_COLUMN])
+
+    parts = []
+    for kind, (_, _, column) in FEATURE_SOURCES.items():
+        if column not in history.columns:
+            continue
+        label_codes, labels = _codes(history[column])
+        # Rows without a student or label (code -1) belong to no group
+        rows = np.flatnonzero((student_codes >= 0) & (label_codes >= 0))
+        # One key per (student, label); a stable sort keeps each group's attempts in time order
+        keys = student_codes[rows].astype(np.int64) * len(labels) + label_codes[rows]
+        sort = np.argsort(keys, kind='stable')
+        order = rows[sort]
+        groups, group_ids, size = np.unique(keys[sort], return_inverse=True, return_counts=True)
+        starts = np.concatenate([[0], np.cumsum(size)[:-1]])
+        position = np.arange(len(order)) - starts[group_ids]
+        n = size[group_ids]
+        # Odd counts leave the middle attempt out of both halves
+        values = accuracy[order]
+        scored = ~np.isnan(values)
+        early, late = scored & (position < n // 2), scored & (position >= n - n // 2)
+
+        def half_mean(mask):
+            return (np.bincount(group_ids, weights=np.where(mask, values, 0.0), minlength=len(groups))
+                    / np.maximum(np.bincount(group_ids, weights=mask, minlength=len(groups)), 1))
+
+        improvement = half_mean(late) - half_mean(early)
+        kept = size >= min_attempts
+        parts.append(pd.DataFrame({
+            'student_code': groups[kept] // len(labels),
+            'feature': (kind + ':' + labels[groups[kept] % len(labels)]).to_numpy(),
+            'attempts': size[kept],
+            'improvement': improvement[kept],
+        }))
+
+    if not parts:
+        return pd.DataFrame(columns=[STUDENT_COLUMN, 'feature', 'attempts', 'improvement'])
+    frame = pd.concat(parts, ignore_index=True).sort_values('student_code', kind='mergesort')
+    frame.insert(0, STUDENT_COLUMN, students[frame['student_code'].to_numpy()])
+    return frame.drop(columns='student_code').reset_index(drop=True)
+
+def feature_counts(historical_quiz_df, students, features):
+    """
+    Scored attempts per student and feature: the weights that let add_submissions()
+    update a student's accuracies without the history.
+    :param historical_quiz_df: pd.DataFrame - Preprocessed historical quiz data.
+    :param students: list - Student ids (rows), as returned by student_vectors.
+    :param features: list - Feature names (columns), as returned by student_vectors.
+    :return: np.ndarray - int32 counts of shape students x features.
+    """
+    scored = pd.to_numeric(historical_quiz_df['accuracy_percentage'], errors='coerce').notna().to_numpy()
+    student_codes, users = _codes(historical_quiz_df[STUDENT_COLUMN])
+    rows = np.where(student_codes >= 0, pd.Index(students).get_indexer(users)[student_codes], -1)
+
+    flat = []
+    for kind, (_, _, column) in FEATURE_SOURCES.items():
+        if column not in historical_quiz_df.columns:
+            continue
+        label_codes, labels = _codes(historical_quiz_df[column])
+        columns = np.where(label_codes >= 0, pd.Index(features).get_indexer(kind + ':' + labels)[label_codes], -1)
+        kept = scored & (rows >= 0) & (columns >= 0)
+        flat.append(rows[kept].astype(np.int64) * len(features) + columns[kept])
+    counts = np.bincount(np.concatenate(flat) if flat else np.empty(0, dtype=np.int64),
+                         minlength=len(students) * len(features))
+    return counts.reshape(len(students), len(features)).astype(np.int32)
+
+def _peer_model(index, counts, improvements, key=None):
+    """
+    Assemble the peer model dict around an index and its improvements.
+    """
+    # Each student's improvements are one contiguous slice of the sorted frame
+    codes, uniques = pd.factorize(improvements[STUDENT_COLUMN])
+    starts = np.searchsorted(codes, np.arange(len(uniques)))
+    stops = np.append(starts[1:], len(codes))
+    return {
+        "index": index,
+        "counts": counts,
+        "improvements": improvements,
+        "offsets": dict(zip(uniques, zip(starts.tolist(), stops.tolist()))),
+        "feature_codes": pd.Index(index.features).get_indexer(improvements['feature']),
+        "key": key,
+        "unsaved": 0,
+        "lock": threading.Lock(),
+    }
+
+@instrument("build_peer_model")
+def build_peer_model(student_analysis, historical_quiz_df, exact_max=EXACT_SEARCH_MAX, key=None):
+    """
+    Index every student's vector and precompute per-student improvements for peer recommendations.
+    :param student_analysis: dict - Batched output of analyze_all(..., by_student=True).
+    :param historical_quiz_df: pd.DataFrame - Preprocessed historical quiz data.
+    :param key: str - Identifies the data the model is built from, for save_peer_model/load_peer_model.
+    :return: dict - 'index' (PeerIndex), 'counts' (see feature_counts, rows in index order),
+        'improvements' (see improvement_frame), 'offsets' (user_id -> (start, stop) rows in
+        improvements) and 'feature_codes' (each improvement's position in index.features, -1 if
+        not indexed), or None without student data.
+    """
+    if historical_quiz_df is None or historical_quiz_df.empty or STUDENT_COLUMN not in historical_quiz_df.columns:
+        logger.warning(f"Peer recommendations need historical data with a '{STUDENT_COLUMN}' column.")
+        return None
+
+    try:
+        students, features, vectors = student_vectors(student_analysis)
+        if not students:
+            logger.warning("No student vectors to index.")
+            return None
+        index = PeerIndex(features, exact_max=exact_max)
+        index.add(students, vectors)
+        counts = feature_counts(historical_quiz_df, students, features)
+
+        logger.info(f"Peer index built: {len(index)} students, {len(features)} features.")
+        return _peer_model(index, counts, improvement_frame(historical_quiz_df), key)
+
+    except Exception as e:
+        logger.error(f"Error building peer model: {e}")
+        return None
+
+def save_peer_model(peer_model, path=PEER_MODEL_PATH):
+    """
+    Write a peer model (index, counts, improvements and key) to an .npz file, atomically.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    improvements = peer_model["improvements"]
+    with peer_model["lock"]:
+        arrays = peer_model["index"].to_arrays()
+        arrays["counts"] = peer_model["counts"][:len(arrays["ids"])].copy()
+        unsaved, peer_model["unsaved"] = peer_model["unsaved"], 0
+    try:
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                key=np.array(peer_model["key"] or "", dtype=str),
+                improvement_users=improvements[STUDENT_COLUMN].to_numpy(dtype=str),
+                improvement_features=improvements['feature'].to_numpy(dtype=str),
+                improvement_attempts=improvements['attempts'].to_numpy(dtype=np.int64),
+                improvement_values=improvements['improvement'].to_numpy(dtype=np.float64),
+                **arrays,
+            )
+        os.replace(tmp_path, path)
+    except OSError:
+        # Still unsaved, so the next insert past SAVE_EVERY tries again
+        with peer_model["lock"]:
+            peer_model["unsaved"] += unsaved
+        raise
+
+def load_peer_model(path=PEER_MODEL_PATH, key=None):
+    """
+    Read a peer model written by save_peer_model.
+    :param key: str - Only return the model if it was built from the data with this key.
+    :return: dict - The peer model, or None if the file is missing, unreadable or for other data.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if key is not None and str(data['key']) != key:
+                return None
+            index = PeerIndex.from_arrays(data)
+            improvements = pd.DataFrame({
+                STUDENT_COLUMN: data['improvement_users'].astype(object),
+                'feature': data['improvement_features'].astype(object),
+                'attempts': data['improvement_attempts'],
+                'improvement': data['improvement_values'],
+            })
+            counts = data['counts']
+    except (OSError, KeyError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable peer model at {path}: {e}")
+        return None
+    logger.info(f"Peer model loaded from {path}: {len(index)} students.")
+    return _peer_model(index, counts, improvements, key)
+
+def load_or_build_peer_model(build, key, path=PEER_MODEL_PATH):
+    """
+    Load the persisted peer model for the data identified by key, or build and persist it.
+    :param build: callable - Takes the key and returns a fresh peer model (or None).
+    :param key: str - Identifies the data the model is built from.
+    :param path: str - Location of the persisted model.
+    :return: dict - The peer model, or None without student data.
+    """
+    peer_model = load_peer_model(path, key)
+    if peer_model is None:
+        peer_model = build(key)
+        if peer_model is not None:
+            save_peer_model(peer_model, path)
+    return peer_model
+
+def _updated_vector(vector, counts, column, accuracy):
+    """
+    A student's vector after one more scored attempt at feature `column`. Features the
+    student has no attempts at take the mean of the others, as in student_vectors.
+    """
+    known = counts > 0
+    means = np.where(known, vector, 0.0).astype('float64')
+    means[column] = (means[column] * counts[column] + accuracy) / (counts[column] + 1)
+    counts[column] += 1
+    known[column] = True
+    return np.where(known, means, means[known].mean()).astype(np.float32)
+
+def add_submissions(peer_model, records, path=None):
+    """
+    Insert new submissions into a built peer model without rebuilding it: each student's
+    vector is updated (new students are added) and queries see them right away. Topics
+    and levels the index has no feature for are skipped; improvements are left as built.
+    :param peer_model: dict - Output of build_peer_model() or load_peer_model().
+    :param records: list of dict - Submissions as returned by incremental.parse_submission().
+    :param path: str - Also persist the model there once SAVE_EVERY submissions are unsaved.
+    :return: int - Number of submissions inserted.
+    """
+    index = peer_model["index"]
+    features = pd.Index(index.features)
+    inserted = 0
+    with peer_model["lock"]:
+        for record in records:
+            columns = [features.get_loc(name) for name in
+                       (f"{kind}:{record[column]}" for kind, (_, _, column) in FEATURE_SOURCES.items())
+                       if name in features]
+            if record.get('user_id') is None or not columns:
+                continue
+
+            row = index.row(record['user_id'])
+            if row is None:
+                vector, counts = np.zeros(len(features), dtype=np.float32), np.zeros(len(features), dtype=np.int32)
+            else:
+                vector, counts = index.vector(record['user_id']), peer_model["counts"][row].copy()
+            for column in columns:
+                vector = _updated_vector(vector, counts, column, record['accuracy'] / 100)
+            index.add([record['user_id']], vector[None, :])
+
+            row = index.row(record['user_id'])
+            if row >= len(peer_model["counts"]):
+                grown = np.zeros((max(2 * len(peer_model["counts"]), row + 1), len(features)), dtype=np.int32)
+                grown[:len(peer_model["counts"])] = peer_model["counts"]
+                peer_model["counts"] = grown
+            peer_model["counts"][row] = counts
+            inserted += 1
+        peer_model["unsaved"] += inserted
+        save = path is not None and peer_model["unsaved"] >= SAVE_EVERY
+    if save:
+        # The in-memory model is already updated; a later insert retries the save
+        try:
+            save_peer_model(peer_model, path)
+        except OSError as e:
+            logger.warning(f"Could not save the peer model to {path}: {e}")
+    return inserted
+
+def peer_recommendations(peer_model, user_id, k=DEFAULT_PEERS, min_improvement=MIN_PEER_IMPROVEMENT,
+                         max_suggestions=MAX_PEER_SUGGESTIONS, strong_from=DEFAULT_RULES['strong_topic_from']):
+    """
+    Topics and difficulty levels where the student's nearest peers improved most.
+    Peers are weighted by similarity (1 / (1 + distance)); features the student
+    already scores strong_from or more in are not suggested.
+    :param peer_model: dict - Output of build_peer_model().
+    :param user_id: str - Student to recommend for.
+    :param k: int - Number of peers.
+    :return: dict - similar_students, topics and difficulty_levels (each with the weighted
+        peer_improvement in percentage points and the number of peers behind it), or None
+        for a student who is not in the index.
+    """
+    index = peer_model["index"]
+    vector = index.vector(user_id)
+    if vector is None:
+        return None
+    neighbours = index.query(vector, k=k, exclude=[user_id])
+
+    improvements = peer_model["improvements"]
+    slices = [(peer_model["offsets"].get(peer), 1 / (1 + np.sqrt(distance))) for peer, distance in neighbours]
+    slices = [(bounds, weight) for bounds, weight in slices if bounds is not None]
+    suggestions = {kind: [] for kind in FEATURE_SOURCES}
+    if slices:
+        rows = np.concatenate([np.arange(start, stop) for (start, stop), _ in slices])
+        weights = np.concatenate([np.full(stop - start, weight) for (start, stop), weight in slices])
+        codes = peer_model["feature_codes"][rows]
+        known = codes >= 0
+        codes, weights, gains = codes[known], weights[known], improvements['improvement'].to_numpy()[rows][known]
+
+        # Similarity-weighted mean improvement per feature
+        n_features = len(index.features)
+        weight_sums = np.bincount(codes, weights=weights, minlength=n_features)
+        peer_counts = np.bincount(codes, minlength=n_features)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            peer_improvement = np.bincount(codes, weights=gains * weights, minlength=n_features) / weight_sums
+        own = vector.astype('float64') * 100
+
+        candidates = np.flatnonzero((peer_counts > 0) & (peer_improvement >= min_improvement) & (own < strong_from))
+        for code in candidates[np.argsort(-peer_improvement[candidates], kind='stable')].tolist():
+            kind, label = _split_feature(index.features[code])
+            if kind in suggestions and label != UNKNOWN_LABEL and len(suggestions[kind]) < max_suggestions:
+                suggestions[kind].append({
+                    FEATURE_SOURCES[kind][1]: label,
+                    "your_accuracy": round(float(own[code]), 2),
+                    "peer_improvement": round(float(peer_improvement[code]), 2),
+                    "peers": int(peer_counts[code]),
+                })
+
+    return {
+        "similar_students": [{STUDENT_COLUMN: peer, "distance": round(float(np.sqrt(distance)), 4)}
+                             for peer, distance in neighbours],
+        "topics": suggestions['topic'],
+        "difficulty_levels": suggestions['difficulty'],
+        "summary": "Students with accuracy profiles like yours improved most in these topics and levels.",
+    }
@@ -0,0 +1,304 @@
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+from data.fetch_data import PAYLOAD_VERSION_ATTR, fetch_all_data
+from data.preprocess_data import (
+    enable_copy_on_write,
+    preprocess_current_quiz_data,
+    preprocess_historical_data,
+    preprocess_quiz_endpoint_data,
+)
+from data.snapshot import SNAPSHOT_DIR, load_snapshot, read_manifest
+from analysis.analyze_performance import analyze_all, daily_accuracy, daily_accuracy_by_student, split_by_student
+from analysis.item_analysis import analyze_items
+from analysis.peers import PEER_MODEL_PATH, build_peer_model, load_or_build_peer_model
+from analysis.recommendations import generate_recommendations
+from monitoring.memory import account_memory, format_memory_account
+from monitoring.metrics import get_registry, record_memory_account, stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Columns that change on every fetch without the upstream data changing
+VOLATILE_COLUMNS = ['processed_at']
+
+# Rows serialised per step when fingerprinting a frame
+FINGERPRINT_CHUNK_ROWS = 10000
+
+# Turn on pandas Copy-on-Write when the shared pipeline is created, so stages derive new
+# frames from shared ones without copying unchanged columns. It is a process-wide pandas
+# option, so the application opts in; it needs pandas >= 1.5 and is always on from 3.0.
+COPY_ON_WRITE = os.environ.get("QUIZ_COPY_ON_WRITE") == "1"
+
+# Log (and export to /metrics) the bytes allocated per stage on every run.
+# Uses tracemalloc, which slows runs down noticeably, so it is off by default.
+MEMORY_ACCOUNTING = os.environ.get("QUIZ_MEMORY_ACCOUNTING") == "1"
+
+
+def fingerprint_frame(df):
+    """
+    Compute a content fingerprint for a raw DataFrame by serialising every row.
+    Costs about as much as preprocessing the frame; frame_key() only falls back to it
+    for frames that were not built by the fetch layer.
+    :param df: pd.DataFrame or None - Raw data as returned by fetch_all_data.
+    :return: str - Hex digest that only changes when the data changes.
+    """
+    if df is None:
+        return "none"
+
+    stable = df.drop(columns=[c for c in VOLATILE_COLUMNS if c in df.columns])
+    # Serialise a block of rows at a time: one JSON string for the whole history
+    # would be the largest allocation of the request
+    digest = hashlib.sha256(str(list(stable.columns)).encode("utf-8"))
+    for start in range(0, len(stable), FINGERPRINT_CHUNK_ROWS):
+        chunk = stable.iloc[start:start + FINGERPRINT_CHUNK_ROWS]
+        digest.update(chunk.to_json(orient="split", date_format="iso", default_handler=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def frame_key(df):
+    """
+    Stage key for a raw DataFrame: the payload version the fetch layer recorded on it
+    (ETag or download id from the response cache), so a cache hit costs nothing.
+    Frames without one (built from payloads outside the cache) are fingerprinted.
+    :param df: pd.DataFrame or None - Raw data as returned by fetch_all_data.
+    :return: str - Key that changes whenever the data may have changed.
+    """
+    if df is None:
+        return "none"
+    version = df.attrs.get(PAYLOAD_VERSION_ATTR)
+    return f"version:{version}" if version is not None else fingerprint_frame(df)
+
+
+class LazyResults(Mapping):
+    """
+    Results of one pipeline run whose analysis entries are computed on first access.
+
+    Entries in `values` are ready; each entry in `factories` is computed (under the
+    pipeline lock, through its memoized stages) the first time it is read.
+    """
+
+    def __init__(self, values, factories, lock):
+        self._values = dict(values)
+        self._factories = dict(factories)
+        self._lock = lock
+
+    def __getitem__(self, key):
+        if key not in self._values:
+            if key not in self._factories:
+                raise KeyError(key)
+            with self._lock:
+                if key not in self._values:
+                    self._values[key] = self._factories[key]()
+        return self._values[key]
+
+    def __iter__(self):
+        yield from self._values
+        yield from (key for key in self._factories if key not in self._values)
+
+    def __len__(self):
+        return len(set(self._values) | set(self._factories))
+
+    def is_ready(self, key):
+        """
+        Whether key has been computed already (reading it would cost nothing).
+        """
+        return key in self._values
+
+
+class AnalysisPipeline:
+    """
+    Memoized fetch -> preprocess -> analyze -> recommend chain.
+
+    Every stage result is stored with the fingerprint of the input it was
+    built from, so a stage is only rebuilt when something upstream of it
+    actually changed. All callers share the same results.
+
+    Stages never modify their inputs and cached results are shared by every
+    caller, so callers must treat the returned frames as read-only.
+    """
+
+    def __init__(self, fetcher=fetch_all_data, snapshot_dir=None, peer_model_path=None):
+        self.fetcher = fetcher
+        self.snapshot_dir = snapshot_dir
+        # Persist the peer model there, so a restart on unchanged data does not rebuild it
+        self.peer_model_path = peer_model_path
+        # Re-entrant: lazy results take it again to build stages that depend on each other
+        self._lock = threading.RLock()
+        self._stages = {}
+        self._stats = {"runs": 0, "stage_hits": 0, "stage_builds": 0}
+
+    def _stage(self, name, key, build):
+        cached = self._stages.get(name)
+        if cached is not None and cached[0] == key:
+            self._stats["stage_hits"] += 1
+            return cached[1]
+
+        start = time.perf_counter()
+        value = build()
+        self._stages[name] = (key, value)
+        self._stats["stage_builds"] += 1
+        logger.info(f"Pipeline stage '{name}' rebuilt in {time.perf_counter() - start:.3f}s")
+        return value
+
+    def run(self, students=False, frames=None):
+        """
+        Fetch and preprocess the upstream data and return the (possibly cached) results.
+        Only fetching and preprocessing happen up front; the analysis and recommendation
+        entries of the returned LazyResults are built (or taken from the memo) when first read.
+        With QUIZ_MEMORY_ACCOUNTING=1 the bytes allocated by each stage are logged and exported as metrics.
+        :param students: bool - Also offer the batched per-student analysis, recommendations, daily totals
+            and peer model.
+        :param frames: tuple - Already fetched (quiz_df, current_quiz_df, historical_quiz_df), e.g. from
+            the async fetch path; the fetcher is skipped when given.
+        :return: LazyResults - Processed frames, analysis results, recommendations and the data fingerprint.
+        """
+        if not MEMORY_ACCOUNTING:
+            return self._run(students, frames)
+
+        with account_memory() as account:
+            results = self._run(students, frames)
+        report = account.report()
+        record_memory_account(report)
+        logger.info(f"Pipeline memory by stage:\n{format_memory_account(report)}")
+        return results
+
+    def _run(self, students=False, frames=None):
+        """
+        Body of run(), without memory accounting.
+        """
+        manifest = read_manifest(self.snapshot_dir) if self.snapshot_dir is not None else None
+        if manifest is None:
+            quiz_df, current_quiz_df, historical_quiz_df = frames if frames is not None else self.fetcher()
+
+        with self._lock:
+            self._stats["runs"] += 1
+            if manifest is not None:
+                # A snapshot replaces fetching and preprocessing; its file digests act as fingerprints
+                quiz_key, current_key, historical_key = (
+                    (manifest["frames"].get(name) or {}).get("fingerprint", "none")
+                    for name in ("quiz", "current_quiz", "historical_quiz"))
+                frames = self._stage(
+                    "snapshot", f"{quiz_key}:{current_key}:{historical_key}",
+                    lambda: load_snapshot(self.snapshot_dir, decode_json=False))
+                processed_quiz_df = frames["quiz"]
+                processed_current_quiz_df = frames["current_quiz"]
+                processed_historical_quiz_df = frames["historical_quiz"]
+            else:
+                with stage_timer("fingerprint"):
+                    quiz_key = frame_key(quiz_df)
+                    current_key = frame_key(current_quiz_df)
+                    historical_key = frame_key(historical_quiz_df)
+
+                processed_quiz_df = self._stage(
+                    "preprocess_quiz", quiz_key, lambda: preprocess_quiz_endpoint_data(quiz_df))
+                processed_current_quiz_df = self._stage(
+                    "preprocess_current", current_key, lambda: preprocess_current_quiz_data(current_quiz_df))
+                processed_historical_quiz_df = self._stage(
+                    "preprocess_historical", historical_key, lambda: preprocess_historical_data(historical_quiz_df))
+
+            # Analysis and recommendations only depend on the historical data
+            def analysis_results():
+                return self._stage("analyze", historical_key, lambda: analyze_all(processed_historical_quiz_df))
+
+            def student_analysis():
+                return self._stage("analyze_students", historical_key,
+                                   lambda: analyze_all(processed_historical_quiz_df, by_student=True))
+
+            factories = {
+                "analysis_results": analysis_results,
+                "recommendations": lambda: self._stage(
+                    "recommend", historical_key, lambda: generate_recommendations(analysis_results())),
+                # Per-day totals behind every trend request; buckets and windows are derived per request
+                "daily_accuracy": lambda: self._stage(
+                    "daily_accuracy", historical_key, lambda: daily_accuracy(processed_historical_quiz_df)),
+                # Scored against the quiz endpoint's answer key, so it also depends on the quiz data
+                "item_analysis": lambda: self._stage(
+                    "item_analysis", f"{quiz_key}:{historical_key}",
+                    lambda: analyze_items(processed_historical_quiz_df, processed_quiz_df)),
+            }
+            if students:
+                factories["student_analysis"] = lambda: self._stage(
+                    "split_students", historical_key, lambda: split_by_student(student_analysis()))
+                factories["student_recommendations"] = lambda: self._stage(
+                    "recommend_students", historical_key,
+                    lambda: generate_recommendations(student_analysis(), by_student=True))
+                # Per-student per-day totals behind /students/<id>/trends
+                factories["student_daily_accuracy"] = lambda: self._stage(
+                    "student_daily_accuracy", historical_key,
+                    lambda: daily_accuracy_by_student(processed_historical_quiz_df))
+
+                def peer_model():
+                    def build(key):
+                        return build_peer_model(student_analysis(), processed_historical_quiz_df, key=key)
+                    if self.peer_model_path is None:
+                        return build(historical_key)
+                    return load_or_build_peer_model(build, historical_key, self.peer_model_path)
+
+                factories["peer_model"] = lambda: self._stage("peer_model", historical_key, peer_model)
+
+            return LazyResults({
+                "quiz_df": processed_quiz_df,
+                "current_quiz_df": processed_current_quiz_df,
+                "historical_quiz_df": processed_historical_quiz_df,
+                "fingerprint": hashlib.sha256(
+                    f"{quiz_key}:{current_key}:{historical_key}".encode("utf-8")).hexdigest(),
+            }, factories, self._lock)
+
+    def cached(self, name):
+        """
+        The last built value of a stage, or None if it has not been built. For callers that
+        update a stage result in place (e.g. inserting new submissions into the peer model).
+        """
+        with self._lock:
+            cached = self._stages.get(name)
+            return cached[1] if cached is not None else None
+
+    def invalidate(self):
+        """
+        Drop every cached stage so the next run rebuilds from scratch.
+        """
+        with self._lock:
+            self._stages.clear()
+
+    def stats(self):
+        """
+        Return a snapshot of the run/hit/build counters.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline():
+    """
+    Return the process-wide pipeline shared by the API routes.
+    Set QUIZ_USE_SNAPSHOT=1 to serve from the preprocessed snapshot when one exists, and
+    QUIZ_COPY_ON_WRITE=1 to turn on pandas Copy-on-Write for the process.
+    """
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            if COPY_ON_WRITE and not enable_copy_on_write():
+                logger.warning("QUIZ_COPY_ON_WRITE=1 ignored: the installed pandas has no Copy-on-Write mode")
+            snapshot_dir = SNAPSHOT_DIR if os.environ.get("QUIZ_USE_SNAPSHOT") == "1" else None
+            _pipeline = AnalysisPipeline(snapshot_dir=snapshot_dir, peer_model_path=PEER_MODEL_PATH)
+        return _pipeline
+
+
+def _collect_pipeline_metrics():
+    if _pipeline is None:
+        return
+    stats = _pipeline.stats()
+    yield ("quiz_pipeline_runs_total", "counter", "AnalysisPipeline.run calls.", [({}, stats["runs"])])
+    yield ("quiz_pipeline_stage_results_total", "counter", "Pipeline stages served from memo or rebuilt.",
+           [({"result": "hit"}, stats["stage_hits"]), ({"result": "build"}, stats["stage_builds"])])
+
+
+get_registry().register_collector(_collect_pipeline_metrics)
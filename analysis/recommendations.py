@@ -1,59 +1,150 @@
 import logging
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+import pandas as pd
+
+from analysis.analyze_performance import STUDENT_COLUMN
+from monitoring.metrics import instrument
+
 logger = logging.getLogger(__name__)
 
-def generate_recommendations(analysis_results):
+# Thresholds (accuracy percentages) and messages used by the recommendation rules.
+# Pass a dict with any subset of these keys as `rules` to override them.
+DEFAULT_RULES = {
+    "weak_topic_below": 60,
+    "strong_topic_from": 80,
+    "difficulty_focus_below": 60,
+    "weak_topics_action": "Focus on these topics with additional practice.",
+    "strong_topics_action": "Keep revising these topics to maintain your strength.",
+    "difficulty_focus": "Work on improving performance for specific difficulty levels.",
+    "overall_performance": ("Your current cumulative accuracy is {accuracy:.2f}%. "
+                            "Keep working to maintain your upward trend."),
+    "summary": "These recommendations are based on your recent performance trends and quiz data.",
+}
+
+# Columns of the frame returned by recommendation_frame()
+FRAME_COLUMNS = ["weak_topics", "strong_topics", "difficulty_focus", "cumulative_accuracy"]
+
+def _resolve_rules(rules):
+    unknown = set(rules or {}) - set(DEFAULT_RULES)
+    if unknown:
+        raise ValueError(f"Unknown recommendation rules: {sorted(unknown)}")
+    return {**DEFAULT_RULES, **(rules or {})}
+
+def _usable(frame):
+    return frame is not None and not frame.empty
+
+def _keys(frame, by_student):
+    # Non-batched results describe a single student, labelled 0
+    return frame[STUDENT_COLUMN] if by_student else pd.Series(0, index=frame.index)
+
+def _topic_lists(topic_accuracy, mask, by_student):
+    # Topic lists per student, in the order of the topic report (weakest first)
+    selected = topic_accuracy[mask]
+    return selected["topic"].astype(object).groupby(
+        _keys(selected, by_student), sort=False, observed=True).agg(list)
+
+def recommendation_frame(analysis_results, rules=None, by_student=False):
     """
-    Generate personalized recommendations based on the analysis results.
-    :param analysis_results: dict - Contains topic accuracy, difficulty performance, and improvement trends.
-    :return: dict - Personalized recommendations for the user.
+    Evaluate the recommendation rules for every student in one vectorised pass.
+    :param analysis_results: dict - Output of analyze_all (batched when by_student is True).
+    :param rules: dict - Overrides for DEFAULT_RULES.
+    :param by_student: bool - analysis_results are batched by user_id.
+    :return: pd.DataFrame - One row per student (index user_id, or 0 when not batched) with
+        weak_topics / strong_topics (lists, NaN when none), difficulty_focus (bool) and
+        cumulative_accuracy (latest cumulative accuracy, NaN without a trend).
+    """
+    rules = _resolve_rules(rules)
+    columns = {}
+
+    # 1. Topic rules
+    topic_accuracy = analysis_results.get("topic_accuracy")
+    if _usable(topic_accuracy):
+        accuracy = topic_accuracy["average_accuracy"]
+        columns["weak_topics"] = _topic_lists(topic_accuracy, accuracy < rules["weak_topic_below"], by_student)
+        columns["strong_topics"] = _topic_lists(topic_accuracy, accuracy >= rules["strong_topic_from"], by_student)
+
+    # 2. Difficulty-level rule: any level below the threshold
+    difficulty_performance = analysis_results.get("difficulty_performance")
+    if _usable(difficulty_performance):
+        low = difficulty_performance["average_accuracy"] < rules["difficulty_focus_below"]
+        columns["difficulty_focus"] = low.groupby(
+            _keys(difficulty_performance, by_student), sort=False, observed=True).any()
+
+    # 3. Trend rule: the latest cumulative accuracy (trends are chronological per student)
+    improvement_trends = analysis_results.get("improvement_trends")
+    if _usable(improvement_trends):
+        keys = _keys(improvement_trends, by_student)
+        last = ~keys.duplicated(keep="last")
+        columns["cumulative_accuracy"] = pd.Series(
+            improvement_trends["cumulative_accuracy"][last].to_numpy(dtype="float64"), index=keys[last].to_numpy())
+
+    # Students that appear in any report, in order of first appearance
+    students = pd.Index([])
+    for values in columns.values():
+        students = students.append(values.index.astype(object))
+    students = students.unique()
+    if not by_student and len(students) == 0:
+        students = pd.Index([0])
+
+    frame = pd.DataFrame(index=students)
+    for column in FRAME_COLUMNS:
+        values = columns.get(column)
+        frame[column] = values.reindex(students) if values is not None else float("nan")
+    frame["difficulty_focus"] = frame["difficulty_focus"].fillna(False).astype(bool)
+    frame.index.name = STUDENT_COLUMN if by_student else None
+    return frame
+
+def recommendations_from_row(row, rules=None):
+    """
+    The dict view of one recommendation_frame() row, as returned by generate_recommendations.
+    :param row: pd.Series - One row of recommendation_frame().
+    :param rules: dict - Overrides for DEFAULT_RULES (only the messages are used here).
+    :return: dict - Personalized recommendations for one student.
     """
+    rules = _resolve_rules(rules)
     recommendations = {}
 
-    try:
-        # 1. Topic Recommendations
-        topic_accuracy = analysis_results.get("topic_accuracy")
-        if topic_accuracy is not None and not topic_accuracy.empty:
-            weak_topics = topic_accuracy[topic_accuracy["average_accuracy"] < 60]
-            strong_topics = topic_accuracy[topic_accuracy["average_accuracy"] >= 80]
-
-            if not weak_topics.empty:
-                recommendations["weak_topics"] = weak_topics["topic"].tolist()
-                recommendations["weak_topics_action"] = "Focus on these topics with additional practice."
-
-            if not strong_topics.empty:
-                recommendations["strong_topics"] = strong_topics["topic"].tolist()
-                recommendations["strong_topics_action"] = "Keep revising these topics to maintain your strength."
-
-        # 2. Difficulty-Level Recommendations
-        difficulty_performance = analysis_results.get("difficulty_performance")
-        if difficulty_performance is not None and not difficulty_performance.empty:
-            low_difficulty = difficulty_performance[difficulty_performance["average_accuracy"] < 60]
-            if not low_difficulty.empty:
-                recommendations["difficulty_focus"] = "Work on improving performance for specific difficulty levels."
-
-        # 3. Improvement Trends
-        improvement_trends = analysis_results.get("improvement_trends")
-        if improvement_trends is not None and not improvement_trends.empty:
-            final_accuracy = improvement_trends["cumulative_accuracy"].iloc[-1]
-            recommendations["overall_performance"] = (
-                f"Your current cumulative accuracy is {final_accuracy:.2f}%. "
-                "Keep working to maintain your upward trend."
-            )
-
-        # 4. Final Summary
-        recommendations["summary"] = "These recommendations are based on your recent performance trends and quiz data."
+    if isinstance(row["weak_topics"], list):
+        recommendations["weak_topics"] = row["weak_topics"]
+        recommendations["weak_topics_action"] = rules["weak_topics_action"]
+
+    if isinstance(row["strong_topics"], list):
+        recommendations["strong_topics"] = row["strong_topics"]
+        recommendations["strong_topics_action"] = rules["strong_topics_action"]
+
+    if row["difficulty_focus"]:
+        recommendations["difficulty_focus"] = rules["difficulty_focus"]
 
+    if pd.notna(row["cumulative_accuracy"]):
+        recommendations["overall_performance"] = rules["overall_performance"].format(
+            accuracy=row["cumulative_accuracy"])
+
+    recommendations["summary"] = rules["summary"]
+    return recommendations
+
+@instrument("generate_recommendations", is_failure=lambda recommendations: "error" in recommendations)
+def generate_recommendations(analysis_results, by_student=False, rules=None):
+    """
+    Generate personalized recommendations based on the analysis results.
+    :param analysis_results: dict - Contains topic accuracy, difficulty performance, and improvement trends.
+    :param by_student: bool - Treat analysis_results as batched output of analyze_all(..., by_student=True).
+    :param rules: dict - Overrides for DEFAULT_RULES (thresholds and messages).
+    :return: dict - Personalized recommendations for the user, or user_id -> recommendations when batched.
+    """
+    try:
+        frame = recommendation_frame(analysis_results, rules=rules, by_student=by_student)
         logger.info("Recommendations generated successfully.")
-        return recommendations
+        if by_student:
+            return {user_id: recommendations_from_row(row, rules)
+                    for user_id, row in zip(frame.index, frame.to_dict("records"))}
+        return recommendations_from_row(frame.iloc[0], rules)
 
     except Exception as e:
         logger.error(f"Error generating recommendations: {e}")
         return {"error": "Failed to generate recommendations."}
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     # Load analysis results
     from analyze_performance import analyze_all
     from data.preprocess_data import preprocess_all_data
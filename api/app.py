@@ -2,13 +2,26 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from flask import Flask, jsonify, send_from_directory
-from analysis.recommendations import generate_recommendations
-from analysis.analyze_performance import analyze_all
-from data.preprocess_data import preprocess_all_data
-from data.fetch_data import fetch_all_data
+from flask import Flask, Response, request
+import logging
 import os
+import threading
 from flask_cors import CORS
+from api.responses import (
+    dashboard_payload,
+    error_payload,
+    home_payload,
+    items_payload,
+    recommendations_payload,
+    student_profile_payload,
+    trends_payload,
+    unknown_chart_payload,
+)
+from api.serialization import serialize_for_request
+
+# pandas, numpy and requests are only needed once a request touches data, so the
+# analysis/visualization modules are imported inside the routes. This keeps
+# worker start-up cheap; see benchmarks/startup_profile.py for the budget.
 
 app = Flask(__name__)
 CORS(app)
@@ -16,23 +29,64 @@ app.url_map.strict_slashes = False
 
 # Directory for visualizations
 VISUALIZATION_DIR = "visualizations/output_visuals"
-os.makedirs(VISUALIZATION_DIR, exist_ok=True)
+
+# How long clients may reuse a rendered chart before revalidating it
+CHART_MAX_AGE = 60
+
+# Running aggregates updated by POST /submissions
+_analytics_state = None
+_analytics_state_lock = threading.Lock()
+
+# Serializes the first import into an empty submission store
+_store_import_lock = threading.Lock()
+
+def get_pipeline():
+    """
+    Return the shared analysis pipeline, importing it on first use.
+    """
+    from analysis.pipeline import get_pipeline as get_shared_pipeline
+    return get_shared_pipeline()
+
+def get_analytics_state():
+    """
+    Return the incremental analytics state, loading it from disk or rebuilding it from the pipeline.
+    """
+    global _analytics_state
+    with _analytics_state_lock:
+        if _analytics_state is None:
+            from analysis.incremental import build_state, load_or_build_state
+
+            def rebuild():
+                results = get_pipeline().run()
+                return build_state(results["historical_quiz_df"], results["current_quiz_df"])
+            _analytics_state = load_or_build_state(rebuild)
+        return _analytics_state
+
+def respond(payload, status=200):
+    """
+    Serialize a payload in the format (?format= / Accept) and encoding (Accept-Encoding)
+    the client asked for; large tables are streamed.
+    """
+    body, status = serialize_for_request(
+        payload, status, request.headers.get("Accept"), request.headers.get("Accept-Encoding"),
+        request.args.get("format"))
+    return Response(body.content, status=status, content_type=body.content_type, headers=body.headers)
 
 @app.route("/", methods=["GET"])
 def home():
     """
     Root endpoint that lists available endpoints.
     """
-    return jsonify({
-        "status": "success",
-        "available_endpoints": {
-            "dashboard": "/dashboard  👈 Complete Analysis Dashboard",
-            "recommendations": "/recommendations",
-            "visualizations": "/visualizations/<chart_type>",
-            "student_profile": "/student-profile",
-        },
-        "message": "Welcome to the Quiz Analysis API - Student Performance Analytics"
-    })
+    return respond(home_payload())
+
+@app.route("/metrics", methods=["GET"])
+def get_metrics():
+    """
+    Per-stage latency, size and failure metrics in the Prometheus text format.
+    """
+    from monitoring.metrics import PROMETHEUS_CONTENT_TYPE, render_metrics
+
+    return Response(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
 
 @app.route("/recommendations", methods=["GET"])
 def get_recommendations():
@@ -40,131 +94,350 @@ def get_recommendations():
     Endpoint to return personalized recommendations.
     """
     try:
-        # Fetch and preprocess data
-        quiz_df, current_quiz_df, historical_quiz_df = fetch_all_data()
-        _, _, processed_historical_quiz_df = preprocess_all_data(quiz_df, current_quiz_df, historical_quiz_df)
-
-        # Perform analysis and generate recommendations
-        analysis_results = analyze_all(processed_historical_quiz_df)
-        recommendations = generate_recommendations(analysis_results)
-
-        return jsonify({
-            "status": "success",
-            "data": recommendations
-        }), 200
+        # Shared, memoized fetch/preprocess/analyze/recommend results
+        return respond(recommendations_payload(get_pipeline().run()), 200)
 
     except Exception as e:
-        return jsonify({
-            "status": "error",
-            "message": str(e)
-        }), 500
+        return respond(error_payload(e), 500)
 
 
 @app.route("/visualizations/<chart_type>", methods=["GET"])
 def get_visualization(chart_type):
     """
-    Endpoint to serve visualizations.
+    Endpoint to serve visualizations, rendered on demand from the current analysis.
     """
+    from visualizations.chart_service import CHART_TYPES, chart_data, chart_etag, get_chart_service
+
     try:
-        # All chart types map to performance_summary.png
-        file_name = "performance_summary.png"
-        file_path = os.path.join(os.getcwd(), VISUALIZATION_DIR, file_name)
+        if chart_type not in CHART_TYPES:
+            return respond(unknown_chart_payload(chart_type, CHART_TYPES), 404)
 
-        if not os.path.exists(file_path):
-            print(f"File not found at: {file_path}")  # Debug print
-            return jsonify({
-                "status": "error",
-                "message": f"Visualization not found at {file_path}. Please run 'python visualizations/generate_charts.py' first"
-            }), 404
+        results = get_pipeline().run()
+        etag = chart_etag(results["fingerprint"], chart_type)
+        if etag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            png = get_chart_service().get_chart(
+                results["fingerprint"], chart_type,
+                lambda: chart_data(chart_type, results["historical_quiz_df"], results["analysis_results"]))
+            response = Response(png, mimetype="image/png")
 
-        try:
-            return send_from_directory(
-                os.path.join(os.getcwd(), VISUALIZATION_DIR), 
-                file_name, 
-                as_attachment=False
-            )
-        except Exception as send_error:
-            print(f"Error sending file: {send_error}")  # Debug print
-            return jsonify({"status": "error", "message": str(send_error)}), 500
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = f"public, max-age={CHART_MAX_AGE}"
+        return response
 
+    except ValueError as e:
+        return respond(error_payload(e), 404)
     except Exception as e:
-        print(f"General error: {e}")  # Debug print
-        return jsonify({"status": "error", "message": str(e)}), 500
+        return respond(error_payload(e), 500)
 
 @app.route("/student-profile", methods=["GET"])
 def get_student_profile():
     """
     Get detailed student persona and profile analysis.
     """
+    from analysis.dashboard import get_dashboard_sections
+
     try:
-        quiz_df, current_quiz_df, historical_quiz_df = fetch_all_data()
-        _, _, processed_historical_quiz_df = preprocess_all_data(quiz_df, current_quiz_df, historical_quiz_df)
-        analysis_results = analyze_all(processed_historical_quiz_df)
-        
-        return jsonify({
-            "status": "success",
-            "profile": {
-                "strengths": ["topic1", "topic2"],  # Based on high accuracy topics
-                "areas_for_improvement": ["topic3", "topic4"],  # Based on low accuracy topics
-                "learning_style": "Visual Learner",  # Based on performance patterns
-                "progress_rate": "Steady Improver",  # Based on improvement trends
-                "recommended_difficulty": "Intermediate"  # Based on success rates
-            }
-        }), 200
+        sections = get_dashboard_sections().get(["student_profile"], lambda: get_pipeline().run())
+        return respond(student_profile_payload(sections["student_profile"]), 200)
     except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+        return respond(error_payload(e), 500)
 
 @app.route("/dashboard", methods=["GET"])
 def get_dashboard():
     """
     Comprehensive dashboard showing all analysis in one place.
+    ?fields=performance_metrics,recommendations limits the response (and the work) to those sections.
     """
+    from analysis.dashboard import get_dashboard_sections, parse_fields
+
     try:
-        # Fetch and preprocess data
-        quiz_df, current_quiz_df, historical_quiz_df = fetch_all_data()
-        _, _, processed_historical_quiz_df = preprocess_all_data(quiz_df, current_quiz_df, historical_quiz_df)
-        
-        # Get all analyses
-        analysis_results = analyze_all(processed_historical_quiz_df)
-        recommendations = generate_recommendations(analysis_results)
-        
-        # Create a comprehensive dashboard response
-        dashboard = {
+        fields = parse_fields(request.args.get("fields"))
+    except ValueError as e:
+        return respond(error_payload(e), 400)
+
+    try:
+        # Sections are cached per data fingerprint; analysis only runs for sections that need it
+        sections = get_dashboard_sections().get(fields, lambda: get_pipeline().run())
+        return respond(dashboard_payload(sections), 200)
+
+    except Exception as e:
+        return respond(error_payload(e), 500)
+
+@app.route("/trends", methods=["GET"])
+def get_trends():
+    """
+    Accuracy per day/week/month bucket with rolling-window and exponentially weighted accuracy.
+    ?bucket=week&start=2024-01-01&end=2024-06-30&windows=7,30&halflife=14&last=12 selects what is returned.
+    """
+    from analysis.analyze_performance import parse_trend_query, trend_buckets, trend_table
+
+    try:
+        options = parse_trend_query(request.args)
+    except ValueError as e:
+        return respond(error_payload(e), 400)
+
+    try:
+        # Daily totals are memoized per data fingerprint; only the requested buckets are built
+        results = get_pipeline().run()
+        trends = trend_buckets(results["daily_accuracy"], **options)
+        return respond(trends_payload(trend_table(trends), options), 200)
+
+    except Exception as e:
+        return respond(error_payload(e), 500)
+
+@app.route("/items", methods=["GET"])
+def get_items():
+    """
+    Per-question difficulty, discrimination and point-biserial correlation, hardest first.
+    """
+    from analysis.item_analysis import item_table
+
+    try:
+        item_analysis = get_pipeline().run()["item_analysis"]
+        return respond(items_payload(item_table(item_analysis), item_analysis), 200)
+
+    except Exception as e:
+        return respond(error_payload(e), 500)
+
+def _student_not_found(user_id):
+    return respond({
+        "status": "error",
+        "message": f"No submissions found for student {user_id}"
+    }, 404)
+
+def get_store():
+    """
+    Return the local submission store when QUIZ_USE_STORE=1 (see data/store.py), else None.
+    An empty store is filled from the endpoints on first use; while it stays empty
+    (upstream unavailable) this returns None, so routes fall back to the pipeline.
+    """
+    if os.environ.get("QUIZ_USE_STORE") != "1":
+        return None
+    from data.store import get_store as get_shared_store, import_endpoints
+
+    store = get_shared_store()
+    if store.is_empty():
+        with _store_import_lock:
+            if store.is_empty():
+                import_endpoints(store)
+        if store.is_empty():
+            return None
+    return store
+
+def _student_results(user_id):
+    """
+    (analysis results, recommendations) for one student, or None without submissions.
+    The submission store, when enabled, answers from that student's rows only; otherwise
+    they come from the batched cohort analysis.
+    """
+    store = get_store()
+    if store is not None:
+        if not store.has_student(user_id):
+            return None
+        from analysis.recommendations import generate_recommendations
+
+        analysis_results = store.analysis_results(user_id)
+        return analysis_results, generate_recommendations(analysis_results)
+
+    results = get_pipeline().run(students=True)
+    analysis_results = results["student_analysis"].get(user_id)
+    if analysis_results is None:
+        return None
+    return analysis_results, results["student_recommendations"].get(user_id, {})
+
+@app.route("/students/<user_id>/recommendations", methods=["GET"])
+def get_student_recommendations(user_id):
+    """
+    Personalized recommendations for one student.
+    """
+    try:
+        student_results = _student_results(user_id)
+        if student_results is None:
+            return _student_not_found(user_id)
+
+        return respond({
+            "status": "success",
+            "user_id": user_id,
+            "data": student_results[1]
+        }, 200)
+
+    except Exception as e:
+        return respond({"status": "error", "message": str(e)}, 500)
+
+@app.route("/students/<user_id>/dashboard", methods=["GET"])
+def get_student_dashboard(user_id):
+    """
+    Dashboard for one student.
+    """
+    import pandas as pd
+
+    from analysis.dashboard import topic_strengths
+
+    try:
+        student_results = _student_results(user_id)
+        if student_results is None:
+            return _student_not_found(user_id)
+        analysis_results, recommendations = student_results
+
+        # Same thresholds as the recommendations and the cohort dashboard
+        strengths, weak_topics = topic_strengths(analysis_results)
+        improvement_trends = analysis_results["improvement_trends"]
+
+        overall_accuracy = None
+        total_quizzes = 0
+        if improvement_trends is not None and not improvement_trends.empty:
+            latest = improvement_trends["cumulative_accuracy"].iloc[-1]
+            # NaN (no scored attempt yet) is not valid JSON
+            overall_accuracy = round(float(latest), 2) if pd.notna(latest) else None
+            total_quizzes = len(improvement_trends)
+
+        return respond({
             "status": "success",
+            "user_id": user_id,
             "student_profile": {
-                "strengths": ["Data Structures", "Algorithms"],  # Example topics
-                "areas_for_improvement": ["Database Design", "System Design"],
-                "learning_style": "Visual Learner",
-                "progress_rate": "Steady Improver",
-                "recommended_difficulty": "Intermediate"
+                "strengths": strengths,
+                "areas_for_improvement": weak_topics,
             },
             "performance_metrics": {
-                "overall_accuracy": "85%",
-                "topics_mastered": 5,
-                "total_quizzes_completed": len(processed_historical_quiz_df),
-                "improvement_rate": "+15% in last month"
+                "overall_accuracy": overall_accuracy,
+                "topics_mastered": len(strengths),
+                "total_quizzes_completed": total_quizzes,
             },
             "recommendations": recommendations,
-            "visualization_urls": {
-                "topic_accuracy": "/visualizations/topic_accuracy",
-                "improvement_trends": "/visualizations/improvement_trends"
-            },
-            "recent_achievements": [
-                "Completed Advanced SQL Module",
-                "Achieved 90%+ in Algorithm Challenges",
-                "Consistent Performance in Data Structures"
-            ]
-        }
-        
-        return jsonify(dashboard), 200
-        
+        }, 200)
+
+    except Exception as e:
+        return respond({"status": "error", "message": str(e)}, 500)
+
+@app.route("/students/<user_id>/trends", methods=["GET"])
+def get_student_trends(user_id):
+    """
+    Trend buckets for one student; takes the same parameters as /trends.
+    """
+    from analysis.analyze_performance import parse_trend_query, student_daily_accuracy, trend_buckets, trend_table
+
+    try:
+        options = parse_trend_query(request.args)
+    except ValueError as e:
+        return respond(error_payload(e), 400)
+
+    try:
+        store = get_store()
+        if store is not None:
+            # Summed per day in SQL over this student's rows only; the whole history feeds the windows
+            daily = store.daily_accuracy(user_id)
+        else:
+            # Grouped by student and day once per data version; this selects one student's rows
+            daily = student_daily_accuracy(get_pipeline().run(students=True)["student_daily_accuracy"], user_id)
+        if daily is None:
+            return _student_not_found(user_id)
+
+        trends = trend_buckets(daily, **options)
+        return respond({**trends_payload(trend_table(trends), options), "user_id": user_id}, 200)
+
+    except Exception as e:
+        return respond(error_payload(e), 500)
+
+@app.route("/students/<user_id>/items", methods=["GET"])
+def get_student_items(user_id):
+    """
+    Topic mastery and the questions to review for one student, from the item analysis.
+    """
+    from analysis.item_analysis import student_item_report
+
+    try:
+        item_analysis = get_pipeline().run()["item_analysis"]
+        report = student_item_report(item_analysis, user_id) if item_analysis is not None else None
+        if report is None:
+            return _student_not_found(user_id)
+
+        return respond({"status": "success", "user_id": user_id, **report}, 200)
+
+    except Exception as e:
+        return respond(error_payload(e), 500)
+
+@app.route("/students/<user_id>/peers", methods=["GET"])
+def get_student_peers(user_id):
+    """
+    "Students like you": the k most similar students by topic and difficulty accuracy,
+    and the topics and levels in which they improved most.
+    """
+    from analysis.peers import DEFAULT_PEERS, MAX_PEERS, peer_recommendations
+
+    k = request.args.get("k", DEFAULT_PEERS)
+    if not str(k).isdigit() or not 1 <= int(k) <= MAX_PEERS:
+        return respond(error_payload(ValueError(f"k must be an integer between 1 and {MAX_PEERS}")), 400)
+    k = int(k)
+
+    try:
+        # The index is built once per data fingerprint; a request is one nearest-neighbour query
+        peer_model = get_pipeline().run(students=True)["peer_model"]
+        report = peer_recommendations(peer_model, user_id, k=k) if peer_model is not None else None
+        if report is None:
+            return _student_not_found(user_id)
+
+        return respond({"status": "success", "user_id": user_id, **report}, 200)
+
+    except Exception as e:
+        return respond(error_payload(e), 500)
+
+@app.route("/submissions", methods=["POST"])
+def post_submissions():
+    """
+    Ingest one submission (JSON object) or several (JSON array) without refetching history.
+    """
+    from analysis.incremental import check_submissions, ingest_submissions, parse_submission
+    from analysis.peers import PEER_MODEL_PATH, add_submissions
+    from analysis.recommendations import generate_recommendations
+
+    try:
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, (dict, list)):
+            return respond({
+                "status": "error",
+                "message": "Request body must be a JSON submission object or array"
+            }, 400)
+        submissions = payload if isinstance(payload, list) else [payload]
+
+        # Validate the whole batch before anything is written
+        store = get_store()
+        try:
+            check_submissions(submissions)
+            if store is not None:
+                from data.store import check_submission_ids
+                check_submission_ids(submissions)
+        except ValueError as e:
+            return respond(error_payload(e), 400)
+
+        # The store import is one transaction and replaces rows by id, so it goes first:
+        # if it fails nothing has changed, and a retry after a later failure rewrites the same rows
+        if store is not None:
+            valid = [submission for submission in submissions if parse_submission(submission) is not None]
+            if valid:
+                store.import_payloads(None, None, valid)
+
+        state = get_analytics_state()
+        applied = ingest_submissions(state, submissions)
+        # Keep "students like you" current without rebuilding the index; it is only
+        # updated once built, since a build reads the full history anyway
+        peer_model = get_pipeline().cached("peer_model")
+        if peer_model is not None:
+            add_submissions(peer_model, applied, path=PEER_MODEL_PATH)
+
+        return respond({
+            "status": "success",
+            "applied": len(applied),
+            "cumulative_accuracy": state.cumulative_accuracy,
+            "recommendations": generate_recommendations(state.analysis_results())
+        }, 200)
+
     except Exception as e:
-        return jsonify({
-            "status": "error",
-            "message": str(e)
-        }), 500
+        return respond({"status": "error", "message": str(e)}, 500)
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     # Create visualization directory if it doesn't exist
     os.makedirs(VISUALIZATION_DIR, exist_ok=True)
     app.run(debug=True, port=5000)
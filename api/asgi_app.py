@@ -0,0 +1,271 @@
+"""
+Async (ASGI) serving mode for the quiz analysis API.
+
+Exposes the same read routes as api/app.py, but upstream fetches run on the
+event loop and the CPU-bound pandas work (DataFrame building, preprocessing,
+analysis, chart rendering) is pushed to a bounded thread pool. A slow upstream
+therefore no longer ties up a worker per in-flight request.
+
+Run with:
+    hypercorn api.asgi_app:app --bind 0.0.0.0:5000
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent.parent))
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from quart import Quart, Response, request
+from api.responses import (
+    AVAILABLE_ENDPOINTS,
+    dashboard_payload,
+    error_payload,
+    home_payload,
+    items_payload,
+    recommendations_payload,
+    student_profile_payload,
+    trends_payload,
+    unknown_chart_payload,
+)
+from api.serialization import serialize_for_request
+
+logger = logging.getLogger(__name__)
+
+# Threads for CPU-bound work. Threads rather than processes: the memoized pipeline
+# and its cached stages live in this process and are shared by every request.
+CPU_WORKERS = int(os.environ.get("QUIZ_ASYNC_CPU_WORKERS", "4"))
+
+# Routes served in async mode; per-student and ingest routes stay on the Flask app
+ASYNC_ENDPOINTS = {
+    name: route for name, route in AVAILABLE_ENDPOINTS.items()
+    if name in ("dashboard", "trends", "items", "recommendations", "visualizations", "student_profile", "metrics")
+}
+
+# How long clients may reuse a rendered chart before revalidating it
+CHART_MAX_AGE = 60
+
+app = Quart(__name__)
+
+_cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="quiz-cpu")
+
+
+async def run_cpu_bound(func, *args, **kwargs):
+    """
+    Run a blocking callable on the CPU pool so the event loop keeps serving other clients.
+    """
+    return await asyncio.get_running_loop().run_in_executor(_cpu_executor, partial(func, *args, **kwargs))
+
+
+@app.before_serving
+async def open_upstream_client():
+    from data.async_fetch import create_client
+
+    app.upstream_client = create_client()
+
+
+@app.after_serving
+async def close_upstream_client():
+    await app.upstream_client.aclose()
+
+
+def _run_pipeline(payloads):
+    from analysis.pipeline import get_pipeline
+    from data.fetch_data import payloads_to_frames
+
+    return get_pipeline().run(frames=payloads_to_frames(*payloads))
+
+
+async def get_results():
+    """
+    Fetch the upstream payloads asynchronously, then build frames and run the
+    memoized pipeline on the CPU pool. Analysis entries of the returned LazyResults
+    are built when first read, so read them on the CPU pool too.
+    """
+    from data.async_fetch import fetch_all_payloads_async
+
+    payloads = await fetch_all_payloads_async(app.upstream_client)
+    return await run_cpu_bound(_run_pipeline, payloads)
+
+
+async def get_dashboard_sections(fields):
+    """
+    Build the requested dashboard sections on the CPU pool. Upstream data is only
+    fetched when a requested section needs it.
+    """
+    from analysis.dashboard import get_dashboard_sections as get_sections, needs_results
+    from data.async_fetch import fetch_all_payloads_async
+
+    payloads = await fetch_all_payloads_async(app.upstream_client) if needs_results(fields) else None
+    return await run_cpu_bound(get_sections().get, fields, lambda: _run_pipeline(payloads))
+
+
+def _trend_table(payloads, options):
+    from analysis.analyze_performance import trend_buckets, trend_table
+
+    results = _run_pipeline(payloads)
+    return trend_table(trend_buckets(results["daily_accuracy"], **options))
+
+
+def _item_payload(payloads):
+    from analysis.item_analysis import item_table
+
+    item_analysis = _run_pipeline(payloads)["item_analysis"]
+    return items_payload(item_table(item_analysis), item_analysis)
+
+
+async def _stream(chunks):
+    # Each chunk is serialised (and compressed) on the CPU pool
+    chunks = iter(chunks)
+    while True:
+        chunk = await run_cpu_bound(next, chunks, None)
+        if chunk is None:
+            return
+        yield chunk
+
+
+async def respond(payload, status=200):
+    """
+    Serialize a payload in the format (?format= / Accept) and encoding (Accept-Encoding)
+    the client asked for, on the CPU pool; large tables are streamed.
+    """
+    body, status = await run_cpu_bound(
+        serialize_for_request, payload, status, request.headers.get("Accept"),
+        request.headers.get("Accept-Encoding"), request.args.get("format"))
+    content = _stream(body.content) if body.streamed else body.content
+    return Response(content, status=status, content_type=body.content_type, headers=body.headers)
+
+
+@app.route("/", methods=["GET"])
+async def home():
+    """
+    Root endpoint that lists available endpoints.
+    """
+    return await respond(home_payload(ASYNC_ENDPOINTS))
+
+
+@app.route("/metrics", methods=["GET"])
+async def get_metrics():
+    """
+    Per-stage latency, size and failure metrics in the Prometheus text format.
+    """
+    from monitoring.metrics import PROMETHEUS_CONTENT_TYPE, render_metrics
+
+    return Response(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.route("/recommendations", methods=["GET"])
+async def get_recommendations():
+    """
+    Endpoint to return personalized recommendations.
+    """
+    try:
+        return await respond(await run_cpu_bound(recommendations_payload, await get_results()), 200)
+    except Exception as e:
+        return await respond(error_payload(e), 500)
+
+
+@app.route("/visualizations/<chart_type>", methods=["GET"])
+async def get_visualization(chart_type):
+    """
+    Endpoint to serve visualizations, rendered on demand from the current analysis.
+    """
+    from visualizations.chart_service import CHART_TYPES, chart_data, chart_etag, get_chart_service
+
+    try:
+        if chart_type not in CHART_TYPES:
+            return await respond(unknown_chart_payload(chart_type, CHART_TYPES), 404)
+
+        results = await get_results()
+        etag = chart_etag(results["fingerprint"], chart_type)
+        if etag in request.if_none_match:
+            response = Response("", status=304)
+        else:
+            png = await run_cpu_bound(
+                get_chart_service().get_chart, results["fingerprint"], chart_type,
+                lambda: chart_data(chart_type, results["historical_quiz_df"], results["analysis_results"]))
+            response = Response(png, mimetype="image/png")
+
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = f"public, max-age={CHART_MAX_AGE}"
+        return response
+
+    except ValueError as e:
+        return await respond(error_payload(e), 404)
+    except Exception as e:
+        return await respond(error_payload(e), 500)
+
+
+@app.route("/student-profile", methods=["GET"])
+async def get_student_profile():
+    """
+    Get detailed student persona and profile analysis.
+    """
+    try:
+        sections = await get_dashboard_sections(["student_profile"])
+        return await respond(student_profile_payload(sections["student_profile"]), 200)
+    except Exception as e:
+        return await respond(error_payload(e), 500)
+
+
+@app.route("/dashboard", methods=["GET"])
+async def get_dashboard():
+    """
+    Comprehensive dashboard showing all analysis in one place.
+    ?fields=performance_metrics,recommendations limits the response (and the work) to those sections.
+    """
+    from analysis.dashboard import parse_fields
+
+    try:
+        fields = parse_fields(request.args.get("fields"))
+    except ValueError as e:
+        return await respond(error_payload(e), 400)
+
+    try:
+        return await respond(dashboard_payload(await get_dashboard_sections(fields)), 200)
+    except Exception as e:
+        return await respond(error_payload(e), 500)
+
+
+@app.route("/trends", methods=["GET"])
+async def get_trends():
+    """
+    Accuracy per day/week/month bucket with rolling-window and exponentially weighted accuracy.
+    ?bucket=week&start=2024-01-01&end=2024-06-30&windows=7,30&halflife=14&last=12 selects what is returned.
+    """
+    from analysis.analyze_performance import parse_trend_query
+    from data.async_fetch import fetch_all_payloads_async
+
+    try:
+        options = parse_trend_query(request.args)
+    except ValueError as e:
+        return await respond(error_payload(e), 400)
+
+    try:
+        payloads = await fetch_all_payloads_async(app.upstream_client)
+        table = await run_cpu_bound(_trend_table, payloads, options)
+        return await respond(trends_payload(table, options), 200)
+    except Exception as e:
+        return await respond(error_payload(e), 500)
+
+
+@app.route("/items", methods=["GET"])
+async def get_items():
+    """
+    Per-question difficulty, discrimination and point-biserial correlation, hardest first.
+    """
+    from data.async_fetch import fetch_all_payloads_async
+
+    try:
+        payloads = await fetch_all_payloads_async(app.upstream_client)
+        return await respond(await run_cpu_bound(_item_payload, payloads), 200)
+    except Exception as e:
+        return await respond(error_payload(e), 500)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    app.run(port=5000)
@@ -0,0 +1,91 @@
+"""
+Response bodies shared by the Flask app (api/app.py) and the ASGI app (api/asgi_app.py).
+
+Each builder takes pipeline results and returns a dict (JSON-serialisable apart
+from at most one DataFrame, see api/serialization.py), so both serving modes
+return identical payloads.
+"""
+
+# Endpoints listed by the root route
+AVAILABLE_ENDPOINTS = {
+    "dashboard": "/dashboard  👈 Complete Analysis Dashboard",
+    "trends": "/trends?bucket=week&start=&end=&windows=7,30&halflife=14&last=",
+    "items": "/items",
+    "recommendations": "/recommendations",
+    "visualizations": "/visualizations/<chart_type>",
+    "student_profile": "/student-profile",
+    "student_recommendations": "/students/<user_id>/recommendations",
+    "student_dashboard": "/students/<user_id>/dashboard",
+    "student_trends": "/students/<user_id>/trends",
+    "student_items": "/students/<user_id>/items",
+    "student_peers": "/students/<user_id>/peers?k=10",
+    "ingest_submissions": "POST /submissions",
+    "metrics": "/metrics",
+}
+
+
+def home_payload(endpoints=AVAILABLE_ENDPOINTS):
+    return {
+        "status": "success",
+        "available_endpoints": endpoints,
+        "message": "Welcome to the Quiz Analysis API - Student Performance Analytics"
+    }
+
+
+def recommendations_payload(results):
+    return {
+        "status": "success",
+        "data": results["recommendations"]
+    }
+
+
+def student_profile_payload(profile):
+    return {
+        "status": "success",
+        "profile": profile
+    }
+
+
+def dashboard_payload(sections):
+    return {
+        "status": "success",
+        **sections
+    }
+
+
+def trends_payload(table, options):
+    # The trend table stays a DataFrame; api/serialization.py writes it column-wise
+    return {
+        "status": "success",
+        "bucket": options["bucket"],
+        "windows": list(options["windows"]),
+        "halflife_days": options["halflife"],
+        "trends": table if table is not None else []
+    }
+
+
+def items_payload(table, item_analysis):
+    # Per-question statistics stay a DataFrame, like the trend table
+    matrix = item_analysis["matrix"] if item_analysis is not None else None
+    return {
+        "status": "success",
+        "students": matrix.shape[0] if matrix is not None else 0,
+        "questions": matrix.shape[1] if matrix is not None else 0,
+        "responses": len(matrix.rows) if matrix is not None else 0,
+        "items": table if table is not None else []
+    }
+
+
+def unknown_chart_payload(chart_type, chart_types):
+    return {
+        "status": "error",
+        "message": f"Unknown chart type '{chart_type}'",
+        "available_chart_types": chart_types
+    }
+
+
+def error_payload(error):
+    return {
+        "status": "error",
+        "message": str(error)
+    }
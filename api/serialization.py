@@ -0,0 +1,298 @@
+"""
+Response serialization shared by the Flask app (api/app.py) and the ASGI app (api/asgi_app.py).
+
+A payload is a JSON-style dict. It may contain one DataFrame value (e.g. the trend
+buckets), which is written from its columns a block of rows at a time: pandas'
+to_json for JSON, record batches for Arrow IPC. That avoids building a Python
+object per row and a single string for the whole body. Large frames are streamed
+to the client in chunks.
+
+The client picks the format with ?format=json|msgpack|arrow or the Accept header,
+and the compression (br, gzip) with Accept-Encoding. MessagePack needs the
+`msgpack` package, Arrow needs `pyarrow` and brotli needs `brotli`. A format
+that is not installed is not offered, and Accept-Encoding falls back to gzip.
+
+pandas, pyarrow and msgpack are never imported here. Their modules are used only
+once the payload (or the requested format) needs them, which keeps API worker
+start-up cheap.
+"""
+import importlib
+import importlib.util
+import io
+import json
+import sys
+import zlib
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+
+# Format name -> content type
+FORMATS = {
+    "json": "application/json",
+    "msgpack": "application/msgpack",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Module each format needs (None: standard library only)
+FORMAT_MODULES = {"json": None, "msgpack": "msgpack", "arrow": "pyarrow"}
+
+# Content encodings in order of preference, with the module each needs
+ENCODINGS = {"br": "brotli", "gzip": None}
+
+# Frame rows serialised per chunk; frames with more rows are streamed
+STREAM_CHUNK_ROWS = 5000
+
+# Smaller in-memory bodies are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+class NotAcceptable(ValueError):
+    """
+    The requested response format is unknown, not installed, or cannot represent the payload.
+    """
+
+
+class SerializedBody(NamedTuple):
+    content: Union[bytes, Iterator[bytes]]  # bytes, or chunks when streamed
+    content_type: str
+    headers: Dict[str, str]
+    streamed: bool
+
+
+def _module(name: Optional[str]):
+    return importlib.import_module(name) if name is not None else None
+
+
+def _installed(name: Optional[str]) -> bool:
+    return name is None or importlib.util.find_spec(name) is not None
+
+
+def available_formats() -> list:
+    """
+    Formats this process can produce.
+    """
+    return [name for name, module in FORMAT_MODULES.items() if _installed(module)]
+
+
+def _parse_header(value: Optional[str]) -> Dict[str, float]:
+    """
+    Parse an Accept / Accept-Encoding header into {token: q-value}.
+    """
+    weights = {}
+    for part in (value or "").split(","):
+        token, *params = [item.strip() for item in part.split(";")]
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        weights[token.lower()] = q
+    return weights
+
+
+def negotiate_format(accept: Optional[str] = None, requested: Optional[str] = None) -> str:
+    """
+    Choose the response format.
+    :param accept: Accept header value.
+    :param requested: Explicit ?format= value; takes precedence over the header.
+    :return: Format name (a key of FORMATS); JSON unless a binary format is preferred.
+    :raises NotAcceptable: If the requested format is unknown or not installed.
+    """
+    if requested:
+        if requested not in FORMATS:
+            raise NotAcceptable(f"Unknown format '{requested}'. Available: {available_formats()}")
+        if not _installed(FORMAT_MODULES[requested]):
+            raise NotAcceptable(f"Format '{requested}' is not available. Available: {available_formats()}")
+        return requested
+
+    weights = _parse_header(accept)
+    candidates = [(weights[FORMATS[name]], name) for name in available_formats()
+                  if weights.get(FORMATS[name], 0) > 0]
+    # Highest q wins; ties keep FORMATS order (JSON first)
+    return max(candidates, key=lambda candidate: candidate[0])[1] if candidates else "json"
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Choose the content encoding from an Accept-Encoding header: br, then gzip, else None.
+    """
+    weights = _parse_header(accept_encoding)
+    candidates = [(weights.get(name, weights.get("*", 0)), name) for name, module in ENCODINGS.items()
+                  if _installed(module)]
+    candidates = [candidate for candidate in candidates if candidate[0] > 0]
+    return max(candidates, key=lambda candidate: candidate[0])[1] if candidates else None
+
+
+def _frame_key(payload: dict) -> Optional[str]:
+    # A DataFrame can only exist once pandas has been imported by whoever built it
+    pandas = sys.modules.get("pandas")
+    if pandas is None:
+        return None
+    keys = [key for key, value in payload.items() if isinstance(value, pandas.DataFrame)]
+    if len(keys) > 1:
+        raise ValueError(f"A payload can hold at most one DataFrame, got {keys}")
+    return keys[0] if keys else None
+
+
+def _chunks(frame) -> Iterator:
+    for start in range(0, len(frame), STREAM_CHUNK_ROWS):
+        yield frame.iloc[start:start + STREAM_CHUNK_ROWS]
+
+
+def _json_default(value):
+    # numpy scalars and timestamps that end up in the dict part of a payload
+    if hasattr(value, "item") and callable(value.item):
+        return value.item()
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, default=_json_default, separators=(",", ":"))
+
+
+def encode_json(payload: dict) -> Iterator[bytes]:
+    """
+    Yield the payload as JSON. A DataFrame value becomes an array of row objects
+    (null for NaN), written by pandas one chunk of rows at a time.
+    """
+    frame_key = _frame_key(payload)
+    if frame_key is None:
+        yield _dumps(payload).encode("utf-8")
+        return
+
+    envelope = {key: value for key, value in payload.items() if key != frame_key}
+    opening = _dumps(envelope)[:-1] + ("," if envelope else "") + _dumps(frame_key) + ":["
+    yield opening.encode("utf-8")
+    for i, chunk in enumerate(_chunks(payload[frame_key])):
+        rows = chunk.to_json(orient="records", date_format="iso")[1:-1]
+        yield (("," if i and rows else "") + rows).encode("utf-8")
+    yield b"]}"
+
+
+def encode_msgpack(payload: dict) -> Iterator[bytes]:
+    """
+    Yield the payload as MessagePack, with the same structure as the JSON encoding.
+    """
+    msgpack = _module("msgpack")
+    packer = msgpack.Packer(default=_json_default)
+    frame_key = _frame_key(payload)
+
+    yield packer.pack_map_header(len(payload))
+    for key, value in payload.items():
+        yield packer.pack(key)
+        if key != frame_key:
+            yield packer.pack(value)
+            continue
+        yield packer.pack_array_header(len(value))
+        for chunk in _chunks(value):
+            # NaN becomes nil, as in the JSON encoding
+            records = chunk.astype(object).where(chunk.notna(), None).to_dict("records")
+            yield b"".join(packer.pack(record) for record in records)
+
+
+def encode_arrow(payload: dict) -> Iterator[bytes]:
+    """
+    Yield the payload's DataFrame as an Arrow IPC stream, one record batch per chunk of rows.
+    The rest of the payload is stored as JSON in the schema metadata under b"payload".
+    Only payloads that hold a DataFrame can be encoded (serialize() checks this).
+    """
+    frame_key = _frame_key(payload)
+    pyarrow = _module("pyarrow")
+    ipc = _module("pyarrow.ipc")
+
+    frame = payload[frame_key]
+    envelope = {key: value for key, value in payload.items() if key != frame_key}
+    schema = pyarrow.Schema.from_pandas(frame, preserve_index=False).with_metadata(
+        {b"payload": _dumps(envelope).encode("utf-8"), b"table": frame_key.encode("utf-8")})
+
+    sink = io.BytesIO()
+    with ipc.new_stream(sink, schema) as writer:
+        for chunk in _chunks(frame):
+            writer.write_batch(pyarrow.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield _drain(sink)
+    yield _drain(sink)
+
+
+def _drain(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
+
+
+ENCODERS = {"json": encode_json, "msgpack": encode_msgpack, "arrow": encode_arrow}
+
+
+def compress(chunks: Iterable[bytes], encoding: Optional[str]) -> Iterator[bytes]:
+    """
+    Compress a stream of chunks incrementally with 'gzip' or 'br' (None passes them through).
+    """
+    if encoding is None:
+        yield from (chunk for chunk in chunks if chunk)
+        return
+
+    if encoding == "br":
+        compressor = _module("brotli").Compressor(quality=BROTLI_QUALITY)
+        feed, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits 31: gzip container
+        feed, finish = compressor.compress, compressor.flush
+
+    for chunk in chunks:
+        data = feed(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def serialize(payload: dict, fmt: str = "json", encoding: Optional[str] = None) -> SerializedBody:
+    """
+    Serialize a payload in the given format and content encoding.
+
+    Payloads whose DataFrame spans more than one chunk are returned as a chunk
+    iterator, so the caller can stream them. Anything smaller is returned as
+    bytes, and compressed only when it is at least MIN_COMPRESS_BYTES long.
+    :param payload: dict - Response body; may hold one DataFrame value.
+    :param fmt: str - Key of FORMATS, usually from negotiate_format().
+    :param encoding: str - 'br', 'gzip' or None, usually from negotiate_encoding().
+    :return: SerializedBody - Content, content type and the headers to send.
+    :raises NotAcceptable: If the format cannot represent the payload.
+    """
+    frame_key = _frame_key(payload)
+    if fmt == "arrow" and frame_key is None:
+        raise NotAcceptable("Arrow responses are only available for tabular endpoints")
+    chunks = ENCODERS[fmt](payload)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+
+    if frame_key is not None and len(payload[frame_key]) > STREAM_CHUNK_ROWS:
+        if encoding is not None:
+            headers["Content-Encoding"] = encoding
+        return SerializedBody(compress(chunks, encoding), FORMATS[fmt], headers, True)
+
+    content = b"".join(chunks)
+    if encoding is not None and len(content) >= MIN_COMPRESS_BYTES:
+        content = b"".join(compress([content], encoding))
+        headers["Content-Encoding"] = encoding
+    return SerializedBody(content, FORMATS[fmt], headers, False)
+
+
+def serialize_for_request(payload: dict, status: int, accept: Optional[str], accept_encoding: Optional[str],
+                          requested_format: Optional[str] = None) -> Tuple[SerializedBody, int]:
+    """
+    Negotiate the format and encoding from the request, then serialize().
+    :return: tuple - (SerializedBody, status); a JSON error body with 406 if no usable format was requested.
+    """
+    encoding = negotiate_encoding(accept_encoding)
+    try:
+        return serialize(payload, negotiate_format(accept, requested_format), encoding), status
+    except NotAcceptable as e:
+        error = {"status": "error", "message": str(e), "available_formats": available_formats()}
+        return serialize(error, "json", encoding), 406
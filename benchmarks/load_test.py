@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic_data import generate_current_submission, generate_quiz_endpoint, generate_submissions
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+DEFAULT_CLIENTS = 50
+DEFAULT_REQUESTS = 500
+DEFAULT_ROWS = 2000
+DEFAULT_LATENCY = 0.2
+STARTUP_TIMEOUT = 30
+
+# Server command per serving mode; both run under hypercorn so only the app differs
+SERVER_APPS = {
+    "asgi": "api.asgi_app:app",
+    "wsgi": "api.app:app",
+}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_stub_upstream(n_rows=DEFAULT_ROWS, latency=DEFAULT_LATENCY):
+    """
+    Serve synthetic payloads for the three upstream endpoints on a local port.
+    Every response is delayed by `latency` seconds and carries an ETag, so
+    conditional revalidations get a (delayed) 304 like the real upstream.
+    :return: tuple - (server, {env var: endpoint URL}) for the server under test.
+    """
+    bodies = {
+        "/quiz": json.dumps(generate_quiz_endpoint()).encode("utf-8"),
+        "/submission": json.dumps(generate_current_submission()).encode("utf-8"),
+        "/historical": json.dumps(generate_submissions(n_rows)).encode("utf-8"),
+    }
+    etags = {path: f'"{hashlib.sha256(body).hexdigest()[:16]}"' for path, body in bodies.items()}
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            body = bodies.get(self.path)
+            if body is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            if self.headers.get("If-None-Match") == etags[self.path]:
+                self.send_response(304)
+                self.send_header("ETag", etags[self.path])
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etags[self.path])
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    endpoints = {
+        "QUIZ_ENDPOINT_URL": f"{base}/quiz",
+        "QUIZ_SUBMISSION_DATA_URL": f"{base}/submission",
+        "HISTORICAL_DATA_URL": f"{base}/historical",
+    }
+    return server, endpoints
+
+
+def start_server(mode, endpoints, cache_ttl, cache_dir):
+    """
+    Launch the API in a subprocess under hypercorn, pointed at the stub upstream.
+    :return: tuple - (process, base URL)
+    """
+    port = _free_port()
+    env = dict(os.environ, **endpoints)
+    env["QUIZ_HTTP_CACHE_DIR"] = cache_dir
+    env["QUIZ_HTTP_CACHE_TTL"] = str(cache_ttl)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "hypercorn", SERVER_APPS[mode], "--bind", f"127.0.0.1:{port}"],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def _wait_until_ready(client, base_url):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{base_url}/")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server at {base_url} did not start within {STARTUP_TIMEOUT}s")
+
+
+async def run_load(base_url, path, clients, total_requests):
+    """
+    Send total_requests GETs to base_url + path with `clients` concurrent connections.
+    :return: dict - Throughput, latency percentiles and error count.
+    """
+    import httpx
+
+    latencies = []
+    errors = 0
+    remaining = iter(range(total_requests))
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(limits=limits, timeout=120) as client:
+        await _wait_until_ready(client, base_url)
+        # One warm-up request so the first full fetch/analysis is not measured
+        await client.get(f"{base_url}{path}")
+
+        async def worker():
+            nonlocal errors
+            for _ in remaining:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(f"{base_url}{path}")
+                    if response.status_code >= 400:
+                        errors += 1
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "requests": total_requests,
+        "errors": errors,
+        "seconds": elapsed,
+        "requests_per_second": total_requests / elapsed,
+        "p50": quantiles[49],
+        "p95": quantiles[94],
+        "p99": quantiles[98],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Load-test the API (async or threaded WSGI mode) against a local stub upstream.")
+    parser.add_argument("--mode", choices=sorted(SERVER_APPS), default="asgi", help="Serving mode to test.")
+    parser.add_argument("--path", default="/recommendations", help="Route to request.")
+    parser.add_argument("--clients", type=int, default=DEFAULT_CLIENTS, help="Concurrent clients.")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="Total requests.")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Historical submissions served by the stub.")
+    parser.add_argument("--upstream-latency", type=float, default=DEFAULT_LATENCY,
+                        help="Seconds the stub upstream waits before every response.")
+    parser.add_argument("--cache-ttl", type=float, default=0,
+                        help="Response cache TTL for the server; 0 revalidates upstream on every request.")
+    args = parser.parse_args(argv)
+
+    stub, endpoints = start_stub_upstream(args.rows, args.upstream_latency)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        process, base_url = start_server(args.mode, endpoints, args.cache_ttl, cache_dir)
+        try:
+            result = asyncio.run(run_load(base_url, args.path, args.clients, args.requests))
+        finally:
+            process.terminate()
+            process.wait()
+            stub.shutdown()
+
+    print(f"{args.mode} {args.path}: {result['requests']} requests, {args.clients} clients, "
+          f"{args.upstream_latency:.2f}s upstream latency")
+    print(f"  {result['requests_per_second']:.1f} req/s, p50 {result['p50'] * 1000:.0f}ms, "
+          f"p95 {result['p95'] * 1000:.0f}ms, p99 {result['p99'] * 1000:.0f}ms, errors {result['errors']}")
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic_data import generate_current_submission, generate_quiz_endpoint, generate_submissions
+
+DEFAULT_ROWS = 100000
+
+
+def run_accounted(n_rows, students=False):
+    """
+    Run the full pipeline on synthetic data inside a memory account.
+    Payload generation happens before accounting starts, so only the pipeline is measured.
+    :return: dict - MemoryAccount report (bytes retained and peak per stage).
+    """
+    from analysis.pipeline import AnalysisPipeline
+    from data.fetch_data import payloads_to_frames
+    from monitoring.memory import account_memory
+
+    payloads = (generate_quiz_endpoint(), generate_current_submission(), generate_submissions(n_rows))
+    pipeline = AnalysisPipeline(fetcher=lambda: payloads_to_frames(*payloads))
+
+    with account_memory() as account:
+        results = pipeline.run(students=students)
+        # Results are lazy: read every entry so each stage is built inside the account
+        for key in results:
+            results[key]
+    return account.report()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the memory allocated by each pipeline stage.")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Synthetic historical submissions.")
+    parser.add_argument("--students", action="store_true", help="Include the batched per-student stages.")
+    parser.add_argument("--json", action="store_true", help="Print the raw report as JSON.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    from monitoring.memory import format_memory_account
+
+    report = run_accounted(args.rows, students=args.students)
+    print(json.dumps(report, indent=2) if args.json else format_memory_account(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
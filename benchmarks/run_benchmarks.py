@@ -0,0 +1,238 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to Python path
+sys.path.append(str(Path(__file__).parent.parent))
+
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+from benchmarks.synthetic_data import (
+    DEFAULT_BATCH_ROWS,
+    generate_current_submission,
+    generate_quiz_endpoint,
+    generate_submissions,
+    iter_submission_batches,
+)
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.25
+
+# Larger sizes are generated and preprocessed one batch at a time, so the raw records
+# (several times the size of the preprocessed frame) never exist all at once. Their
+# payload stages (process_data_to_df, preprocess_all_data) are measured on one batch.
+STREAM_ROWS = 1000000
+
+# Stages benchmarked, in pipeline order. analyze_all_three_pass is the engine analyze_all
+# replaced (benchmarks/three_pass_analysis.py), measured on the same input for comparison
+STAGES = [
+    "process_data_to_df",
+    "preprocess_all_data",
+    "analyze_all",
+    "analyze_all_three_pass",
+    "generate_recommendations",
+    "generate_performance_visualizations",
+]
+
+
+def _measure(func, setup, repeat):
+    """
+    Time func(*setup()) `repeat` times and trace its peak Python allocations once.
+    setup() runs outside the measured region so every call gets fresh inputs.
+    """
+    timings = []
+    for _ in range(repeat):
+        args = setup()
+        gc.collect()
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+
+    args = setup()
+    gc.collect()
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "best_seconds": min(timings),
+        "mean_seconds": sum(timings) / len(timings),
+        "peak_bytes": peak,
+    }
+
+
+def _concat_chunks(chunks):
+    """
+    Concatenate preprocessed chunks, keeping categoricals whose categories differ per chunk
+    categorical instead of letting pd.concat fall back to object columns.
+    """
+    import pandas as pd
+    from pandas.api.types import union_categoricals
+
+    categorical = [column for column in chunks[0].columns
+                   if isinstance(chunks[0][column].dtype, pd.CategoricalDtype)]
+    frame = pd.concat([chunk.drop(columns=categorical) for chunk in chunks], ignore_index=True)
+    for column in categorical:
+        frame[column] = union_categoricals([chunk[column] for chunk in chunks])
+    return frame[chunks[0].columns]
+
+
+def _streamed_history(n_rows):
+    """
+    The preprocessed history of generate_submissions(n_rows), built batch by batch.
+    """
+    from data.fetch_data import process_data_to_df
+    from data.preprocess_data import preprocess_historical_chunks
+
+    batches = iter_submission_batches(n_rows, n_users=max(1, n_rows // 50))
+    return _concat_chunks(list(preprocess_historical_chunks(
+        process_data_to_df(batch, "historical") for batch in batches)))
+
+
+def benchmark_size(n_rows, repeat=DEFAULT_REPEAT, skip=()):
+    """
+    Benchmark every pipeline stage on n_rows synthetic historical submissions.
+    :param n_rows: int - Number of historical submissions.
+    :param repeat: int - Timed repetitions per stage.
+    :param skip: iterable - Stage names to leave out.
+    :return: dict - Stage name -> timing/memory measurements, with the rows each stage was measured on.
+    """
+    from data.fetch_data import process_data_to_df
+    from data.preprocess_data import preprocess_all_data
+    from analysis.analyze_performance import analyze_all
+    from analysis.recommendations import generate_recommendations
+    from benchmarks import three_pass_analysis
+    from visualizations import generate_charts
+
+    streamed = n_rows > STREAM_ROWS
+    # Raw records for the payload stages: all of them, or one batch when streaming
+    historical = generate_submissions(DEFAULT_BATCH_ROWS if streamed else n_rows,
+                                      n_users=max(1, n_rows // 50))
+    current = generate_current_submission()
+    quiz = generate_quiz_endpoint()
+
+    def raw_frames():
+        return (
+            process_data_to_df(quiz, "quiz"),
+            process_data_to_df(current, "submission"),
+            process_data_to_df(historical, "historical"),
+        )
+
+    processed_historical = _streamed_history(n_rows) if streamed else preprocess_all_data(*raw_frames())[2]
+    analysis_results = analyze_all(processed_historical)
+
+    results = {}
+    if "process_data_to_df" not in skip:
+        results["process_data_to_df"] = _measure(
+            process_data_to_df, lambda: (historical, "historical"), repeat)
+    if "preprocess_all_data" not in skip:
+        results["preprocess_all_data"] = _measure(preprocess_all_data, raw_frames, repeat)
+    if "analyze_all" not in skip:
+        results["analyze_all"] = _measure(analyze_all, lambda: (processed_historical.copy(),), repeat)
+    if "analyze_all_three_pass" not in skip:
+        results["analyze_all_three_pass"] = _measure(
+            three_pass_analysis.analyze_all, lambda: (processed_historical.copy(),), repeat)
+    if "generate_recommendations" not in skip:
+        results["generate_recommendations"] = _measure(
+            generate_recommendations, lambda: (analysis_results,), repeat)
+    if "generate_performance_visualizations" not in skip:
+        output_dir = generate_charts.OUTPUT_DIR
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            generate_charts.OUTPUT_DIR = tmp_dir
+            try:
+                results["generate_performance_visualizations"] = _measure(
+                    generate_charts.generate_performance_visualizations,
+                    lambda: (processed_historical.copy(),), repeat)
+            finally:
+                generate_charts.OUTPUT_DIR = output_dir
+
+    for stage, measurement in results.items():
+        payload_stage = stage in ("process_data_to_df", "preprocess_all_data")
+        measurement["rows"] = len(historical) if payload_stage else n_rows
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Find stages that got slower than the baseline by more than `tolerance` (e.g. 0.25 = 25%).
+    :return: list - Human-readable regression descriptions; empty when there are none.
+    """
+    regressions = []
+    for size, stages in results["sizes"].items():
+        for stage, current in stages.items():
+            previous = baseline.get("sizes", {}).get(size, {}).get(stage)
+            if previous is None:
+                continue
+            for metric in ("best_seconds", "peak_bytes"):
+                if previous[metric] and current[metric] > previous[metric] * (1 + tolerance):
+                    regressions.append(
+                        f"{stage} @ {size} rows: {metric} {previous[metric]:.4g} -> {current[metric]:.4g}"
+                    )
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark each stage of the quiz analysis pipeline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Historical submission counts to benchmark (1k to 10M).")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed repetitions per stage.")
+    parser.add_argument("--skip", nargs="*", default=[], choices=STAGES, help="Stages to skip.")
+    parser.add_argument("--output", default="benchmarks/results.json", help="Where to write the JSON results.")
+    parser.add_argument("--baseline", help="Previous results JSON to check for regressions.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown/growth relative to the baseline (0.25 = 25%%).")
+    args = parser.parse_args(argv)
+
+    # Per-stage INFO logs would dominate the output at large sizes
+    logging.disable(logging.INFO)
+
+    results = {
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+    for n_rows in args.sizes:
+        print(f"Benchmarking {n_rows} rows...")
+        stages = benchmark_size(n_rows, repeat=args.repeat, skip=args.skip)
+        results["sizes"][str(n_rows)] = stages
+        for stage, measurement in stages.items():
+            rows = f"  ({measurement['rows']} rows)" if measurement["rows"] != n_rows else ""
+            print(f"  {stage:<38} {measurement['best_seconds']:>9.4f}s  "
+                  f"peak {measurement['peak_bytes'] / 1e6:>9.2f} MB{rows}")
+        if "analyze_all" in stages and "analyze_all_three_pass" in stages:
+            speedup = stages["analyze_all_three_pass"]["best_seconds"] / stages["analyze_all"]["best_seconds"]
+            print(f"  analyze_all speedup over the three-pass reference: {speedup:.2f}x")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
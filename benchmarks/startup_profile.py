@@ -0,0 +1,104 @@
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+# Entry points profiled by default; api.app is what autoscaled workers import on start-up
+DEFAULT_MODULES = ["api.app"]
+DEFAULT_BUDGET_SECONDS = 0.5
+DEFAULT_REPEAT = 3
+DEFAULT_TOP = 15
+
+# Importing any of these from an entry point means a heavy dependency is no longer lazy
+HEAVY_MODULES = ["pandas", "numpy", "requests", "matplotlib", "pyarrow"]
+
+
+def _parse_importtime(stderr):
+    """
+    Parse `python -X importtime` output into {module: (self_us, cumulative_us)}.
+    """
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def profile_import(module, repeat=DEFAULT_REPEAT):
+    """
+    Import a module in fresh interpreters and measure its cold import time.
+    :param module: str - Dotted module name, importable from the project root.
+    :param repeat: int - Number of fresh interpreters; the fastest run is reported.
+    :return: dict - total_seconds, per-module timings and the heavy modules that were loaded.
+    """
+    code = (
+        f"import sys; import {module}; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+
+    best = None
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=PROJECT_ROOT, env=env, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{completed.stderr.strip()[-2000:]}")
+
+        timings = _parse_importtime(completed.stderr)
+        total_seconds = timings[module][1] / 1e6
+        if best is None or total_seconds < best["total_seconds"]:
+            heavy = completed.stdout.strip()
+            best = {
+                "total_seconds": total_seconds,
+                "timings": timings,
+                "heavy_modules": heavy.split(",") if heavy else [],
+            }
+    return best
+
+
+def format_profile(module, profile, top=DEFAULT_TOP):
+    lines = [f"{module}: {profile['total_seconds']:.3f}s cold import"]
+    if profile["heavy_modules"]:
+        lines.append(f"  heavy dependencies loaded: {', '.join(profile['heavy_modules'])}")
+    lines.append(f"  {'cumulative':>10}  {'self':>8}  module")
+    ranked = sorted(profile["timings"].items(), key=lambda item: item[1][1], reverse=True)
+    for name, (self_us, cumulative_us) in ranked[:top]:
+        lines.append(f"  {cumulative_us / 1e3:>8.1f}ms  {self_us / 1e3:>6.1f}ms  {name}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Report per-module import time of the entry points and enforce a cold start budget.")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES, help="Entry point modules to profile.")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS,
+                        help="Maximum cold import time per module, in seconds.")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Fresh interpreters per module.")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="Slowest modules to list.")
+    args = parser.parse_args(argv)
+
+    over_budget = []
+    for module in args.modules:
+        profile = profile_import(module, repeat=args.repeat)
+        print(format_profile(module, profile, top=args.top))
+        if profile["total_seconds"] > args.budget:
+            over_budget.append(f"{module}: {profile['total_seconds']:.3f}s > {args.budget:.3f}s")
+
+    if over_budget:
+        print("Cold start budget exceeded:")
+        for line in over_budget:
+            print(f"  {line}")
+        return 1
+    print(f"All modules within the {args.budget:.3f}s cold start budget.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
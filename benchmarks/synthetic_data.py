@@ -0,0 +1,168 @@
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional
+
+# Vocabulary used for generated quizzes
+TOPICS = [
+    "Body Fluids and Circulation", "Human Reproduction", "Principles of Inheritance",
+    "Microbes in Human Welfare", "Structural Organisation in Animals", "Respiration and Gas Exchange",
+    "Reproductive Health", "Evolution", "Cell Structure", "Biomolecules",
+]
+DIFFICULTY_LEVELS = ["easy", "medium", "hard", None]
+DIFFICULTY_WEIGHTS = [0.3, 0.4, 0.2, 0.1]
+
+# Number of distinct quizzes and questions per quiz in the generated catalogue
+QUIZ_COUNT = 200
+QUESTIONS_PER_QUIZ = 10
+OPTIONS_PER_QUESTION = 4
+
+DEFAULT_BATCH_ROWS = 100000
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone(timedelta(hours=5, minutes=30)))
+
+
+def _quiz_catalogue(rng: np.random.Generator) -> List[Dict]:
+    """
+    Build the nested 'quiz' dicts submissions point at.
+    """
+    topics = rng.choice(len(TOPICS), size=QUIZ_COUNT)
+    difficulties = rng.choice(len(DIFFICULTY_LEVELS), size=QUIZ_COUNT, p=DIFFICULTY_WEIGHTS)
+    catalogue = []
+    for quiz_id in range(QUIZ_COUNT):
+        topic = TOPICS[topics[quiz_id]]
+        catalogue.append({
+            "id": 1000 + quiz_id,
+            "name": None,
+            "title": f"{topic} Practice {quiz_id}",
+            "description": "",
+            "difficulty_level": DIFFICULTY_LEVELS[difficulties[quiz_id]],
+            "topic": topic,
+            "time": "2024-01-01T00:00:00.000+05:30",
+            "is_published": True,
+            "duration": 15,
+            "negative_marks": "1.0",
+            "correct_answer_marks": "4.0",
+            "questions_count": QUESTIONS_PER_QUIZ,
+            "max_mistake_count": 15,
+        })
+    return catalogue
+
+
+def iter_submission_batches(n_rows: int, n_users: int = 1000, seed: int = 0,
+                            batch_rows: int = DEFAULT_BATCH_ROWS) -> Iterator[List[Dict]]:
+    """
+    Generate realistic historical submission records in batches.
+
+    Records mirror the HISTORICAL_DATA payload: nested 'quiz' dicts, accuracy
+    strings such as ' 90 %', string speeds, answer counts, response maps,
+    offset-aware submitted_at timestamps and a user_id. Each student has a
+    baseline skill and a small upward drift so trends are non-trivial.
+
+    Args:
+        n_rows (int): Total number of submissions to generate.
+        n_users (int): Number of distinct students.
+        seed (int): Random seed; the same arguments always produce the same data.
+        batch_rows (int): Records per yielded batch, to keep memory bounded for large n_rows.
+
+    Yields:
+        List[Dict]: Consecutive batches of submission records.
+    """
+    rng = np.random.default_rng(seed)
+    catalogue = _quiz_catalogue(rng)
+    user_skill = rng.normal(65, 12, size=n_users)
+    question_ids = 5000 + np.arange(QUIZ_COUNT * QUESTIONS_PER_QUIZ).reshape(QUIZ_COUNT, QUESTIONS_PER_QUIZ)
+
+    for start in range(0, n_rows, batch_rows):
+        size = min(batch_rows, n_rows - start)
+        ids = np.arange(start, start + size)
+        users = rng.integers(0, n_users, size=size)
+        quizzes = rng.integers(0, QUIZ_COUNT, size=size)
+        minutes = np.sort(rng.integers(0, 365 * 24 * 60, size=size)) + start
+        drift = minutes / (365 * 24 * 60) * 10
+        skill = np.clip(user_skill[users] + drift + rng.normal(0, 10, size=size), 0, 100) / 100
+
+        # Option 0 of every question is the correct one
+        answered_right = rng.random((size, QUESTIONS_PER_QUIZ)) < skill[:, None]
+        wrong_option = rng.integers(1, OPTIONS_PER_QUESTION, size=(size, QUESTIONS_PER_QUIZ))
+        chosen = np.where(answered_right, 0, wrong_option)
+        correct = answered_right.sum(axis=1)
+        incorrect = QUESTIONS_PER_QUIZ - correct
+        accuracy = correct * 100 // QUESTIONS_PER_QUIZ
+        speed = np.clip(rng.normal(85, 10, size=size), 10, 100).astype(int)
+
+        batch = []
+        for i in range(size):
+            quiz_index = quizzes[i]
+            submitted_at = (EPOCH + timedelta(minutes=int(minutes[i]))).isoformat(timespec="milliseconds")
+            questions = question_ids[quiz_index]
+            batch.append({
+                "id": int(ids[i]),
+                "quiz_id": 1000 + int(quiz_index),
+                "user_id": f"user_{users[i]:06d}",
+                "submitted_at": submitted_at,
+                "created_at": submitted_at,
+                "updated_at": submitted_at,
+                "score": int(correct[i] * 4 - incorrect[i]),
+                "accuracy": f" {accuracy[i]} %",
+                "speed": str(speed[i]),
+                "final_score": f"{correct[i] * 4 - incorrect[i]:.1f}",
+                "negative_score": f"{float(incorrect[i]):.1f}",
+                "correct_answers": int(correct[i]),
+                "incorrect_answers": int(incorrect[i]),
+                "total_questions": QUESTIONS_PER_QUIZ,
+                "source": "live",
+                "type": "topic",
+                "duration": "15:00",
+                "response_map": {
+                    str(question): int(question * OPTIONS_PER_QUESTION + chosen[i, q])
+                    for q, question in enumerate(questions)
+                },
+                "quiz": catalogue[quiz_index],
+            })
+        yield batch
+
+
+def generate_submissions(n_rows: int, n_users: Optional[int] = None, seed: int = 0) -> List[Dict]:
+    """
+    Generate n_rows historical submission records as one list.
+
+    Args:
+        n_rows (int): Number of submissions.
+        n_users (Optional[int]): Number of students; defaults to roughly one per 50 submissions.
+        seed (int): Random seed.
+
+    Returns:
+        List[Dict]: Submission records shaped like the HISTORICAL_DATA payload.
+    """
+    n_users = n_users or max(1, n_rows // 50)
+    records = []
+    for batch in iter_submission_batches(n_rows, n_users=n_users, seed=seed):
+        records.extend(batch)
+    return records
+
+
+def generate_current_submission(seed: int = 0) -> Dict:
+    """
+    Generate a single record shaped like the QUIZ_SUBMISSION_DATA payload.
+    """
+    return next(iter_submission_batches(1, n_users=1, seed=seed))[0]
+
+
+def generate_quiz_endpoint(seed: int = 0) -> Dict:
+    """
+    Generate a payload shaped like the QUIZ_ENDPOINT response: one quiz with its questions.
+    """
+    rng = np.random.default_rng(seed)
+    quiz = dict(_quiz_catalogue(rng)[0])
+    quiz["questions"] = [
+        {
+            "id": 5000 + q,
+            "description": f"Question {q}",
+            "topic": quiz["topic"],
+            "options": [
+                {"id": (5000 + q) * OPTIONS_PER_QUESTION + k, "description": f"Option {k}", "is_correct": k == 0}
+                for k in range(OPTIONS_PER_QUESTION)
+            ],
+        }
+        for q in range(QUESTIONS_PER_QUIZ)
+    ]
+    return {"quiz": quiz}
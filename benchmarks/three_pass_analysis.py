@@ -0,0 +1,39 @@
+"""
+The three-pass analyze_all that aggregate_history replaced, kept as a benchmark reference.
+
+Each report groups the full history on its own, and the trend sorts and extends the
+frame it is given in place (callers pass a copy). Not used by the application.
+"""
+import pandas as pd
+
+
+def topic_accuracy(historical_quiz_df):
+    topic_accuracy = historical_quiz_df.groupby('topic')['accuracy_percentage'].mean().reset_index()
+    topic_accuracy.rename(columns={'accuracy_percentage': 'average_accuracy'}, inplace=True)
+    topic_accuracy.sort_values(by='average_accuracy', ascending=True, inplace=True)
+    return topic_accuracy
+
+
+def difficulty_performance(historical_quiz_df):
+    difficulty_performance = historical_quiz_df.groupby('difficulty_level')['accuracy_percentage'].mean().reset_index()
+    difficulty_performance.rename(columns={'accuracy_percentage': 'average_accuracy'}, inplace=True)
+    difficulty_performance.sort_values(by='average_accuracy', ascending=True, inplace=True)
+    return difficulty_performance
+
+
+def improvement_trends(historical_quiz_df):
+    historical_quiz_df['submitted_at'] = pd.to_datetime(historical_quiz_df['submitted_at'])
+    historical_quiz_df.sort_values(by='submitted_at', inplace=True)
+    historical_quiz_df['cumulative_accuracy'] = historical_quiz_df['accuracy_percentage'].expanding().mean()
+    return historical_quiz_df[['submitted_at', 'accuracy_percentage', 'cumulative_accuracy']]
+
+
+def analyze_all(historical_quiz_df):
+    """
+    Topic, difficulty and trend reports in three passes over a preprocessed history (modified in place).
+    """
+    return {
+        "topic_accuracy": topic_accuracy(historical_quiz_df),
+        "difficulty_performance": difficulty_performance(historical_quiz_df),
+        "improvement_trends": improvement_trends(historical_quiz_df),
+    }
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+from . import fetch_data as sync_fetch
+from .fetch_data import RETRY_STATUS_CODES, Payloads, get_endpoint_config, get_fetch_flight
+from .http_cache import get_response_cache
+from monitoring.metrics import instrument, record_payload
+
+logger = logging.getLogger(__name__)
+
+# Connection limits of the shared async client; one process serves many clients at once
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+
+
+def create_client() -> httpx.AsyncClient:
+    """
+    Create the keep-alive client used for async upstream requests.
+
+    An AsyncClient is bound to the event loop it is used on, so the ASGI app
+    creates one at start-up and closes it on shutdown.
+
+    Returns:
+        httpx.AsyncClient: A client with pooled connections and SSL verification
+        disabled, matching the synchronous session.
+    """
+    limits = httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS)
+    return httpx.AsyncClient(limits=limits, verify=False)
+
+
+async def _request_json_async(client: httpx.AsyncClient, api_url: str, headers: Dict[str, str], timeout: float,
+                              retries: int, backoff: float) -> Optional[Tuple[int, Optional[Dict], Dict[str, str]]]:
+    """
+    Async version of fetch_data._request_json: same retries, backoff and return shape,
+    but waiting on the upstream does not hold a thread.
+    """
+    for attempt in range(retries + 1):
+        try:
+            response = await client.get(api_url, headers=headers, timeout=timeout)
+            if response.status_code in RETRY_STATUS_CODES and attempt < retries:
+                logger.warning(f"Retryable status {response.status_code} from {api_url} (attempt {attempt + 1})")
+                await asyncio.sleep(backoff * (2 ** attempt))
+                continue
+            # httpx raises for every 3xx, so a 304 revalidation must be handled before raise_for_status()
+            if response.status_code == 304:
+                return response.status_code, None, response.headers
+            response.raise_for_status()
+
+            record_payload(api_url, len(response.content))
+
+            # Large bodies are decoded off the event loop
+            data = await asyncio.get_running_loop().run_in_executor(None, json.loads, response.content)
+            if not isinstance(data, (list, dict)):
+                logger.error(f"Unexpected data format from {api_url}")
+                return None
+
+            return response.status_code, data, response.headers
+
+        except httpx.TransportError as e:  # connection errors and timeouts
+            if attempt < retries:
+                logger.warning(f"Error fetching data from {api_url} (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(backoff * (2 ** attempt))
+                continue
+            logger.error(f"Error fetching data from {api_url}: {e}")
+            return None
+        except httpx.HTTPError as e:
+            logger.error(f"Error fetching data from {api_url}: {e}")
+            return None
+        except ValueError as e:
+            logger.error(f"Error parsing JSON from {api_url}: {e}")
+            return None
+
+    return None
+
+
+@instrument("fetch_data_async", is_failure=lambda result: result[0] is None)
+async def fetch_data_async_versioned(client: httpx.AsyncClient, api_url: str,
+                                     use_cache: bool = True) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Fetch data from a given API endpoint without blocking the event loop.
+
+    Uses the same endpoint settings and ResponseCache as fetch_data, so the
+    sync and async paths share cached responses. Concurrent calls for the
+    same endpoint on this event loop are coalesced into one request.
+
+    Args:
+        client (httpx.AsyncClient): Client from create_client().
+        api_url (str): The API endpoint URL.
+        use_cache (bool): Consult the response cache. Set to False to always hit the network.
+
+    Returns:
+        Tuple[Optional[Dict], Optional[str]]: Parsed JSON data (None if the request fails) and
+        its cache version (None without the cache).
+    """
+    config = get_endpoint_config(api_url)
+
+    async def loader(url, headers):
+        return await _request_json_async(client, url, headers, config["timeout"], config["retries"], config["backoff"])
+
+    async def fetch():
+        if not use_cache:
+            result = await loader(api_url, {})
+            return (result[1] if result is not None else None), None
+        return await get_response_cache().aget_versioned(api_url, loader, ttl=config.get("ttl"))
+
+    return await get_fetch_flight().do_async((api_url, use_cache), fetch)
+
+
+async def fetch_data_async(client: httpx.AsyncClient, api_url: str, use_cache: bool = True) -> Optional[Dict]:
+    """
+    Fetch data from a given API endpoint without blocking the event loop (see fetch_data_async_versioned).
+
+    Returns:
+        Optional[Dict]: Parsed JSON data or None if request fails.
+    """
+    return (await fetch_data_async_versioned(client, api_url, use_cache))[0]
+
+
+async def fetch_all_payloads_async(client: httpx.AsyncClient,
+                                   timings: Optional[Dict[str, float]] = None) -> Payloads:
+    """
+    Fetch the three endpoints concurrently on the event loop.
+
+    Only the parsed payloads are returned; convert them with
+    fetch_data.payloads_to_frames(*payloads) on a worker thread, since building
+    DataFrames is CPU-bound.
+
+    Args:
+        client (httpx.AsyncClient): Client from create_client().
+        timings (Optional[Dict[str, float]]): If given, filled with elapsed seconds per endpoint
+            plus a 'total' entry for the whole fetch.
+
+    Returns:
+        Payloads: Quiz endpoint, current submission and historical payloads, and their versions.
+    """
+    # Read at call time so overridden endpoint URLs are honoured
+    api_urls = [sync_fetch.QUIZ_ENDPOINT, sync_fetch.QUIZ_SUBMISSION_DATA, sync_fetch.HISTORICAL_DATA]
+
+    async def timed_fetch(api_url):
+        start = time.perf_counter()
+        result = await fetch_data_async_versioned(client, api_url)
+        return result, time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(timed_fetch(api_url) for api_url in api_urls))
+    if timings is not None:
+        timings.update({api_url: elapsed for api_url, (_, elapsed) in zip(api_urls, results)})
+        timings["total"] = time.perf_counter() - start
+
+    (quiz, quiz_version), (current, current_version), (historical, historical_version) = (
+        result for result, _ in results)
+    return Payloads(quiz, current, historical, (quiz_version, current_version, historical_version))
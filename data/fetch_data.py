@@ -1,55 +1,245 @@
 import requests
 import pandas as pd
-from typing import Dict, Tuple, Optional
+from typing import Dict, Iterable, Iterator, NamedTuple, Tuple, Optional
+import codecs
+import json
 import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from .http_cache import get_response_cache
+from .single_flight import SingleFlight
+from monitoring.metrics import get_registry, instrument, record_payload
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Define API endpoints
-QUIZ_ENDPOINT = "https://jsonkeeper.com/b/LLQT"
-QUIZ_SUBMISSION_DATA = "https://api.jsonserve.com/rJvd7g"
-HISTORICAL_DATA = "https://api.jsonserve.com/XgAgFJ"
+# Define API endpoints (overridable, e.g. to point a load test at a local stub upstream)
+QUIZ_ENDPOINT = os.environ.get("QUIZ_ENDPOINT_URL", "https://jsonkeeper.com/b/LLQT")
+QUIZ_SUBMISSION_DATA = os.environ.get("QUIZ_SUBMISSION_DATA_URL", "https://api.jsonserve.com/rJvd7g")
+HISTORICAL_DATA = os.environ.get("HISTORICAL_DATA_URL", "https://api.jsonserve.com/XgAgFJ")
 
-def fetch_data(api_url: str) -> Optional[Dict]:
+# Per-endpoint request settings. Endpoints not listed here use DEFAULT_FETCH_CONFIG.
+# 'ttl' is how long (seconds) a cached response is served without revalidation;
+# endpoints without one use the response cache's default_ttl. QUIZ_HTTP_CACHE_TTL
+# overrides it for every endpoint (0 revalidates on every fetch).
+DEFAULT_FETCH_CONFIG = {"timeout": 10, "retries": 2, "backoff": 0.5}
+ENDPOINT_CONFIG: Dict[str, Dict] = {
+    QUIZ_ENDPOINT: {"timeout": 10, "retries": 2, "backoff": 0.5, "ttl": 3600},
+    QUIZ_SUBMISSION_DATA: {"timeout": 10, "retries": 2, "backoff": 0.5, "ttl": 60},
+    HISTORICAL_DATA: {"timeout": 20, "retries": 2, "backoff": 0.5, "ttl": 600},
+}
+
+# Status codes worth retrying; anything else is returned to the caller as-is
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# DataFrame.attrs key holding the version of the payload a raw frame was built from
+# (see ResponseCache); the pipeline keys its memoized stages on it
+PAYLOAD_VERSION_ATTR = "payload_version"
+
+# Concurrent fetches of the same endpoint share one upstream request (sync and async paths)
+_fetch_flight = SingleFlight()
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """
+    Return the shared keep-alive session used for all upstream requests.
+    
+    The session is created lazily and its connection pool is sized so that
+    every endpoint can hold a connection open during a concurrent fetch.
+    
+    Returns:
+        requests.Session: The shared session.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=len(ENDPOINT_CONFIG), pool_maxsize=10)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+def get_endpoint_config(api_url: str) -> Dict:
     """
-    Fetch data from a given API endpoint.
+    Resolve the timeout/retry settings for an endpoint.
     
     Args:
         api_url (str): The API endpoint URL.
         
     Returns:
-        Optional[Dict]: Parsed JSON data or None if request fails.
+        Dict: Settings with 'timeout', 'retries' and 'backoff' keys, plus 'ttl' if configured.
     """
-    try:
-        # Disable SSL verification but keep a warning
-        response = requests.get(api_url, timeout=10, verify=False)
-        response.raise_for_status()
-        
-        # Ensure we get a list or dict
-        data = response.json()
-        if not isinstance(data, (list, dict)):
-            logger.error(f"Unexpected data format from {api_url}")
-            return None
+    config = dict(DEFAULT_FETCH_CONFIG)
+    config.update(ENDPOINT_CONFIG.get(api_url, {}))
+    if os.environ.get("QUIZ_HTTP_CACHE_TTL"):
+        config["ttl"] = float(os.environ["QUIZ_HTTP_CACHE_TTL"])
+    return config
+
+def _request_json(api_url: str, headers: Dict[str, str], timeout: float, retries: int,
+                  backoff: float) -> Optional[Tuple[int, Optional[Dict], Dict[str, str]]]:
+    """
+    Perform a (possibly conditional) GET with retries and parse the JSON body.
+    
+    Connection errors, timeouts and retryable status codes are retried with
+    exponential backoff (backoff, 2 * backoff, 4 * backoff, ...).
+    
+    Returns:
+        Optional[Tuple[int, Optional[Dict], Dict[str, str]]]: Status code, parsed data
+        (None for 304 Not Modified) and response headers, or None if the request fails.
+    """
+    session = get_session()
+
+    for attempt in range(retries + 1):
+        try:
+            # Disable SSL verification but keep a warning
+            response = session.get(api_url, headers=headers, timeout=timeout, verify=False)
+            if response.status_code in RETRY_STATUS_CODES and attempt < retries:
+                logger.warning(f"Retryable status {response.status_code} from {api_url} (attempt {attempt + 1})")
+                time.sleep(backoff * (2 ** attempt))
+                continue
+            response.raise_for_status()
+            if response.status_code == 304:
+                return response.status_code, None, dict(response.headers)
+            
+            record_payload(api_url, len(response.content))
+
+            # Ensure we get a list or dict
+            data = response.json()
+            if not isinstance(data, (list, dict)):
+                logger.error(f"Unexpected data format from {api_url}")
+                return None
+                
+            return response.status_code, data, dict(response.headers)
             
-        return data
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            if attempt < retries:
+                logger.warning(f"Error fetching data from {api_url} (attempt {attempt + 1}): {e}")
+                time.sleep(backoff * (2 ** attempt))
+                continue
+            logger.error(f"Error fetching data from {api_url}: {e}")
+            return None
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Error fetching data from {api_url}: {e}")
+            return None
+        except ValueError as e:
+            logger.error(f"Error parsing JSON from {api_url}: {e}")
+            return None
+
+    return None
+
+@instrument("fetch_data", is_failure=lambda result: result[0] is None)
+def fetch_data_versioned(api_url: str, timeout: Optional[float] = None, retries: Optional[int] = None,
+                         backoff: Optional[float] = None, use_cache: bool = True) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Fetch data from a given API endpoint, together with the version of that data.
+    
+    Responses go through the shared ResponseCache: fresh entries are served
+    without a request, stale ones are revalidated with ETag/Last-Modified.
+    Concurrent calls for the same endpoint are coalesced into one request.
+    
+    Args:
+        api_url (str): The API endpoint URL.
+        timeout (Optional[float]): Request timeout in seconds. Defaults to the endpoint config.
+        retries (Optional[int]): Number of retries after the first attempt. Defaults to the endpoint config.
+        backoff (Optional[float]): Base backoff delay in seconds. Defaults to the endpoint config.
+        use_cache (bool): Consult the response cache. Set to False to always hit the network.
         
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Error fetching data from {api_url}: {e}")
-        return None
-    except ValueError as e:
-        logger.error(f"Error parsing JSON from {api_url}: {e}")
-        return None
+    Returns:
+        Tuple[Optional[Dict], Optional[str]]: Parsed JSON data (None if the request fails) and its
+        cache version, which only changes when a new body is downloaded (None without the cache).
+    """
+    config = get_endpoint_config(api_url)
+    timeout = config["timeout"] if timeout is None else timeout
+    retries = config["retries"] if retries is None else retries
+    backoff = config["backoff"] if backoff is None else backoff
+
+    def loader(url, headers):
+        return _request_json(url, headers, timeout, retries, backoff)
+
+    def fetch():
+        if not use_cache:
+            result = loader(api_url, {})
+            return (result[1] if result is not None else None), None
+        return get_response_cache().get_versioned(api_url, loader, ttl=config.get("ttl"))
+
+    # Callers arriving while this endpoint is already being fetched wait for that result
+    return _fetch_flight.do((api_url, use_cache), fetch)
+
+def fetch_data(api_url: str, timeout: Optional[float] = None, retries: Optional[int] = None,
+               backoff: Optional[float] = None, use_cache: bool = True) -> Optional[Dict]:
+    """
+    Fetch data from a given API endpoint (see fetch_data_versioned).
+    
+    Returns:
+        Optional[Dict]: Parsed JSON data or None if request fails.
+    """
+    return fetch_data_versioned(api_url, timeout, retries, backoff, use_cache)[0]
+
+def get_fetch_flight() -> SingleFlight:
+    """
+    Return the single-flight group that coalesces concurrent fetches of the same endpoint.
+    Its stats() report how many calls were coalesced instead of hitting the upstream.
+    """
+    return _fetch_flight
+
+def _collect_fetch_metrics():
+    flight = _fetch_flight.stats()
+    yield ("quiz_fetch_calls_total", "counter", "fetch_data calls, including coalesced ones.",
+           [({}, flight["calls"])])
+    yield ("quiz_fetch_coalesced_total", "counter", "fetch_data calls that waited on an in-flight request.",
+           [({}, flight["coalesced"])])
+    yield ("quiz_fetch_errors_total", "counter", "Fetches that raised, shared with every coalesced waiter.",
+           [({}, flight["errors"])])
+    yield ("quiz_fetch_in_flight", "gauge", "Endpoint fetches currently in flight.",
+           [({}, flight["in_flight"])])
+    cache = get_response_cache().stats()
+    yield ("quiz_http_cache_events_total", "counter", "Response cache lookups by outcome.",
+           [({"event": event}, count) for event, count in sorted(cache.items())])
+
+get_registry().register_collector(_collect_fetch_metrics)
+
+def fetch_endpoints(api_urls, concurrent: bool = True) -> Dict[str, Tuple[Optional[Dict], float, Optional[str]]]:
+    """
+    Fetch several endpoints, optionally in parallel over the shared session.
+    
+    Args:
+        api_urls: Iterable of endpoint URLs.
+        concurrent (bool): Run the requests in a thread pool instead of one after another.
+        
+    Returns:
+        Dict[str, Tuple[Optional[Dict], float, Optional[str]]]: Parsed data, elapsed seconds
+        and payload version per URL.
+    """
+    api_urls = list(api_urls)
+
+    def timed_fetch(api_url):
+        start = time.perf_counter()
+        data, version = fetch_data_versioned(api_url)
+        return data, time.perf_counter() - start, version
+
+    if not concurrent or len(api_urls) < 2:
+        return {api_url: timed_fetch(api_url) for api_url in api_urls}
 
-def process_data_to_df(data: Optional[Dict], data_type: str) -> Optional[pd.DataFrame]:
+    with ThreadPoolExecutor(max_workers=len(api_urls)) as executor:
+        futures = {api_url: executor.submit(timed_fetch, api_url) for api_url in api_urls}
+        return {api_url: future.result() for api_url, future in futures.items()}
+
+def process_data_to_df(data: Optional[Dict], data_type: str,
+                       version: Optional[str] = None) -> Optional[pd.DataFrame]:
     """
     Convert JSON data to DataFrame with proper handling of nested structures.
     
     Args:
         data (Optional[Dict]): JSON data to convert
         data_type (str): Type of data for logging purposes
+        version (Optional[str]): Payload version from the response cache, kept in
+            df.attrs[PAYLOAD_VERSION_ATTR]
         
     Returns:
         Optional[pd.DataFrame]: Converted DataFrame or None if conversion fails
@@ -67,6 +257,8 @@ def process_data_to_df(data: Optional[Dict], data_type: str) -> Optional[pd.Data
             
         # Add timestamp
         df['processed_at'] = datetime.now()
+        if version is not None:
+            df.attrs[PAYLOAD_VERSION_ATTR] = version
         
         if df.empty:
             logger.warning(f"Empty DataFrame created from {data_type} data")
@@ -79,10 +271,161 @@ def process_data_to_df(data: Optional[Dict], data_type: str) -> Optional[pd.Data
         logger.error(f"Error converting {data_type} data to DataFrame: {e}")
         return None
 
-def fetch_all_data() -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+# Streaming ingestion settings
+STREAM_READ_SIZE = 64 * 1024
+DEFAULT_CHUNK_ROWS = 10000
+
+def iter_json_array(byte_chunks: Iterable[bytes]) -> Iterator[object]:
+    """
+    Incrementally parse a top-level JSON array, yielding one element at a time.
+    
+    Only the unparsed tail of the input is buffered, so memory stays
+    proportional to the largest single element rather than the whole payload.
+    A top-level object (instead of an array) is yielded as a single element.
+    
+    Args:
+        byte_chunks (Iterable[bytes]): Raw body chunks, e.g. response.iter_content().
+        
+    Yields:
+        object: Each decoded array element.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(byte_chunks)
+    buffer = ""
+    position = 0
+    exhausted = False
+    started = False
+    # What the array grammar allows next: "first" (a value or "]"), "value" or "separator"
+    expect = "first"
+
+    def fill():
+        nonlocal buffer, position, exhausted
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            buffer = buffer[position:] + text_decoder.decode(b"", final=True)
+            position = 0
+            exhausted = True
+            return
+        buffer = buffer[position:] + text_decoder.decode(chunk)
+        position = 0
+
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n":
+            position += 1
+        if position >= len(buffer):
+            if exhausted:
+                if started:
+                    raise ValueError("Unterminated JSON array")
+                return
+            fill()
+            continue
+
+        if not started:
+            started = True
+            if buffer[position] == "[":
+                position += 1
+                continue
+            # Not an array: decode the single top-level value from the full body
+            while not exhausted:
+                fill()
+            yield json.loads(buffer[position:])
+            return
+
+        if expect == "separator":
+            if buffer[position] == ",":
+                position += 1
+                expect = "value"
+                continue
+            if buffer[position] == "]":
+                return
+            raise ValueError("Expected ',' or ']' after a JSON array element")
+        if buffer[position] == "]":
+            if expect == "first":
+                return
+            raise ValueError("Trailing comma in JSON array")
+        if buffer[position] == ",":
+            raise ValueError("Missing JSON array element before ','")
+
+        try:
+            value, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if exhausted:
+                raise
+            fill()
+            continue
+
+        # A scalar is only complete once a delimiter follows it (e.g. "12" may become "123")
+        if not isinstance(value, (dict, list)) and not exhausted and (
+                end == len(buffer) or buffer[end] not in " \t\r\n,]"):
+            fill()
+            continue
+
+        position = end
+        expect = "separator"
+        yield value
+
+def iter_record_chunks(records: Iterable[Dict], chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Group records into DataFrames of at most chunk_rows rows.
+    
+    Args:
+        records (Iterable[Dict]): Submission records.
+        chunk_rows (int): Maximum rows per chunk.
+        
+    Yields:
+        pd.DataFrame: One chunk of records with a processed_at column.
+    """
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= chunk_rows:
+            df = pd.DataFrame(batch)
+            df['processed_at'] = datetime.now()
+            batch = []
+            yield df
+    if batch:
+        df = pd.DataFrame(batch)
+        df['processed_at'] = datetime.now()
+        yield df
+
+def stream_data_chunks(api_url: str = HISTORICAL_DATA,
+                       chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Stream a JSON array endpoint as fixed-size DataFrame chunks.
+    
+    The body is parsed element by element while it downloads, so peak memory
+    is bounded by chunk_rows rather than by the payload size. Streaming
+    bypasses the response cache.
+    
+    Args:
+        api_url (str): The API endpoint URL. Defaults to HISTORICAL_DATA.
+        chunk_rows (int): Maximum rows per yielded DataFrame.
+        
+    Yields:
+        pd.DataFrame: Consecutive chunks of the payload.
+    """
+    config = get_endpoint_config(api_url)
+    with get_session().get(api_url, timeout=config["timeout"], verify=False, stream=True) as response:
+        response.raise_for_status()
+        records = iter_json_array(response.iter_content(chunk_size=STREAM_READ_SIZE))
+        total = 0
+        for chunk in iter_record_chunks(records, chunk_rows):
+            total += len(chunk)
+            yield chunk
+    logger.info(f"Streamed {total} rows from {api_url}")
+
+def fetch_all_data(concurrent: bool = True,
+                   timings: Optional[Dict[str, float]] = None) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[pd.DataFrame]]:
     """
     Fetch data from all endpoints and return them as DataFrames.
     
+    Args:
+        concurrent (bool): Fetch the three endpoints in parallel so latency tracks the slowest one.
+        timings (Optional[Dict[str, float]]): If given, filled with elapsed seconds per endpoint
+            plus a 'total' entry for the whole fetch.
+    
     Returns:
         Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[pd.DataFrame]]: 
         DataFrames for quiz endpoint, current quiz data, and historical quiz data.
@@ -92,14 +435,55 @@ def fetch_all_data() -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame], Op
     warnings.filterwarnings('once', message='Unverified HTTPS request')
     
     # Fetch all data
-    quiz_endpoint_data = fetch_data(QUIZ_ENDPOINT)
-    quiz_submission_data = fetch_data(QUIZ_SUBMISSION_DATA)
-    historical_data = fetch_data(HISTORICAL_DATA)
+    start = time.perf_counter()
+    results = fetch_endpoints([QUIZ_ENDPOINT, QUIZ_SUBMISSION_DATA, HISTORICAL_DATA], concurrent=concurrent)
+    total = time.perf_counter() - start
+
+    quiz_endpoint_data, _, quiz_version = results[QUIZ_ENDPOINT]
+    quiz_submission_data, _, submission_version = results[QUIZ_SUBMISSION_DATA]
+    historical_data, _, historical_version = results[HISTORICAL_DATA]
+
+    endpoint_timings = {api_url: elapsed for api_url, (_, elapsed, _) in results.items()}
+    endpoint_timings["total"] = total
+    logger.info("Fetch timings: " + ", ".join(f"{url}={elapsed:.3f}s" for url, elapsed in endpoint_timings.items()))
+    if timings is not None:
+        timings.update(endpoint_timings)
     
+    return payloads_to_frames(quiz_endpoint_data, quiz_submission_data, historical_data,
+                              (quiz_version, submission_version, historical_version))
+
+class Payloads(NamedTuple):
+    """
+    The three parsed endpoint payloads and their cache versions; unpacks into payloads_to_frames().
+    """
+    quiz_endpoint_data: Optional[Dict]
+    quiz_submission_data: Optional[Dict]
+    historical_data: Optional[Dict]
+    versions: Tuple[Optional[str], Optional[str], Optional[str]] = (None, None, None)
+
+@instrument("payloads_to_frames", is_failure=lambda frames: all(df is None for df in frames))
+def payloads_to_frames(quiz_endpoint_data: Optional[Dict], quiz_submission_data: Optional[Dict],
+                       historical_data: Optional[Dict],
+                       versions: Tuple[Optional[str], Optional[str], Optional[str]] = (None, None, None)
+                       ) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+    """
+    Convert the three parsed endpoint payloads to DataFrames.
+    
+    Shared by fetch_all_data and the async fetch path, which downloads the
+    payloads on the event loop and converts them on a worker thread.
+    
+    Args:
+        versions: Payload versions from the response cache, recorded on each frame.
+    
+    Returns:
+        Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[pd.DataFrame]]: 
+        DataFrames for quiz endpoint, current quiz data, and historical quiz data.
+    """
+    quiz_version, submission_version, historical_version = versions
     # Convert to DataFrames with proper error handling
-    quiz_df = process_data_to_df(quiz_endpoint_data, "quiz")
-    current_quiz_df = process_data_to_df(quiz_submission_data, "submission")
-    historical_quiz_df = process_data_to_df(historical_data, "historical")
+    quiz_df = process_data_to_df(quiz_endpoint_data, "quiz", quiz_version)
+    current_quiz_df = process_data_to_df(quiz_submission_data, "submission", submission_version)
+    historical_quiz_df = process_data_to_df(historical_data, "historical", historical_version)
     
     return quiz_df, current_quiz_df, historical_quiz_df
 
@@ -127,4 +511,5 @@ def main():
         print(historical_df.head())
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     main()
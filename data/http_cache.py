@@ -0,0 +1,303 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Default on-disk location for cached responses
+CACHE_DIR = os.environ.get("QUIZ_HTTP_CACHE_DIR", ".cache/http")
+DEFAULT_TTL = 300
+
+# A loader takes (url, conditional request headers) and returns
+# (status_code, parsed data, response headers), or None if the request failed.
+LoaderResult = Optional[Tuple[int, Optional[object], Dict[str, str]]]
+Loader = Callable[[str, Dict[str, str]], LoaderResult]
+AsyncLoader = Callable[[str, Dict[str, str]], Awaitable[LoaderResult]]
+
+# (parsed data, version): the version changes only when a new body is downloaded
+Versioned = Tuple[Optional[object], Optional[str]]
+
+
+class ResponseCache:
+    """
+    Two-tier (memory + disk) cache for parsed JSON responses.
+
+    Entries older than their TTL are revalidated with If-None-Match /
+    If-Modified-Since. With stale_while_revalidate enabled, a stale entry is
+    returned immediately and refreshed on a background thread.
+
+    Every entry carries a version: the response's ETag, or a random id when the
+    upstream sends none. It is kept across 304 revalidations, so consumers can
+    key derived results on it instead of re-hashing the data.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = CACHE_DIR, default_ttl: float = DEFAULT_TTL,
+                 stale_while_revalidate: bool = False):
+        self.cache_dir = cache_dir
+        self.default_ttl = default_ttl
+        self.stale_while_revalidate = stale_while_revalidate
+        self._memory: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._stats = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "revalidations": 0,
+            "not_modified": 0,
+            "stale_served": 0,
+            "errors": 0,
+        }
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _disk_path(self, url: str) -> str:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _lookup(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._memory.get(url)
+        if entry is not None or not self.cache_dir:
+            return entry
+
+        path = self._disk_path(url)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable cache entry for {url}: {e}")
+            return None
+
+        self._count("disk_hits")
+        with self._lock:
+            self._memory[url] = entry
+        return entry
+
+    def _store(self, url: str, entry: Dict) -> None:
+        with self._lock:
+            self._memory[url] = entry
+        if not self.cache_dir:
+            return
+
+        path = self._disk_path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"Could not write cache entry for {url}: {e}")
+
+    def _is_fresh(self, entry: Dict, ttl: float) -> bool:
+        return time.time() - entry["stored_at"] < ttl
+
+    def _conditional_headers(self, entry: Optional[Dict]) -> Dict[str, str]:
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+            self._count("revalidations")
+        else:
+            self._count("misses")
+        return headers
+
+    @staticmethod
+    def _version(entry: Dict) -> str:
+        # Entries written before versions existed are identified by their download time
+        return entry.get("version") or f"stored:{entry['stored_at']}"
+
+    def _apply_result(self, url: str, entry: Optional[Dict], result) -> Optional[Dict]:
+        if result is None:
+            self._count("errors")
+            if entry is not None:
+                logger.warning(f"Upstream failed for {url}, serving stale cached copy")
+            return entry
+
+        status_code, data, response_headers = result
+        if status_code == 304 and entry is not None:
+            self._count("not_modified")
+            entry = dict(entry, version=self._version(entry), stored_at=time.time())
+            self._store(url, entry)
+            return entry
+
+        # Header names are case-insensitive; servers and HTTP clients differ in the casing they use
+        response_headers = {name.lower(): value for name, value in (response_headers or {}).items()}
+        etag = response_headers.get("etag")
+        entry = {
+            "url": url,
+            "data": data,
+            "etag": etag,
+            "last_modified": response_headers.get("last-modified"),
+            "version": f"etag:{etag}" if etag else f"id:{uuid.uuid4().hex}",
+            "stored_at": time.time(),
+        }
+        self._store(url, entry)
+        return entry
+
+    def _versioned(self, entry: Optional[Dict]) -> Versioned:
+        return (entry["data"], self._version(entry)) if entry is not None else (None, None)
+
+    def _load(self, url: str, entry: Optional[Dict], loader: Loader) -> Optional[Dict]:
+        headers = self._conditional_headers(entry)
+        return self._apply_result(url, entry, loader(url, headers))
+
+    def _refresh_in_background(self, url: str, entry: Dict, loader: Loader) -> None:
+        with self._lock:
+            if url in self._refreshing:
+                return
+            self._refreshing.add(url)
+
+        def refresh():
+            try:
+                self._load(url, entry, loader)
+            except Exception as e:
+                logger.error(f"Background revalidation of {url} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(url)
+
+        threading.Thread(target=refresh, name=f"revalidate-{url}", daemon=True).start()
+
+    def get(self, url: str, loader: Loader, ttl: Optional[float] = None) -> Optional[object]:
+        """
+        Return cached data for a URL, loading or revalidating it as needed.
+        :param url: str - Cache key and request URL.
+        :param loader: callable - Performs the (conditional) request.
+        :param ttl: float - Freshness lifetime in seconds; defaults to default_ttl.
+        :return: Parsed response data or None if nothing could be loaded.
+        """
+        return self.get_versioned(url, loader, ttl)[0]
+
+    def get_versioned(self, url: str, loader: Loader, ttl: Optional[float] = None) -> Versioned:
+        """
+        Like get(), but also return the version of the data that is returned.
+        :return: tuple - (parsed data, version), or (None, None) if nothing could be loaded.
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        entry = self._lookup(url)
+
+        if entry is not None and self._is_fresh(entry, ttl):
+            self._count("hits")
+            return self._versioned(entry)
+
+        if entry is not None and self.stale_while_revalidate:
+            self._count("stale_served")
+            self._refresh_in_background(url, entry, loader)
+            return self._versioned(entry)
+
+        return self._versioned(self._load(url, entry, loader))
+
+    async def _aload(self, url: str, entry: Optional[Dict], loader: AsyncLoader) -> Optional[Dict]:
+        result = await loader(url, self._conditional_headers(entry))
+        # Writing the disk tier serialises the whole payload; keep that off the event loop
+        return await asyncio.get_running_loop().run_in_executor(None, self._apply_result, url, entry, result)
+
+    async def aget(self, url: str, loader: AsyncLoader, ttl: Optional[float] = None) -> Optional[object]:
+        """
+        Async counterpart of get() for event-loop callers: the loader is awaited
+        instead of blocking a thread while the upstream responds.
+        :param url: str - Cache key and request URL.
+        :param loader: async callable - Performs the (conditional) request.
+        :param ttl: float - Freshness lifetime in seconds; defaults to default_ttl.
+        :return: Parsed response data or None if nothing could be loaded.
+        """
+        return (await self.aget_versioned(url, loader, ttl))[0]
+
+    async def aget_versioned(self, url: str, loader: AsyncLoader, ttl: Optional[float] = None) -> Versioned:
+        """
+        Async counterpart of get_versioned().
+        :return: tuple - (parsed data, version), or (None, None) if nothing could be loaded.
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        entry = self._lookup(url)
+
+        if entry is not None and self._is_fresh(entry, ttl):
+            self._count("hits")
+            return self._versioned(entry)
+
+        if entry is not None and self.stale_while_revalidate:
+            self._count("stale_served")
+            with self._lock:
+                refresh = url not in self._refreshing
+                self._refreshing.add(url)
+            if refresh:
+                async def revalidate():
+                    try:
+                        await self._aload(url, entry, loader)
+                    except Exception as e:
+                        logger.error(f"Background revalidation of {url} failed: {e}")
+                    finally:
+                        with self._lock:
+                            self._refreshing.discard(url)
+
+                asyncio.ensure_future(revalidate())
+            return self._versioned(entry)
+
+        return self._versioned(await self._aload(url, entry, loader))
+
+    def invalidate(self, url: Optional[str] = None) -> None:
+        """
+        Drop one URL (or every entry when url is None) from both tiers.
+        """
+        with self._lock:
+            urls = [url] if url is not None else list(self._memory)
+            for key in urls:
+                self._memory.pop(key, None)
+        if not self.cache_dir:
+            return
+
+        if url is not None:
+            paths = [self._disk_path(url)]
+        else:
+            paths = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith(".json")]
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return a snapshot of the hit/miss/revalidation counters.
+        """
+        with self._lock:
+            return dict(self._stats)
+
+
+_response_cache: Optional[ResponseCache] = None
+_response_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """
+    Return the process-wide response cache, creating it on first use.
+    """
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
+
+
+def set_response_cache(cache: Optional[ResponseCache]) -> None:
+    """
+    Replace the process-wide response cache (e.g. with a temp-dir cache in tests).
+    """
+    global _response_cache
+    with _response_cache_lock:
+        _response_cache = cache
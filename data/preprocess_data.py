@@ -1,14 +1,84 @@
 import pandas as pd
 from .fetch_data import fetch_all_data
+from .schema import QUIZ_SCHEMA, SUBMISSION_SCHEMA, apply_schema, format_schema_report
 import logging
+from monitoring.metrics import instrument
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def preprocess_current_quiz_data(current_quiz_df):
+# Nested fields pulled out of the historical 'quiz' column:
+# nested key -> (flat column name, default for missing/non-dict values, dtype)
+QUIZ_FIELDS = {
+    'topic': ('topic', 'Unknown', object),
+    'difficulty_level': ('difficulty_level', 'Unknown', object),
+    'id': ('quiz_id', None, 'Int64'),
+    'title': ('quiz_title', None, object),
+    'questions_count': ('questions_count', None, 'Int64'),
+}
+
+# Quiz endpoint columns renamed to the names used by the submission data
+QUIZ_COLUMN_RENAMES = {
+    'name': 'quiz_title',  # Assuming 'name' instead of 'title'
+    'id': 'quiz_id',
+}
+
+def enable_copy_on_write():
+    """
+    Turn on pandas Copy-on-Write, under which frames derived from another one share its
+    column buffers until either side writes to them. That lets the preprocessors return
+    new frames (never mutating their input) without paying for copies of the columns they
+    leave unchanged. CoW is always on from pandas 3.0, opt-in from 1.5 and unavailable
+    before; there the preprocessors still return new frames, built from copied columns.
+    :return: bool - Whether Copy-on-Write is active.
+    """
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    try:
+        pd.set_option('mode.copy_on_write', True)
+        return True
+    except (KeyError, AttributeError):  # pandas' OptionError subclasses both
+        return False
+
+def flatten_quiz_column(historical_quiz_df):
+    """
+    Flatten the nested 'quiz' dict column into typed columns in a single pass.
+    :param historical_quiz_df: pd.DataFrame - Historical data with a 'quiz' column.
+    :return: pd.DataFrame - One column per entry in QUIZ_FIELDS, aligned to the input index.
+    """
+    quiz = historical_quiz_df['quiz'] if 'quiz' in historical_quiz_df.columns else pd.Series(
+        None, index=historical_quiz_df.index, dtype=object)
+
+    # Non-dict cells become empty records so every field falls back to its default
+    records = [x if isinstance(x, dict) else {} for x in quiz.tolist()]
+    nested = pd.DataFrame.from_records(records, columns=list(QUIZ_FIELDS), index=historical_quiz_df.index)
+
+    flat = pd.DataFrame(index=historical_quiz_df.index)
+    for key, (column, default, dtype) in QUIZ_FIELDS.items():
+        values = nested[key]
+        if default is not None:
+            values = values.where(values.notna(), default)
+        if dtype == 'Int64':
+            values = pd.to_numeric(values, errors='coerce').astype('Int64')
+        flat[column] = values
+
+    # Keep a top-level quiz_id if the submission already carries one
+    if 'quiz_id' in historical_quiz_df.columns:
+        existing = pd.to_numeric(historical_quiz_df['quiz_id'], errors='coerce').astype('Int64')
+        flat['quiz_id'] = existing.fillna(flat['quiz_id'])
+
+    return flat
+
+def _log_schema_report(name, memory_report):
+    if memory_report:
+        logger.info(f"{name} typed columns: {format_schema_report(memory_report)}")
+
+@instrument("preprocess_current_quiz_data")
+def preprocess_current_quiz_data(current_quiz_df, memory_report=None):
     """
     Preprocess Current Quiz Data.
+    :param current_quiz_df: pd.DataFrame - Raw current submission; it is not modified.
+    :param memory_report: dict - Optional; filled with column -> (bytes before, bytes after).
+    :return: pd.DataFrame - Submission typed according to SUBMISSION_SCHEMA.
     """
     if current_quiz_df is None or current_quiz_df.empty:
         logger.warning("Current quiz data is empty or None.")
@@ -18,19 +88,22 @@ def preprocess_current_quiz_data(current_quiz_df):
         # First, let's log the columns we have
         logger.info(f"Current quiz columns: {current_quiz_df.columns.tolist()}")
         
-        # Convert accuracy from string to float (remove '%' sign and spaces)
-        if 'accuracy' in current_quiz_df.columns:
-            current_quiz_df['accuracy_percentage'] = current_quiz_df['accuracy'].str.strip().str.rstrip('%').astype(float)
-        
-        return current_quiz_df
+        # Type every known column; accuracy ' 90 %' becomes accuracy_percentage 90.0
+        processed_df = apply_schema(current_quiz_df, SUBMISSION_SCHEMA, memory_report)
+        _log_schema_report("Current quiz", memory_report)
+        return processed_df
 
     except Exception as e:
         logger.error(f"Error preprocessing current quiz data: {e}")
         return None
 
-def preprocess_historical_data(historical_quiz_df):
+@instrument("preprocess_historical_data")
+def preprocess_historical_data(historical_quiz_df, memory_report=None):
     """
     Preprocess Historical Quiz Data.
+    :param historical_quiz_df: pd.DataFrame - Raw historical submissions; it is not modified.
+    :param memory_report: dict - Optional; filled with column -> (bytes before, bytes after).
+    :return: pd.DataFrame - Submissions with flattened quiz metadata, typed according to SUBMISSION_SCHEMA.
     """
     if historical_quiz_df is None or historical_quiz_df.empty:
         logger.warning("Historical quiz data is empty or None.")
@@ -40,19 +113,38 @@ def preprocess_historical_data(historical_quiz_df):
         # Log the columns
         logger.info(f"Historical quiz columns: {historical_quiz_df.columns.tolist()}")
         
-        # Convert accuracy from string to float
-        if 'accuracy' in historical_quiz_df.columns:
-            historical_quiz_df['accuracy_percentage'] = historical_quiz_df['accuracy'].str.strip().str.rstrip('%').astype(float)
-        
-        return historical_quiz_df
+        # Flatten the nested quiz metadata once so analysis can read plain columns
+        flat = flatten_quiz_column(historical_quiz_df)
+        columns = {column: historical_quiz_df[column] for column in historical_quiz_df.columns}
+        columns.update({column: flat[column] for column in flat.columns})
+        merged = pd.DataFrame(columns, index=historical_quiz_df.index, copy=False)
+
+        # Type every known column, including the flattened ones
+        processed_df = apply_schema(merged, SUBMISSION_SCHEMA, memory_report)
+        _log_schema_report("Historical quiz", memory_report)
+        return processed_df
 
     except Exception as e:
         logger.error(f"Error preprocessing historical data: {e}")
         return None
 
+def preprocess_historical_chunks(historical_chunks):
+    """
+    Preprocess a stream of historical DataFrame chunks one chunk at a time.
+    :param historical_chunks: iterable of pd.DataFrame - e.g. from fetch_data.stream_data_chunks().
+    :return: generator of pd.DataFrame - Preprocessed chunks; chunks that fail preprocessing are skipped.
+    """
+    for chunk in historical_chunks:
+        processed = preprocess_historical_data(chunk)
+        if processed is not None:
+            yield processed
+
+@instrument("preprocess_quiz_endpoint_data")
 def preprocess_quiz_endpoint_data(quiz_df):
     """
     Preprocess Quiz Endpoint Data.
+    :param quiz_df: pd.DataFrame - Raw quiz endpoint data; it is not modified.
+    :return: pd.DataFrame - Typed quiz fields, with columns renamed per QUIZ_COLUMN_RENAMES.
     """
     if quiz_df is None or quiz_df.empty:
         logger.warning("Quiz endpoint data is empty or None.")
@@ -62,40 +154,58 @@ def preprocess_quiz_endpoint_data(quiz_df):
         # Log the columns we have
         logger.info(f"Quiz endpoint columns: {quiz_df.columns.tolist()}")
         
-        # Create a copy to avoid modifying the original
-        processed_df = quiz_df.copy()
-        
-        # Map columns if they exist
-        column_mapping = {
-            'name': 'quiz_title',  # Assuming 'name' instead of 'title'
-            'id': 'quiz_id',
-            'topic': 'topic',
-            'duration': 'duration',
-            'difficulty_level': 'difficulty_level'
-        }
-        
-        # Only map columns that exist
-        for old_col, new_col in column_mapping.items():
-            if old_col in processed_df.columns:
-                processed_df[new_col] = processed_df[old_col]
-                logger.info(f"Mapped column {old_col} to {new_col}")
-        
+        # Type the quiz fields (returns a new frame, so the original is not modified)
+        processed_df = apply_schema(quiz_df, QUIZ_SCHEMA)
+
+        # Rename rather than duplicate; a column whose new name is already taken keeps its name
+        renames = {old_col: new_col for old_col, new_col in QUIZ_COLUMN_RENAMES.items()
+                   if old_col in processed_df.columns and new_col not in processed_df.columns}
+        if renames:
+            processed_df = processed_df.rename(columns=renames)
+            logger.info(f"Renamed quiz columns: {renames}")
+
         return processed_df
 
     except Exception as e:
         logger.error(f"Error preprocessing quiz endpoint data: {e}")
         return None
 
-def preprocess_all_data(quiz_df, current_quiz_df, historical_quiz_df):
+@instrument("preprocess_all_data", is_failure=lambda frames: all(df is None for df in frames))
+def preprocess_all_data(quiz_df, current_quiz_df, historical_quiz_df, snapshot_dir=None):
     """
     Preprocess all datasets and return cleaned versions.
+    If snapshot_dir is given, the results are also written there as a compact
+    columnar snapshot that load_preprocessed_snapshot() can read back.
     """
     processed_quiz_df = preprocess_quiz_endpoint_data(quiz_df)
     processed_current_quiz_df = preprocess_current_quiz_data(current_quiz_df)
     processed_historical_quiz_df = preprocess_historical_data(historical_quiz_df)
 
+    if snapshot_dir is not None:
+        from .snapshot import save_snapshot
+        try:
+            save_snapshot({
+                "quiz": processed_quiz_df,
+                "current_quiz": processed_current_quiz_df,
+                "historical_quiz": processed_historical_quiz_df,
+            }, snapshot_dir)
+        except Exception as e:
+            logger.error(f"Error writing preprocessed snapshot: {e}")
+
     return processed_quiz_df, processed_current_quiz_df, processed_historical_quiz_df
 
+def load_preprocessed_snapshot(snapshot_dir=None):
+    """
+    Load preprocessed data from a snapshot written by preprocess_all_data.
+    Returns the same tuple as preprocess_all_data, or None if no snapshot exists.
+    """
+    from .snapshot import SNAPSHOT_DIR, load_snapshot
+
+    frames = load_snapshot(snapshot_dir or SNAPSHOT_DIR)
+    if frames is None:
+        return None
+    return frames.get("quiz"), frames.get("current_quiz"), frames.get("historical_quiz")
+
 def main():
     """Main function to demonstrate usage."""
     # Fetch the data
@@ -126,4 +236,5 @@ def main():
         print(processed_historical_quiz_df.head())
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     main()
@@ -0,0 +1,257 @@
+import logging
+import re
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# pandas >= 2 needs format="ISO8601" to parse mixed ISO forms ('+05:30', 'Z', with/without fractions)
+_PANDAS_2 = int(pd.__version__.split(".")[0]) >= 2
+
+# A uniform trailing UTC offset such as "+05:30", which the datetime fast path strips
+_OFFSET_PATTERN = re.compile(r"^([+-])(\d{2}):(\d{2})$")
+
+
+class Field(NamedTuple):
+    """
+    Declarative description of one preprocessed column.
+
+    Attributes:
+        dtype (Optional[str]): Target dtype after parsing ('float32', 'int16', 'category', ...).
+            Integer dtypes switch to their nullable counterpart ('Int16') when values are missing.
+            None keeps whatever the parser produced.
+        parser (str): Name of the parser in PARSERS that turns raw values into typed values.
+        nullable (bool): Whether missing values are allowed; if not, they are replaced by `default`.
+        default (object): Fill value for missing values of a non-nullable field.
+        source (Optional[str]): Raw column to read from when it differs from the field name.
+    """
+    dtype: Optional[str]
+    parser: str = "numeric"
+    nullable: bool = True
+    default: object = None
+    source: Optional[str] = None
+
+
+# Fields of a quiz submission record (current and historical submissions).
+# Columns without a field, e.g. response_map or the raw nested quiz, are left untouched.
+SUBMISSION_SCHEMA: Dict[str, Field] = {
+    "id": Field("int64"),
+    "quiz_id": Field("int32"),
+    "user_id": Field("category", parser="category"),
+    "submitted_at": Field("datetime64[ns, UTC]", parser="datetime"),
+    "created_at": Field("datetime64[ns, UTC]", parser="datetime"),
+    "updated_at": Field("datetime64[ns, UTC]", parser="datetime"),
+    "started_at": Field("datetime64[ns, UTC]", parser="datetime"),
+    "ended_at": Field("datetime64[ns, UTC]", parser="datetime"),
+    "accuracy_percentage": Field("float32", parser="percent", source="accuracy"),
+    "speed": Field("float32"),
+    "score": Field("float32"),
+    "final_score": Field("float32"),
+    "negative_score": Field("float32"),
+    "correct_answers": Field("int16"),
+    "incorrect_answers": Field("int16"),
+    "total_questions": Field("int16"),
+    "mistakes_corrected": Field("int16"),
+    "initial_mistake_count": Field("int16"),
+    "source": Field("category", parser="category"),
+    "type": Field("category", parser="category"),
+    # Flattened from the nested quiz record by preprocess_data.flatten_quiz_column
+    "topic": Field("category", parser="category", nullable=False, default="Unknown"),
+    "difficulty_level": Field("category", parser="category", nullable=False, default="Unknown"),
+    "questions_count": Field("int16"),
+}
+
+# Fields of a quiz record (the quiz endpoint, or the quiz nested in a submission)
+QUIZ_SCHEMA: Dict[str, Field] = {
+    "id": Field("int32"),
+    "topic": Field("category", parser="category", nullable=False, default="Unknown"),
+    "difficulty_level": Field("category", parser="category", nullable=False, default="Unknown"),
+    "duration": Field("int16"),
+    "negative_marks": Field("float32"),
+    "correct_answer_marks": Field("float32"),
+    "questions_count": Field("int16"),
+    "max_mistake_count": Field("int16"),
+    "is_published": Field(None, parser="boolean"),
+    "time": Field("datetime64[ns, UTC]", parser="datetime"),
+    "created_at": Field("datetime64[ns, UTC]", parser="datetime"),
+    "updated_at": Field("datetime64[ns, UTC]", parser="datetime"),
+}
+
+
+def _is_text(values: pd.Series) -> bool:
+    return pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)
+
+
+def parse_numeric(values: pd.Series) -> pd.Series:
+    """
+    Parse numbers. Numeric columns are returned as-is; text is cast directly and only
+    falls back to element-wise coercion (unparseable values become NaN) when that fails.
+    """
+    if pd.api.types.is_bool_dtype(values) or not _is_text(values):
+        return values
+    try:
+        return values.astype("float64")
+    except (TypeError, ValueError):
+        return pd.to_numeric(values, errors="coerce")
+
+
+def parse_percent(values: pd.Series) -> pd.Series:
+    """
+    Parse percentages such as ' 90 %' or '90%' into 90.0. Values that are already
+    numeric, including numbers mixed into a text column, are kept as they are.
+    """
+    if not _is_text(values):
+        return values
+    stripped = values.str.rstrip(" %")
+    try:
+        numeric = stripped.astype("float64")
+    except (TypeError, ValueError):
+        numeric = pd.to_numeric(stripped, errors="coerce")
+        # .str yields NaN for non-string cells; recover any numbers among them
+        recover = numeric.isna() & values.notna()
+        if recover.any():
+            numeric = numeric.where(~recover, pd.to_numeric(values.where(recover), errors="coerce"))
+    return numeric
+
+
+def _uniform_offset(values: pd.Series) -> Optional[pd.Timedelta]:
+    offsets = values.str[-6:].dropna().unique()
+    if len(offsets) != 1:
+        return None
+    match = _OFFSET_PATTERN.match(str(offsets[0]))
+    if match is None:
+        return None
+    sign, hours, minutes = match.groups()
+    offset = pd.Timedelta(hours=int(hours), minutes=int(minutes))
+    return -offset if sign == "-" else offset
+
+
+def parse_datetime(values: pd.Series) -> pd.Series:
+    """
+    Parse timestamps to UTC. When every string carries the same UTC offset (the upstream
+    API writes local '+05:30' times), the offset is stripped and applied once, which avoids
+    pandas' much slower per-element offset handling.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return pd.to_datetime(values, utc=True)
+    if _is_text(values):
+        offset = _uniform_offset(values)
+        if offset is not None:
+            local = pd.to_datetime(values.str[:-6], errors="coerce")
+            # Anything the fast path could not read (non-strings, odd formats) goes the slow way
+            if local.notna().sum() == values.notna().sum():
+                return (local - offset).dt.tz_localize("UTC")
+    if _PANDAS_2:
+        return pd.to_datetime(values, errors="coerce", utc=True, format="ISO8601")
+    return pd.to_datetime(values, errors="coerce", utc=True)
+
+
+def parse_category(values: pd.Series) -> pd.Series:
+    """
+    Keep values as they are; the 'category' dtype does the encoding.
+    """
+    return values
+
+
+def parse_boolean(values: pd.Series) -> pd.Series:
+    """
+    Parse booleans, accepting 'true'/'false' strings as well as real booleans.
+    """
+    if pd.api.types.is_bool_dtype(values):
+        return values
+    mapping = {"true": True, "false": False, "1": True, "0": False}
+    return values.map(lambda x: mapping.get(str(x).strip().lower()) if pd.notna(x) else None).astype("boolean")
+
+
+# Parser name (Field.parser) -> vectorised parser
+PARSERS: Dict[str, Callable[[pd.Series], pd.Series]] = {
+    "numeric": parse_numeric,
+    "percent": parse_percent,
+    "datetime": parse_datetime,
+    "category": parse_category,
+    "boolean": parse_boolean,
+}
+
+
+def _cast(values: pd.Series, dtype: Optional[str]) -> pd.Series:
+    if dtype is None or str(values.dtype) == dtype:
+        return values
+    if dtype.startswith("int"):
+        if values.isna().any():
+            # Nullable integers keep the width while allowing missing values
+            return values.astype(dtype.capitalize())
+        if pd.api.types.is_float_dtype(values) and not (values == values.round()).all():
+            logger.warning(f"Fractional values kept as float instead of {dtype}")
+            return values
+        return values.astype(dtype)
+    return values.astype(dtype)
+
+
+def apply_field(values: pd.Series, field: Field) -> pd.Series:
+    """
+    Parse, default-fill and cast one column according to its field.
+
+    Args:
+        values (pd.Series): Raw column.
+        field (Field): How to type the column.
+
+    Returns:
+        pd.Series: The typed column, aligned to the input index.
+    """
+    parsed = PARSERS[field.parser](values)
+    if not field.nullable and field.default is not None and parsed.isna().any():
+        parsed = parsed.where(parsed.notna(), field.default)
+    return _cast(parsed, field.dtype)
+
+
+def apply_schema(df: pd.DataFrame, schema: Dict[str, Field],
+                 memory_report: Optional[Dict[str, Tuple[int, int]]] = None) -> pd.DataFrame:
+    """
+    Type every column of df that has a field in the schema.
+
+    Columns are parsed independently, so a column that fails to parse is logged and
+    left as it was rather than failing the whole frame. The input frame is not modified;
+    see preprocess_data.enable_copy_on_write() for how the result shares its memory.
+
+    Args:
+        df (pd.DataFrame): Raw records.
+        schema (Dict[str, Field]): Column name -> field, e.g. SUBMISSION_SCHEMA.
+        memory_report (Optional[Dict[str, Tuple[int, int]]]): If given, filled with
+            column -> (bytes before, bytes after) for every column typed in place. Derived
+            fields are left out: their source column is kept, so they save nothing.
+
+    Returns:
+        pd.DataFrame: A new frame with the original column order; derived fields
+        (those with a `source`) are appended after the existing columns.
+    """
+    columns = {column: df[column] for column in df.columns}
+    for name, field in schema.items():
+        source = field.source or name
+        if source not in df.columns:
+            continue
+        raw = df[source]
+        try:
+            typed = apply_field(raw, field)
+        except Exception as e:
+            logger.error(f"Could not apply schema field '{name}' to column '{source}': {e}")
+            continue
+        if memory_report is not None and field.source is None:
+            memory_report[name] = (int(raw.memory_usage(deep=True, index=False)),
+                                   int(typed.memory_usage(deep=True, index=False)))
+        columns[name] = typed
+    # copy=False: under Copy-on-Write the untouched columns share their buffers with df
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def format_schema_report(memory_report: Dict[str, Tuple[int, int]]) -> str:
+    """
+    Summarise the memory saved per column by apply_schema, largest saving first.
+    """
+    total_before = sum(before for before, _ in memory_report.values())
+    total_after = sum(after for _, after in memory_report.values())
+    parts = [
+        f"{column}: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB"
+        for column, (before, after) in sorted(memory_report.items(), key=lambda item: item[1][1] - item[1][0])
+    ]
+    return f"{total_before / 1e6:.2f} MB -> {total_after / 1e6:.2f} MB ({'; '.join(parts)})"
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent calls that share a key.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait for and receive the same result, or the same exception.
+    Nothing is cached once the call finishes, so later callers start a new one.
+    Threads use do(); coroutines on an event loop use do_async().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._in_flight_async: Dict[Hashable, asyncio.Future] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0, "errors": 0}
+
+    def do(self, key: Hashable, func: Callable[[], T]) -> T:
+        """
+        Run func() unless a call for the same key is already in flight, in which case wait for it.
+
+        Args:
+            key (Hashable): Identifies equivalent calls, e.g. the request URL.
+            func (Callable[[], T]): The call to make.
+
+        Returns:
+            T: The shared result. An exception raised by func is re-raised in every waiter.
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+                self._stats["executions"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        if not owner:
+            return future.result()
+
+        try:
+            future.set_result(func())
+        except BaseException as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        return future.result()
+
+    async def do_async(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        """
+        Async counterpart of do(): await func() unless an equivalent call is already in flight.
+
+        Args:
+            key (Hashable): Identifies equivalent calls, e.g. the request URL.
+            func (Callable[[], Awaitable[T]]): Returns the coroutine to await.
+
+        Returns:
+            T: The shared result. An exception raised by func is re-raised in every waiter.
+        """
+        loop = asyncio.get_running_loop()
+        # Futures belong to one event loop, so in-flight calls are tracked per loop
+        flight_key = (id(loop), key)
+        with self._lock:
+            self._stats["calls"] += 1
+            future = self._in_flight_async.get(flight_key)
+            owner = future is None
+            if owner:
+                future = loop.create_future()
+                self._in_flight_async[flight_key] = future
+                self._stats["executions"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        if not owner:
+            # A waiter being cancelled must not cancel the shared call
+            return await asyncio.shield(future)
+
+        try:
+            future.set_result(await func())
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            with self._lock:
+                self._stats["errors"] += 1
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._in_flight_async.pop(flight_key, None)
+        return future.result()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return a snapshot of the call counters. 'coalesced' counts calls that
+        shared another caller's in-flight result instead of running their own.
+        """
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._in_flight) + len(self._in_flight_async))
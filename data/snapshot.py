@@ -0,0 +1,240 @@
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+from data.preprocess_data import QUIZ_FIELDS
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - depends on the environment
+    feather = None
+
+logger = logging.getLogger(__name__)
+
+# Default location of the preprocessed snapshot
+SNAPSHOT_DIR = os.environ.get("QUIZ_SNAPSHOT_DIR", ".cache/snapshot")
+MANIFEST_FILE = "manifest.json"
+SNAPSHOT_VERSION = 1
+
+# Frames stored in a snapshot, in preprocess_all_data's return order
+FRAME_NAMES = ("quiz", "current_quiz", "historical_quiz")
+
+# Compact dtypes applied before writing
+CATEGORY_COLUMNS = ["topic", "difficulty_level"]
+FLOAT32_COLUMNS = ["accuracy_percentage", "speed", "score", "final_score", "negative_score"]
+DATETIME_COLUMNS = ["submitted_at", "created_at", "updated_at", "started_at", "ended_at", "processed_at"]
+
+# Columns preprocessing flattens the nested 'quiz' dict into
+FLATTENED_QUIZ_COLUMNS = [column for column, _, _ in QUIZ_FIELDS.values()]
+
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def compact_frame(df: pd.DataFrame) -> Tuple[pd.DataFrame, list]:
+    """
+    Convert a preprocessed frame to compact, columnar-friendly dtypes.
+
+    Topic/difficulty become categoricals, accuracy and speed float32,
+    timestamps native datetimes and integers are downcast. The nested 'quiz'
+    column is dropped when preprocessing already flattened it into columns.
+    Other nested dict/list columns are stored as JSON text so any columnar
+    format can hold them.
+
+    Args:
+        df (pd.DataFrame): Preprocessed frame; it is not modified.
+
+    Returns:
+        Tuple[pd.DataFrame, list]: The compact frame and the names of JSON-encoded columns.
+    """
+    compact = {}
+    json_columns = []
+    quiz_flattened = all(column in df.columns for column in FLATTENED_QUIZ_COLUMNS)
+    for column in df.columns:
+        if column == "quiz" and quiz_flattened:
+            continue
+        values = df[column]
+        if column in CATEGORY_COLUMNS:
+            values = values.astype("category")
+        elif column in DATETIME_COLUMNS:
+            values = pd.to_datetime(values, errors="coerce", utc=True)
+        elif column in FLOAT32_COLUMNS:
+            numeric = pd.to_numeric(values, errors="coerce")
+            # Only convert when nothing but missing values would be lost
+            if numeric.notna().sum() == values.notna().sum():
+                values = numeric.astype("float32")
+        elif pd.api.types.is_integer_dtype(values) and not pd.api.types.is_extension_array_dtype(values):
+            values = pd.to_numeric(values, downcast="integer")
+        elif values.dtype == object:
+            if values.map(lambda x: isinstance(x, (dict, list))).any():
+                values = values.map(lambda x: json.dumps(x) if isinstance(x, (dict, list)) else None)
+                json_columns.append(column)
+        compact[column] = values
+    return pd.DataFrame(compact).reset_index(drop=True), json_columns
+
+
+def _write_frame(df: pd.DataFrame, path_stem: str) -> str:
+    if feather is not None:
+        path = f"{path_stem}.feather"
+        feather.write_feather(df, path, compression="uncompressed")
+    else:
+        path = f"{path_stem}.pkl"
+        df.to_pickle(path)
+    return path
+
+
+def _read_frame(path: str, memory_map: bool = True) -> pd.DataFrame:
+    if path.endswith(".feather"):
+        if feather is None:
+            raise ImportError("pyarrow is required to read feather snapshots")
+        # split_blocks keeps each column in its own block, so primitive columns can stay
+        # views of the memory map instead of being copied into consolidated blocks
+        return feather.read_table(path, memory_map=memory_map).to_pandas(split_blocks=True)
+    return pd.read_pickle(path)
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def save_snapshot(frames: Dict[str, Optional[pd.DataFrame]], snapshot_dir: str = SNAPSHOT_DIR) -> Dict:
+    """
+    Write preprocessed frames to a columnar snapshot.
+
+    Uses Arrow IPC (feather) when pyarrow is installed, so loads can be
+    memory-mapped; otherwise falls back to pickles, which keep the same dtypes.
+
+    Args:
+        frames (Dict[str, Optional[pd.DataFrame]]): Frame name (see FRAME_NAMES) -> preprocessed frame.
+        snapshot_dir (str): Directory to write into.
+
+    Returns:
+        Dict: The manifest, including per-frame row counts, fingerprints and memory sizes.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    manifest = {
+        "version": SNAPSHOT_VERSION,
+        "created_at": datetime.now().isoformat(),
+        "format": "feather" if feather is not None else "pickle",
+        "frames": {},
+    }
+
+    for name, df in frames.items():
+        if df is None:
+            manifest["frames"][name] = None
+            continue
+
+        compact, json_columns = compact_frame(df)
+        path = _write_frame(compact, os.path.join(snapshot_dir, name))
+        manifest["frames"][name] = {
+            "file": os.path.basename(path),
+            "rows": len(compact),
+            "json_columns": json_columns,
+            "fingerprint": _file_digest(path),
+            "object_bytes": _frame_bytes(df),
+            "compact_bytes": _frame_bytes(compact),
+        }
+
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    with open(f"{manifest_path}.tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+
+    logger.info(f"Snapshot written to {snapshot_dir}: {format_memory_report(manifest)}")
+    return manifest
+
+
+def read_manifest(snapshot_dir: str = SNAPSHOT_DIR) -> Optional[Dict]:
+    """
+    Return the snapshot manifest, or None if there is no usable snapshot.
+    """
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable snapshot manifest at {manifest_path}: {e}")
+        return None
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        logger.warning(f"Ignoring snapshot with unsupported version {manifest.get('version')}")
+        return None
+    return manifest
+
+
+def load_snapshot(snapshot_dir: str = SNAPSHOT_DIR, memory_map: bool = True,
+                  decode_json: bool = True) -> Optional[Dict[str, Optional[pd.DataFrame]]]:
+    """
+    Load preprocessed frames from a snapshot instead of refetching and reparsing.
+
+    Args:
+        snapshot_dir (str): Snapshot directory.
+        memory_map (bool): Memory-map feather files instead of reading them into memory.
+        decode_json (bool): Turn JSON-encoded nested columns back into dicts/lists. The pipeline
+            passes False: only item analysis reads them, and it decodes the cells it uses.
+
+    Returns:
+        Optional[Dict[str, Optional[pd.DataFrame]]]: Frame name -> frame, or None if no snapshot exists.
+    """
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        return None
+
+    frames = {}
+    for name, entry in manifest["frames"].items():
+        if entry is None:
+            frames[name] = None
+            continue
+        df = _read_frame(os.path.join(snapshot_dir, entry["file"]), memory_map=memory_map)
+        if decode_json:
+            for column in entry["json_columns"]:
+                df[column] = df[column].map(lambda x: json.loads(x) if isinstance(x, str) else x)
+        frames[name] = df
+
+    logger.info(f"Loaded snapshot from {snapshot_dir} ({manifest['format']})")
+    return frames
+
+
+def format_memory_report(manifest: Dict) -> str:
+    """
+    Summarise in-memory size of the compact frames against the original object-dtype frames.
+    """
+    parts = []
+    for name, entry in manifest["frames"].items():
+        if entry is None:
+            continue
+        ratio = entry["compact_bytes"] / entry["object_bytes"] if entry["object_bytes"] else 0.0
+        parts.append(
+            f"{name}: {entry['rows']} rows, {entry['object_bytes'] / 1e6:.2f} MB -> "
+            f"{entry['compact_bytes'] / 1e6:.2f} MB ({ratio:.0%})"
+        )
+    return "; ".join(parts)
+
+
+def main():
+    """Build a snapshot from the live endpoints and print its memory report."""
+    from data.fetch_data import fetch_all_data
+    from data.preprocess_data import preprocess_all_data
+
+    quiz_df, current_quiz_df, historical_quiz_df = fetch_all_data()
+    preprocess_all_data(quiz_df, current_quiz_df, historical_quiz_df, snapshot_dir=SNAPSHOT_DIR)
+
+    manifest = read_manifest(SNAPSHOT_DIR)
+    if manifest is not None:
+        print(format_memory_report(manifest))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
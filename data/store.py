@@ -0,0 +1,504 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+from .fetch_data import payloads_to_frames, process_data_to_df
+from .preprocess_data import preprocess_current_quiz_data, preprocess_historical_data
+
+logger = logging.getLogger(__name__)
+
+# Default location of the local submission store
+STORE_PATH = os.environ.get("QUIZ_STORE_PATH", ".cache/quiz_store.sqlite3")
+
+# Submissions written per executemany() call while importing
+IMPORT_BATCH_ROWS = 10000
+
+# Values of the submissions.origin column, one per submission endpoint
+HISTORICAL = "historical"
+CURRENT = "current"
+
+MS_PER_DAY = 24 * 60 * 60 * 1000
+
+# Indexed/typed submissions columns -> preprocessed column they are read from
+# (id is the received id as text, see _submission_id)
+TYPED_COLUMNS = {
+    "id": "id",
+    "user_id": "user_id",
+    "quiz_id": "quiz_id",
+    "topic": "topic",
+    "difficulty_level": "difficulty_level",
+    "submitted_at": "submitted_at",
+    "accuracy": "accuracy_percentage",
+    "speed": "speed",
+    "score": "score",
+    "final_score": "final_score",
+}
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    origin TEXT NOT NULL,
+    id TEXT NOT NULL,      -- the received id, so non-numeric ids are kept as-is
+    user_id TEXT,
+    quiz_id INTEGER,
+    topic TEXT,
+    difficulty_level TEXT,
+    submitted_at INTEGER,  -- milliseconds since the epoch, UTC
+    accuracy REAL,         -- accuracy_percentage
+    speed REAL,
+    score REAL,
+    final_score REAL,
+    payload TEXT NOT NULL, -- the submission record as received
+    PRIMARY KEY (origin, id)
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_user ON submissions (user_id, submitted_at);
+CREATE INDEX IF NOT EXISTS idx_submissions_topic ON submissions (topic);
+CREATE INDEX IF NOT EXISTS idx_submissions_difficulty ON submissions (difficulty_level);
+CREATE INDEX IF NOT EXISTS idx_submissions_submitted_at ON submissions (submitted_at);
+
+CREATE TABLE IF NOT EXISTS quizzes (
+    id INTEGER PRIMARY KEY,
+    title TEXT,
+    topic TEXT,
+    difficulty_level TEXT,
+    questions_count INTEGER,
+    payload TEXT NOT NULL  -- the quiz dict, with questions when it came from the quiz endpoint
+);
+
+CREATE TABLE IF NOT EXISTS endpoint_payloads (
+    name TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    imported_at TEXT NOT NULL
+);
+"""
+
+
+class SubmissionStore(ABC):
+    """
+    Storage backend for quiz submissions and quizzes.
+
+    A store is loaded from the endpoint payloads (import_payloads) and can then
+    stand in for the upstream endpoints (load_frames, a drop-in fetcher for
+    AnalysisPipeline). Aggregates, per-student reports and time ranges are
+    answered by the backend itself (query pushdown), so a query only touches
+    the rows it selects. Every report matches the shape of the corresponding
+    analysis.analyze_performance output.
+    """
+
+    @abstractmethod
+    def import_payloads(self, quiz_endpoint_data: Optional[Dict], quiz_submission_data: Optional[Dict],
+                        historical_data: Optional[Iterable[Dict]]) -> Dict[str, int]:
+        """
+        Insert or replace the records of the three endpoint payloads.
+
+        Returns:
+            Dict[str, int]: Rows written per table.
+        """
+
+    @abstractmethod
+    def is_empty(self) -> bool:
+        """
+        Whether no historical submissions have been imported yet.
+        """
+
+    @abstractmethod
+    def load_frames(self) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+        """
+        Return (quiz_df, current_quiz_df, historical_quiz_df) as fetch_all_data would.
+        """
+
+    @abstractmethod
+    def topic_accuracy(self, user_id: Optional[str] = None) -> pd.DataFrame:
+        """
+        Average accuracy per topic (weakest first), for every student or one.
+        """
+
+    @abstractmethod
+    def difficulty_performance(self, user_id: Optional[str] = None) -> pd.DataFrame:
+        """
+        Average accuracy per difficulty level (weakest first), for every student or one.
+        """
+
+    @abstractmethod
+    def improvement_trends(self, user_id: Optional[str] = None) -> pd.DataFrame:
+        """
+        Chronological submissions with their cumulative accuracy, for every student or one.
+        """
+
+    @abstractmethod
+    def daily_accuracy(self, user_id: Optional[str] = None, start: Optional[pd.Timestamp] = None,
+                       end: Optional[pd.Timestamp] = None) -> Optional[pd.DataFrame]:
+        """
+        Per-day accuracy totals shaped like analysis.analyze_performance.daily_accuracy.
+        """
+
+    @abstractmethod
+    def has_student(self, user_id: str) -> bool:
+        """
+        Whether the store holds any historical submission of user_id.
+        """
+
+    def analysis_results(self, user_id: Optional[str] = None) -> Dict[str, Optional[pd.DataFrame]]:
+        """
+        The reports of analyze_all, computed by the store, for every student or one.
+        """
+        reports = {
+            "topic_accuracy": self.topic_accuracy(user_id),
+            "difficulty_performance": self.difficulty_performance(user_id),
+            "improvement_trends": self.improvement_trends(user_id),
+        }
+        # analyze_all reports None rather than an empty frame when there is no data
+        return {name: report if not report.empty else None for name, report in reports.items()}
+
+
+def _epoch_ms(values: pd.Series) -> pd.Series:
+    return (values - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(milliseconds=1)
+
+
+def _to_epoch_ms(timestamp: pd.Timestamp) -> int:
+    timestamp = pd.Timestamp(timestamp)
+    timestamp = timestamp.tz_localize("UTC") if timestamp.tzinfo is None else timestamp.tz_convert("UTC")
+    return int((timestamp - pd.Timestamp(0, tz="UTC")) // pd.Timedelta(milliseconds=1))
+
+
+def _submission_id(record: Dict) -> Optional[str]:
+    """
+    The id a submission is stored under (its received id as text), or None if it has no usable id.
+    """
+    value = record.get("id") if isinstance(record, dict) else None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, (str, int)) or not str(value).strip():
+        return None
+    return str(value)
+
+
+def check_submission_ids(submissions: Iterable[Dict]) -> None:
+    """
+    Raise ValueError unless every submission has an id the store can key it by.
+
+    Args:
+        submissions (Iterable[Dict]): Submission records about to be imported.
+
+    Raises:
+        ValueError: Listing the positions of submissions without a string or integer id.
+    """
+    missing = [position for position, record in enumerate(submissions) if _submission_id(record) is None]
+    if missing:
+        raise ValueError(f"Submissions need a string or integer id (missing at positions {missing[:10]})")
+
+
+def _column(df: pd.DataFrame, name: str) -> list:
+    """
+    A column as a list of Python scalars, with None for missing values (or a missing column).
+    """
+    if name not in df.columns:
+        return [None] * len(df)
+    values = df[name].astype(object)
+    return values.where(values.notna(), None).tolist()
+
+
+class SQLiteStore(SubmissionStore):
+    """
+    SubmissionStore backed by a local SQLite file.
+
+    Typed columns (user, quiz, topic, difficulty, time, accuracy, speed and scores)
+    are extracted on import with the same schema as preprocessing and indexed on
+    user_id (with submitted_at), topic, difficulty_level and submitted_at. The
+    received record is kept as JSON next to them, so load_frames can rebuild the
+    endpoint payloads. Each thread gets its own connection; the database uses
+    WAL so readers are not blocked by an import.
+    """
+
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(SQLITE_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def _query(self, sql: str, params: Iterable = ()) -> pd.DataFrame:
+        cursor = self._connection().execute(sql, tuple(params))
+        columns = [description[0] for description in cursor.description]
+        return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+
+    @staticmethod
+    def _where(user_id: Optional[str], start: Optional[pd.Timestamp] = None,
+               end: Optional[pd.Timestamp] = None) -> Tuple[str, list]:
+        clauses, params = ["origin = ?"], [HISTORICAL]
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(str(user_id))
+        if start is not None:
+            clauses.append("submitted_at >= ?")
+            params.append(_to_epoch_ms(start))
+        if end is not None:
+            clauses.append("submitted_at <= ?")
+            params.append(_to_epoch_ms(end))
+        return " AND ".join(clauses), params
+
+    def _submission_rows(self, origin: str, records: list, processed_df: pd.DataFrame) -> Iterable[tuple]:
+        typed = processed_df.assign(
+            id=[_submission_id(record) for record in records],
+            user_id=processed_df["user_id"].astype(str).where(processed_df["user_id"].notna())
+            if "user_id" in processed_df.columns else None,
+            submitted_at=_epoch_ms(processed_df["submitted_at"]).astype("Int64")
+            if "submitted_at" in processed_df.columns else None)
+        columns = [_column(typed, column) for column in TYPED_COLUMNS.values()]
+        # Rows of the frame are the records in payload order, so the received records are stored as-is
+        for *values, record in zip(*columns, records):
+            yield (origin, *values, json.dumps(record, default=str))
+
+    def _write_submissions(self, connection: sqlite3.Connection, origin: str, records: list, preprocess) -> int:
+        keyed = [record for record in records if _submission_id(record) is not None]
+        if len(keyed) < len(records):
+            logger.warning(f"Skipping {len(records) - len(keyed)} {origin} submission(s) without ids")
+        raw_df = process_data_to_df(keyed, origin) if keyed else None
+        if raw_df is None:
+            return 0
+        processed_df = preprocess(raw_df)
+        if processed_df is None:
+            return 0
+        records = keyed
+
+        rows = self._submission_rows(origin, records, processed_df)
+        written = 0
+        while True:
+            batch = [row for _, row in zip(range(IMPORT_BATCH_ROWS), rows)]
+            if not batch:
+                return written
+            connection.executemany(
+                f"INSERT OR REPLACE INTO submissions (origin, {', '.join(TYPED_COLUMNS)}, payload) "
+                f"VALUES ({', '.join('?' * (len(TYPED_COLUMNS) + 2))})", batch)
+            written += len(batch)
+
+    @staticmethod
+    def _quiz_row(quiz: Dict) -> tuple:
+        return (quiz.get("id"), quiz.get("title") or quiz.get("name"), quiz.get("topic"),
+                quiz.get("difficulty_level"), quiz.get("questions_count"), json.dumps(quiz, default=str))
+
+    def import_payloads(self, quiz_endpoint_data: Optional[Dict], quiz_submission_data: Optional[Dict],
+                        historical_data: Optional[Iterable[Dict]]) -> Dict[str, int]:
+        """
+        Insert or replace the records of the three endpoint payloads in one transaction.
+
+        Args:
+            quiz_endpoint_data (Optional[Dict]): QUIZ_ENDPOINT payload ({"quiz": {...}}).
+            quiz_submission_data (Optional[Dict]): QUIZ_SUBMISSION_DATA payload (one submission).
+            historical_data (Optional[Iterable[Dict]]): HISTORICAL_DATA payload (list of submissions).
+
+        Returns:
+            Dict[str, int]: Rows written per table.
+        """
+        historical_data = list(historical_data) if historical_data is not None else []
+        current_data = [quiz_submission_data] if quiz_submission_data is not None else []
+        counts = {"historical": 0, "current": 0, "quizzes": 0}
+
+        connection = self._connection()
+        with connection:
+            counts["historical"] = self._write_submissions(
+                connection, HISTORICAL, historical_data, preprocess_historical_data)
+            counts["current"] = self._write_submissions(
+                connection, CURRENT, current_data, preprocess_current_quiz_data)
+
+            # Quizzes referenced by submissions, then the quiz endpoint's (which carries the questions)
+            quizzes = {}
+            for record in historical_data:
+                quiz = record.get("quiz") if isinstance(record, dict) else None
+                if isinstance(quiz, dict) and quiz.get("id") is not None:
+                    quizzes.setdefault(quiz["id"], quiz)
+            connection.executemany(
+                "INSERT OR IGNORE INTO quizzes (id, title, topic, difficulty_level, questions_count, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?)", [self._quiz_row(quiz) for quiz in quizzes.values()])
+            counts["quizzes"] = len(quizzes)
+
+            if quiz_endpoint_data is not None:
+                endpoint_quiz = quiz_endpoint_data.get("quiz") if isinstance(quiz_endpoint_data, dict) else None
+                if isinstance(endpoint_quiz, dict) and endpoint_quiz.get("id") is not None:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO quizzes (id, title, topic, difficulty_level, questions_count, payload) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", self._quiz_row(endpoint_quiz))
+                    counts["quizzes"] += 1
+                connection.execute(
+                    "INSERT OR REPLACE INTO endpoint_payloads (name, payload, imported_at) VALUES (?, ?, ?)",
+                    ("quiz", json.dumps(quiz_endpoint_data, default=str), datetime.now().isoformat()))
+
+        logger.info(f"Imported into {self.path}: {counts}")
+        return counts
+
+    def _payload_records(self, origin: str) -> list:
+        cursor = self._connection().execute(
+            "SELECT payload FROM submissions WHERE origin = ? ORDER BY submitted_at IS NULL, submitted_at, id",
+            (origin,))
+        return [json.loads(payload) for (payload,) in cursor]
+
+    def load_frames(self) -> Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+        """
+        Rebuild the raw endpoint frames from the stored records (a fetcher for AnalysisPipeline).
+
+        Returns:
+            Tuple[Optional[pd.DataFrame], Optional[pd.DataFrame], Optional[pd.DataFrame]]:
+            DataFrames for quiz endpoint, current quiz data, and historical quiz data.
+        """
+        row = self._connection().execute(
+            "SELECT payload FROM endpoint_payloads WHERE name = 'quiz'").fetchone()
+        quiz_endpoint_data = json.loads(row[0]) if row is not None else None
+        current = self._payload_records(CURRENT)
+        historical = self._payload_records(HISTORICAL)
+        return payloads_to_frames(quiz_endpoint_data, current[-1] if current else None, historical or None)
+
+    def _average_by(self, column: str, user_id: Optional[str]) -> pd.DataFrame:
+        where, params = self._where(user_id)
+        # NULL averages sort last, like NaN in pandas
+        return self._query(
+            f"SELECT {column}, AVG(accuracy) AS average_accuracy FROM submissions WHERE {where} "
+            f"GROUP BY {column} ORDER BY average_accuracy IS NULL, average_accuracy", params)
+
+    def topic_accuracy(self, user_id: Optional[str] = None) -> pd.DataFrame:
+        """
+        Average accuracy per topic, weakest first (GROUP BY topic in SQLite).
+
+        Args:
+            user_id (Optional[str]): Only this student's submissions (uses the user_id index).
+
+        Returns:
+            pd.DataFrame: Columns topic and average_accuracy.
+        """
+        return self._average_by("topic", user_id)
+
+    def difficulty_performance(self, user_id: Optional[str] = None) -> pd.DataFrame:
+        """
+        Average accuracy per difficulty level, weakest first (GROUP BY difficulty_level in SQLite).
+
+        Args:
+            user_id (Optional[str]): Only this student's submissions (uses the user_id index).
+
+        Returns:
+            pd.DataFrame: Columns difficulty_level and average_accuracy.
+        """
+        return self._average_by("difficulty_level", user_id)
+
+    def improvement_trends(self, user_id: Optional[str] = None) -> pd.DataFrame:
+        """
+        Chronological submissions with the running (NULL-skipping) mean accuracy, as a window function.
+
+        Args:
+            user_id (Optional[str]): Only this student's submissions, read in order from the
+                (user_id, submitted_at) index.
+
+        Returns:
+            pd.DataFrame: Columns submitted_at (UTC), accuracy_percentage and cumulative_accuracy.
+        """
+        where, params = self._where(user_id)
+        trend = self._query(
+            "SELECT submitted_at, accuracy AS accuracy_percentage, AVG(accuracy) OVER ("
+            "ORDER BY submitted_at IS NULL, submitted_at, id ROWS UNBOUNDED PRECEDING) AS cumulative_accuracy "
+            f"FROM submissions WHERE {where} ORDER BY submitted_at IS NULL, submitted_at, id", params)
+        trend["submitted_at"] = pd.to_datetime(trend["submitted_at"], unit="ms", utc=True)
+        for column in ("accuracy_percentage", "cumulative_accuracy"):
+            trend[column] = pd.to_numeric(trend[column], errors="coerce").astype("float64")
+        return trend
+
+    def daily_accuracy(self, user_id: Optional[str] = None, start: Optional[pd.Timestamp] = None,
+                       end: Optional[pd.Timestamp] = None) -> Optional[pd.DataFrame]:
+        """
+        Per-UTC-day accuracy totals, summed in SQLite over the selected rows only.
+
+        Args:
+            user_id (Optional[str]): Only this student's submissions.
+            start (Optional[pd.Timestamp]): Earliest submission time to include.
+            end (Optional[pd.Timestamp]): Latest submission time to include.
+
+        Returns:
+            Optional[pd.DataFrame]: Indexed by day, gap days included with zero attempts;
+            columns accuracy_sum and attempts. None without matching submissions.
+        """
+        where, params = self._where(user_id, start, end)
+        daily = self._query(
+            f"SELECT submitted_at / {MS_PER_DAY} AS day, SUM(accuracy) AS accuracy_sum, "
+            f"COUNT(accuracy) AS attempts FROM submissions "
+            f"WHERE {where} AND submitted_at IS NOT NULL AND accuracy IS NOT NULL GROUP BY day ORDER BY day", params)
+        if daily.empty:
+            return None
+
+        days = pd.to_datetime(daily["day"] * MS_PER_DAY, unit="ms", utc=True)
+        daily = daily.drop(columns=["day"]).set_axis(pd.DatetimeIndex(days, name="day"))
+        calendar = pd.date_range(days.min(), days.max(), freq="D", name="day")
+        return daily.astype({"accuracy_sum": "float64", "attempts": "int64"}).reindex(calendar, fill_value=0)
+
+    def has_student(self, user_id: str) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM submissions WHERE origin = ? AND user_id = ? LIMIT 1", (HISTORICAL, str(user_id))).fetchone()
+        return row is not None
+
+    def is_empty(self) -> bool:
+        row = self._connection().execute(
+            "SELECT 1 FROM submissions WHERE origin = ? LIMIT 1", (HISTORICAL,)).fetchone()
+        return row is None
+
+    def close(self) -> None:
+        """
+        Close this thread's connection.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+_store: Optional[SubmissionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> SubmissionStore:
+    """
+    Return the process-wide submission store (SQLite at QUIZ_STORE_PATH).
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SQLiteStore(STORE_PATH)
+        return _store
+
+
+def import_endpoints(store: Optional[SubmissionStore] = None) -> Dict[str, int]:
+    """
+    Fetch the three endpoint payloads (through the response cache) and import them.
+
+    Args:
+        store (Optional[SubmissionStore]): Store to import into; the process-wide store by default.
+
+    Returns:
+        Dict[str, int]: Rows written per table.
+    """
+    from data.fetch_data import HISTORICAL_DATA, QUIZ_ENDPOINT, QUIZ_SUBMISSION_DATA, fetch_endpoints
+
+    store = store if store is not None else get_store()
+    results = fetch_endpoints([QUIZ_ENDPOINT, QUIZ_SUBMISSION_DATA, HISTORICAL_DATA])
+    return store.import_payloads(
+        results[QUIZ_ENDPOINT][0], results[QUIZ_SUBMISSION_DATA][0], results[HISTORICAL_DATA][0])
+
+
+def main():
+    """Import the live endpoint payloads into the local store and print the row counts."""
+    print(f"{STORE_PATH}: {import_endpoints()}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -0,0 +1,137 @@
+"""
+Per-stage memory accounting.
+
+Inside account_memory(), every stage wrapped by monitoring.metrics.instrument()
+or stage_timer() records how many bytes it allocated (tracemalloc) and still
+held when it returned, and the highest point its allocations reached. Nested
+stages are accounted separately and also count towards their caller.
+
+tracemalloc sees every thread, so run one request or job at a time when you
+need exact figures; outside account_memory() the hooks cost a context lookup.
+"""
+import resource
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+_current_account: ContextVar[Optional["MemoryAccount"]] = ContextVar("memory_account", default=None)
+
+# tracemalloc is process-wide; only the outermost account may start and stop it
+_tracing_lock = threading.Lock()
+_tracing_users = 0
+
+
+class MemoryAccount:
+    """
+    Bytes allocated per stage during one account_memory() block.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Dict[str, int]] = {}
+        self.peak_bytes = 0
+        # One [start bytes, highest bytes seen so far] frame per active stage; index 0 is the account
+        self._frames: List[List[int]] = []
+
+    def _enter(self) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        if self._frames:
+            # Resetting the peak below would lose the caller's high-water mark, so fold it in first
+            self._frames[-1][1] = max(self._frames[-1][1], peak)
+        tracemalloc.reset_peak()
+        self._frames.append([current, current])
+
+    def _exit(self):
+        current, peak = tracemalloc.get_traced_memory()
+        start, highest = self._frames.pop()
+        highest = max(highest, peak)
+        if self._frames:
+            self._frames[-1][1] = max(self._frames[-1][1], highest)
+        return current - start, highest - start
+
+    def _record(self, stage: str, retained: int, peak: int) -> None:
+        entry = self.stages.setdefault(stage, {"calls": 0, "retained_bytes": 0, "peak_bytes": 0})
+        entry["calls"] += 1
+        entry["retained_bytes"] += retained
+        entry["peak_bytes"] = max(entry["peak_bytes"], peak)
+
+    def report(self) -> Dict:
+        """
+        Return the accounting as a JSON-serialisable dict.
+
+        'retained_bytes' is what a stage's allocations still held when it returned
+        (mostly its result), 'peak_bytes' the most it had allocated at once while running.
+        'process_peak_rss_bytes' is the process-wide high-water mark, not just this block.
+        """
+        return {
+            "stages": {stage: dict(entry) for stage, entry in self.stages.items()},
+            "peak_bytes": self.peak_bytes,
+            "process_peak_rss_bytes": _peak_rss_bytes(),
+        }
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@contextmanager
+def account_memory():
+    """
+    Account the memory allocated by every instrumented stage run in this block.
+    Yields the MemoryAccount, which is complete once the block exits.
+    """
+    global _tracing_users
+    with _tracing_lock:
+        if _tracing_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing_users = 1
+        elif _tracing_users:
+            _tracing_users += 1
+
+    account = MemoryAccount()
+    token = _current_account.set(account)
+    account._enter()
+    try:
+        yield account
+    finally:
+        _, account.peak_bytes = account._exit()
+        _current_account.reset(token)
+        with _tracing_lock:
+            if _tracing_users:
+                _tracing_users -= 1
+                if _tracing_users == 0:
+                    tracemalloc.stop()
+
+
+@contextmanager
+def track_stage_memory(stage: str):
+    """
+    Record one stage's allocations in the active account; a no-op without one.
+    """
+    account = _current_account.get()
+    if account is None or not tracemalloc.is_tracing():
+        yield
+        return
+    account._enter()
+    try:
+        yield
+    finally:
+        retained, peak = account._exit()
+        account._record(stage, retained, peak)
+
+
+def format_memory_account(report: Dict) -> str:
+    """
+    Render MemoryAccount.report() as an aligned table, largest peak first.
+    """
+    lines = [f"{'stage':40s} {'calls':>5s} {'retained MB':>12s} {'peak MB':>10s}"]
+    for stage, entry in sorted(report["stages"].items(), key=lambda item: -item[1]["peak_bytes"]):
+        lines.append(f"{stage:40s} {entry['calls']:5d} {entry['retained_bytes'] / 1e6:12.2f} "
+                     f"{entry['peak_bytes'] / 1e6:10.2f}")
+    lines.append(f"{'total (traced peak)':40s} {'':5s} {'':12s} {report['peak_bytes'] / 1e6:10.2f}")
+    lines.append(f"process peak RSS: {report['process_peak_rss_bytes'] / 1e6:.1f} MB")
+    return "\n".join(lines)
@@ -0,0 +1,272 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from monitoring.memory import track_stage_memory
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets (seconds) for stage duration histograms
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# memory_usage(deep=True) walks every Python object in object columns, which can
+# cost as much as the stage itself; enable it explicitly when that detail is needed
+DEEP_MEMORY = os.environ.get("QUIZ_METRICS_DEEP_MEMORY") == "1"
+
+# A collector returns (name, type, help, [(labels, value), ...]) families read at scrape time
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+Collector = Callable[[], Iterable[Family]]
+
+HELP = {
+    "quiz_stage_duration_seconds": "Wall time of each pipeline stage.",
+    "quiz_stage_calls_total": "Number of times each pipeline stage ran.",
+    "quiz_stage_failures_total": "Stage calls that raised or returned no result.",
+    "quiz_stage_rows_total": "Rows produced by each stage, summed over calls.",
+    "quiz_stage_last_rows": "Rows produced by the most recent call of each stage.",
+    "quiz_stage_dataframe_bytes": "Memory of the DataFrames produced by the most recent call of each stage.",
+    "quiz_stage_retained_bytes": "Bytes still held by a stage's allocations when it returned, in the last accounted run.",
+    "quiz_stage_peak_allocated_bytes": "Most bytes a stage had allocated at once, in the last accounted run.",
+    "quiz_upstream_response_bytes_total": "Bytes received from each upstream endpoint.",
+    "quiz_upstream_last_response_bytes": "Size of the most recent response from each upstream endpoint.",
+}
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters, gauges and histograms rendered in the Prometheus
+    text exposition format. Collectors add values owned by other components
+    (caches, single-flight groups) when the registry is scraped.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict] = {}
+        self._gauges: Dict[str, Dict] = {}
+        self._histograms: Dict[str, Dict] = {}
+        self._collectors: List[Collector] = []
+
+    def inc(self, name: str, labels: Dict[str, str], amount: float = 1) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, labels: Dict[str, str], value: float) -> None:
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, labels: Dict[str, str], value: float, buckets=DURATION_BUCKETS) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = {"buckets": buckets, "counts": [0] * len(buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(histogram["buckets"]):
+                if value <= bound:
+                    histogram["counts"][i] += 1
+            histogram["sum"] += value
+            histogram["count"] += 1
+
+    def register_collector(self, collector: Collector) -> None:
+        with self._lock:
+            self._collectors.append(collector)
+
+    def reset(self) -> None:
+        """
+        Drop every recorded value (collectors stay registered).
+        """
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text format (version 0.0.4).
+        """
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            gauges = {name: dict(series) for name, series in self._gauges.items()}
+            histograms = {
+                name: {key: dict(h, counts=list(h["counts"])) for key, h in series.items()}
+                for name, series in self._histograms.items()
+            }
+            collectors = list(self._collectors)
+
+        lines = []
+        for kind, families in (("counter", counters), ("gauge", gauges)):
+            for name in sorted(families):
+                lines.append(f"# HELP {name} {HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in sorted(families[name].items()):
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+        for name in sorted(histograms):
+            lines.append(f"# HELP {name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, histogram in sorted(histograms[name].items()):
+                for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {count}")
+                lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {histogram['count']}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram['sum']!r}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram['count']}")
+
+        for collector in collectors:
+            for name, kind, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(_label_key(labels))} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+
+def get_registry() -> MetricsRegistry:
+    """
+    Return the process-wide metrics registry.
+    """
+    return _registry
+
+
+def _frames_in(result) -> list:
+    # Stages return a DataFrame, a tuple of them (preprocess_all_data) or a dict of them (analyze_all)
+    if hasattr(result, "memory_usage") and hasattr(result, "columns"):
+        return [result]
+    if isinstance(result, dict):
+        result = list(result.values())
+    if isinstance(result, (list, tuple)):
+        return [item for item in result if hasattr(item, "memory_usage") and hasattr(item, "columns")]
+    return []
+
+
+def record_stage(stage: str, seconds: float, result=None, failed: bool = False) -> None:
+    """
+    Record one stage call: its duration, whether it failed and the size of the frames it produced.
+    """
+    labels = {"stage": stage}
+    _registry.observe("quiz_stage_duration_seconds", labels, seconds)
+    _registry.inc("quiz_stage_calls_total", labels)
+    # Always touched so every stage exports a failure series, even at zero
+    _registry.inc("quiz_stage_failures_total", labels, 1 if failed else 0)
+    if failed:
+        return
+
+    frames = _frames_in(result)
+    if frames:
+        rows = sum(len(frame) for frame in frames)
+        _registry.inc("quiz_stage_rows_total", labels, rows)
+        _registry.set("quiz_stage_last_rows", labels, rows)
+        _registry.set("quiz_stage_dataframe_bytes", labels,
+                      sum(int(frame.memory_usage(deep=DEEP_MEMORY).sum()) for frame in frames))
+
+
+def instrument(stage: str, is_failure: Optional[Callable[[object], bool]] = None):
+    """
+    Decorator that records latency, failures, row counts and DataFrame memory for a stage,
+    plus its allocations when run inside monitoring.memory.account_memory().
+    Works on plain functions and coroutine functions.
+
+    A call fails when it raises or when is_failure(result) is true; by default
+    that is a None result, which is how this codebase reports handled errors.
+    """
+    is_failure = is_failure or (lambda result: result is None)
+
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    with track_stage_memory(stage):
+                        result = await func(*args, **kwargs)
+                except Exception:
+                    record_stage(stage, time.perf_counter() - start, failed=True)
+                    raise
+                record_stage(stage, time.perf_counter() - start, result, failed=is_failure(result))
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                with track_stage_memory(stage):
+                    result = func(*args, **kwargs)
+            except Exception:
+                record_stage(stage, time.perf_counter() - start, failed=True)
+                raise
+            record_stage(stage, time.perf_counter() - start, result, failed=is_failure(result))
+            return result
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """
+    Context manager form of instrument() for code that is not a single function call.
+    An exception counts as a failure.
+    """
+    start = time.perf_counter()
+    try:
+        with track_stage_memory(stage):
+            yield
+    except Exception:
+        record_stage(stage, time.perf_counter() - start, failed=True)
+        raise
+    record_stage(stage, time.perf_counter() - start)
+
+
+def record_memory_account(report: Dict) -> None:
+    """
+    Publish a monitoring.memory.MemoryAccount report as per-stage gauges.
+    """
+    for stage, entry in report["stages"].items():
+        labels = {"stage": stage}
+        _registry.set("quiz_stage_retained_bytes", labels, entry["retained_bytes"])
+        _registry.set("quiz_stage_peak_allocated_bytes", labels, entry["peak_bytes"])
+
+
+def record_payload(endpoint: str, n_bytes: int) -> None:
+    """
+    Record the size of a response received from an upstream endpoint.
+    """
+    labels = {"endpoint": endpoint}
+    _registry.inc("quiz_upstream_response_bytes_total", labels, n_bytes)
+    _registry.set("quiz_upstream_last_response_bytes", labels, n_bytes)
+
+
+def render_metrics() -> str:
+    """
+    Return every registered metric in the Prometheus text format.
+    """
+    return _registry.render()
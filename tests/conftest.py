@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+# Make the repository root importable when pytest is run from anywhere
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from stub_upstream import StubUpstream  # noqa: E402
+
+
+@pytest.fixture
+def stub_upstream():
+    with StubUpstream() as stub:
+        yield stub
+
+
+@pytest.fixture
+def response_cache(tmp_path):
+    """
+    A fresh process-wide ResponseCache in a temporary directory.
+    """
+    from data.http_cache import ResponseCache, set_response_cache
+
+    cache = ResponseCache(cache_dir=str(tmp_path / "http"))
+    set_response_cache(cache)
+    yield cache
+    set_response_cache(None)
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubUpstream:
+    """
+    Local HTTP server standing in for the upstream JSON endpoints.
+
+    Every payload is served with an ETag (under the header name given by
+    etag_header), and requests carrying a matching If-None-Match get 304.
+    """
+
+    def __init__(self, etag_header="ETag"):
+        self.payloads = {}
+        self.etag_header = etag_header
+        self.requests = []
+        self.not_modified = 0
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.05},
+                                        daemon=True)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self._server.server_port}{path}"
+
+    @staticmethod
+    def etag(body):
+        return '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests.append((self.path, dict(self.headers)))
+                if self.path not in stub.payloads:
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = json.dumps(stub.payloads[self.path]).encode("utf-8")
+                etag = stub.etag(body)
+                if self.headers.get("If-None-Match") == etag:
+                    stub.not_modified += 1
+                    self.send_response(304)
+                    self.send_header(stub.etag_header, etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header(stub.etag_header, etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
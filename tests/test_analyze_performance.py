@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.analyze_performance import (
+    EXTENDED_AGGREGATES,
+    aggregate_history,
+    analyze_all,
+    daily_accuracy,
+    daily_accuracy_by_student,
+    student_daily_accuracy,
+)
+from benchmarks.synthetic_data import generate_submissions
+from data.fetch_data import process_data_to_df
+from data.preprocess_data import preprocess_historical_data
+
+
+@pytest.fixture(scope="module")
+def history():
+    return preprocess_historical_data(process_data_to_df(generate_submissions(3000, n_users=40), "historical"))
+
+
+def test_student_daily_accuracy_matches_filtered_history(history):
+    by_student = daily_accuracy_by_student(history)
+
+    for user_id in history["user_id"].astype(str).unique()[:5]:
+        expected = daily_accuracy(history[history["user_id"].astype(str) == user_id])
+        pd.testing.assert_frame_equal(student_daily_accuracy(by_student, user_id), expected, check_freq=False)
+
+
+def test_student_daily_accuracy_unknown_student(history):
+    assert student_daily_accuracy(daily_accuracy_by_student(history), "nobody") is None
+    assert student_daily_accuracy(None, "nobody") is None
+
+
+def test_aggregate_history_with_only_unmergeable_statistics(history):
+    reports = aggregate_history(history, {'median_speed': ('speed', 'median')})
+
+    topics = reports["topic_accuracy"].set_index("topic")["median_speed"]
+    expected = pd.to_numeric(history["speed"], errors="coerce").groupby(history["topic"], observed=True).median()
+    pd.testing.assert_series_equal(topics.sort_index(), expected.sort_index(), check_names=False)
+    assert list(reports["difficulty_performance"].columns) == ["difficulty_level", "median_speed"]
+
+
+def test_aggregate_history_mixed_statistics(history):
+    reports = aggregate_history(history, EXTENDED_AGGREGATES)
+
+    topic = reports["topic_accuracy"].set_index("topic")
+    accuracy = history.groupby("topic", observed=True)["accuracy_percentage"]
+    assert (topic["attempts"].sort_index() == accuracy.count().sort_index()).all()
+    assert topic["average_accuracy"].sort_index().to_numpy() == pytest.approx(accuracy.mean().sort_index().to_numpy())
+
+
+def test_merged_std_keeps_precision_around_a_large_mean():
+    rng = np.random.default_rng(0)
+    history = pd.DataFrame({
+        "topic": rng.choice(["a", "b", "c"], 5000),
+        "difficulty_level": rng.choice(["easy", "medium", "hard"], 5000),
+        "accuracy_percentage": 1e9 + rng.normal(0, 0.01, 5000),
+    })
+
+    reports = aggregate_history(history, {"accuracy_std": ("accuracy_percentage", "std")})
+
+    for report, column in (("topic_accuracy", "topic"), ("difficulty_performance", "difficulty_level")):
+        merged = reports[report].set_index(column)["accuracy_std"].sort_index()
+        expected = history.groupby(column)["accuracy_percentage"].std().sort_index()
+        assert merged.to_numpy() == pytest.approx(expected.to_numpy(), rel=1e-4)
+
+
+def test_analyze_all_matches_the_three_pass_engine(history):
+    from benchmarks import three_pass_analysis
+
+    results = analyze_all(history)
+    reference = three_pass_analysis.analyze_all(history.copy())
+
+    for report, column in (("topic_accuracy", "topic"), ("difficulty_performance", "difficulty_level")):
+        merged = results[report].set_index(column)["average_accuracy"].sort_index()
+        expected = reference[report].set_index(column)["average_accuracy"].sort_index()
+        assert list(merged.index.astype(str)) == list(expected.index.astype(str))
+        assert merged.to_numpy() == pytest.approx(expected.to_numpy())
+    # The reference sorts unstably, so only the final cumulative accuracy is order-independent
+    assert results["improvement_trends"]["cumulative_accuracy"].iloc[-1] == pytest.approx(
+        reference["improvement_trends"]["cumulative_accuracy"].iloc[-1])
+
+
+def test_daily_accuracy_metrics_are_labelled_per_function(history, monkeypatch):
+    import monitoring.metrics as metrics
+
+    stages = []
+    monkeypatch.setattr(metrics, "record_stage", lambda stage, *args, **kwargs: stages.append(stage))
+
+    daily_accuracy(history)
+    daily_accuracy_by_student(history)
+
+    assert stages == ["daily_accuracy", "daily_accuracy_by_student"]
+
+
+def test_daily_accuracy_by_student_skips_anonymous_submissions(history):
+    anonymous = history.assign(user_id=history["user_id"].astype(object).where(history.index % 3 != 0))
+
+    by_student = daily_accuracy_by_student(anonymous)
+
+    assert "nan" not in by_student.index.get_level_values("user_id")
+    assert by_student["attempts"].sum() == anonymous["user_id"].notna().sum()
@@ -0,0 +1,154 @@
+import pandas as pd
+import pytest
+
+import api.app as app_module
+
+
+@pytest.fixture
+def client():
+    return app_module.app.test_client()
+
+
+def test_student_dashboard_without_scored_attempts(client, monkeypatch):
+    analysis_results = {
+        "topic_accuracy": None,
+        "difficulty_performance": None,
+        "improvement_trends": pd.DataFrame({"cumulative_accuracy": [float("nan")]}),
+    }
+    monkeypatch.setattr(app_module, "_student_results", lambda user_id: (analysis_results, {}))
+
+    response = client.get("/students/u1/dashboard")
+
+    assert response.status_code == 200
+    assert response.get_json()["performance_metrics"]["overall_accuracy"] is None
+
+
+def test_posted_submissions_reach_the_peer_model(client, monkeypatch, tmp_path):
+    from analysis.incremental import AnalyticsState
+    from analysis.pipeline import AnalysisPipeline
+    from benchmarks.synthetic_data import generate_current_submission, generate_quiz_endpoint, generate_submissions
+    from data.fetch_data import payloads_to_frames
+
+    monkeypatch.chdir(tmp_path)
+    payloads = (generate_quiz_endpoint(), generate_current_submission(), generate_submissions(500, n_users=20))
+    pipeline = AnalysisPipeline(fetcher=lambda: payloads_to_frames(*payloads))
+    monkeypatch.setattr(app_module, "get_pipeline", lambda: pipeline)
+    monkeypatch.setattr(app_module, "get_analytics_state", AnalyticsState)
+
+    assert client.get("/students/newcomer/peers").status_code == 404
+    submission = dict(payloads[2][0], id="new-1", user_id="newcomer")
+    response = client.post("/submissions", json=submission)
+
+    assert response.get_json()["applied"] == 1
+    peers = client.get("/students/newcomer/peers?k=3")
+    assert peers.status_code == 200
+    assert len(peers.get_json()["similar_students"]) == 3
+
+
+@pytest.fixture
+def empty_store(monkeypatch, tmp_path):
+    import data.store as store_module
+
+    monkeypatch.chdir(tmp_path)
+    store = store_module.SQLiteStore(str(tmp_path / "store.sqlite3"))
+    monkeypatch.setenv("QUIZ_USE_STORE", "1")
+    monkeypatch.setattr(store_module, "get_store", lambda: store)
+    return store
+
+
+@pytest.fixture
+def history():
+    from benchmarks.synthetic_data import generate_submissions
+
+    return generate_submissions(200, n_users=10)
+
+
+@pytest.fixture
+def store(empty_store, history):
+    from benchmarks.synthetic_data import generate_current_submission, generate_quiz_endpoint
+
+    empty_store.import_payloads(generate_quiz_endpoint(), generate_current_submission(), history)
+    return empty_store
+
+
+@pytest.fixture
+def state(monkeypatch):
+    from analysis.incremental import AnalyticsState
+
+    state = AnalyticsState()
+    monkeypatch.setattr(app_module, "get_analytics_state", lambda: state)
+    return state
+
+
+def test_empty_store_is_imported_on_first_use(client, empty_store, history, state, monkeypatch):
+    import data.store as store_module
+    from benchmarks.synthetic_data import generate_current_submission, generate_quiz_endpoint
+
+    monkeypatch.setattr(store_module, "import_endpoints", lambda store: store.import_payloads(
+        generate_quiz_endpoint(), generate_current_submission(), history))
+
+    assert client.get(f"/students/{history[0]['user_id']}/recommendations").status_code == 200
+    assert not empty_store.is_empty()
+
+    submission = dict(history[0], id=10 ** 9, user_id="newcomer")
+    assert client.post("/submissions", json=submission).get_json()["applied"] == 1
+    assert empty_store.has_student("newcomer")
+
+
+def test_store_left_empty_falls_back_to_the_pipeline(empty_store, monkeypatch):
+    import data.store as store_module
+
+    monkeypatch.setattr(store_module, "import_endpoints", lambda store: store.import_payloads(None, None, None))
+
+    assert app_module.get_store() is None
+
+
+def test_string_ids_reach_the_store(client, store, history, state):
+    submission = dict(history[0], id="abc-1", user_id="newcomer")
+
+    response = client.post("/submissions", json=submission)
+
+    assert response.status_code == 200
+    assert response.get_json()["applied"] == 1
+    assert store.has_student("newcomer")
+
+
+@pytest.mark.parametrize("missing", [{}, {"id": None}, {"id": ""}, {"id": {"nested": 1}}])
+def test_submissions_without_ids_are_rejected_with_the_store(client, store, history, state, missing):
+    submissions = [dict(history[0], id="ok-1", user_id="newcomer"),
+                   {**{key: value for key, value in history[1].items() if key != "id"}, **missing,
+                    "user_id": "newcomer"}]
+
+    response = client.post("/submissions", json=submissions)
+
+    assert response.status_code == 400
+    assert state.total_count == 0
+    assert not store.has_student("newcomer")
+
+
+def test_failed_store_import_changes_nothing_and_can_be_retried(client, store, history, state, monkeypatch):
+    submission = dict(history[0], id="abc-2", user_id="newcomer")
+    import_payloads = store.import_payloads
+
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store, "import_payloads", fail)
+    assert client.post("/submissions", json=submission).status_code == 500
+    assert state.total_count == 0
+
+    monkeypatch.setattr(store, "import_payloads", import_payloads)
+    assert client.post("/submissions", json=submission).get_json()["applied"] == 1
+    assert store.has_student("newcomer")
+
+
+def test_non_object_submissions_are_rejected(client, monkeypatch):
+    from analysis.incremental import AnalyticsState
+
+    state = AnalyticsState()
+    monkeypatch.setattr(app_module, "get_analytics_state", lambda: state)
+
+    response = client.post("/submissions", json=[1, 2])
+
+    assert response.status_code == 400
+    assert state.total_count == 0
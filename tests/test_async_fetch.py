@@ -0,0 +1,43 @@
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from data.async_fetch import create_client, fetch_data_async  # noqa: E402
+
+
+def fetch_twice(url):
+    async def run():
+        client = create_client()
+        try:
+            return [await fetch_data_async(client, url), await fetch_data_async(client, url)]
+        finally:
+            await client.aclose()
+
+    return asyncio.run(run())
+
+
+def test_async_revalidation_gets_304(stub_upstream, response_cache, monkeypatch):
+    monkeypatch.setenv("QUIZ_HTTP_CACHE_TTL", "0")
+    stub_upstream.payloads["/history"] = [{"id": 1}, {"id": 2}]
+    url = stub_upstream.url("/history")
+
+    assert fetch_twice(url) == [[{"id": 1}, {"id": 2}]] * 2
+
+    # httpx lowercases header names; the validator must still be stored and sent
+    assert stub_upstream.requests[1][1].get("If-None-Match") == stub_upstream.etag(b'[{"id": 1}, {"id": 2}]')
+    assert stub_upstream.not_modified == 1
+    assert response_cache.stats()["not_modified"] == 1
+    assert response_cache.stats()["errors"] == 0
+
+
+def test_async_fetch_shares_the_sync_cache(stub_upstream, response_cache):
+    from data.fetch_data import fetch_data
+
+    stub_upstream.payloads["/quiz"] = {"quiz": {"id": 7}}
+    url = stub_upstream.url("/quiz")
+
+    assert fetch_data(url) == {"quiz": {"id": 7}}
+    assert fetch_twice(url) == [{"quiz": {"id": 7}}] * 2
+    assert len(stub_upstream.requests) == 1
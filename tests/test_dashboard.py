@@ -0,0 +1,24 @@
+import pandas as pd
+
+from analysis.dashboard import topic_strengths
+from analysis.recommendations import DEFAULT_RULES
+
+
+def analysis_results(accuracies):
+    return {
+        "topic_accuracy": pd.DataFrame({"topic": list(accuracies), "average_accuracy": list(accuracies.values())}),
+        "difficulty_performance": None,
+        "improvement_trends": None,
+    }
+
+
+def test_topic_strengths_use_recommendation_thresholds():
+    weak, strong = DEFAULT_RULES["weak_topic_below"], DEFAULT_RULES["strong_topic_from"]
+    results = analysis_results({"Ecology": weak - 1, "Cells": weak, "Genetics": strong, "Botany": strong + 5})
+
+    assert topic_strengths(results) == (["Genetics", "Botany"], ["Ecology"])
+
+
+def test_topic_strengths_without_topics():
+    assert topic_strengths(analysis_results({})) == ([], [])
+    assert topic_strengths({"topic_accuracy": None}) == ([], [])
@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+from data.fetch_data import iter_json_array
+
+
+def chunked(text, size):
+    data = text.encode("utf-8")
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 3, 64])
+def test_elements_split_across_chunks(size):
+    elements = [{"id": 1, "quiz": {"topic": "Ünïcode"}}, 123, "a,b]", [1, [2]], None, -4.5e3]
+
+    assert list(iter_json_array(chunked(" [ " + " , ".join(map(json.dumps, elements)) + " ] ", size))) == elements
+
+
+def test_top_level_object_is_one_element():
+    assert list(iter_json_array(chunked('{"id": 1}', 2))) == [{"id": 1}]
+
+
+@pytest.mark.parametrize("text", ["", "[]", " [ ] "])
+def test_empty_input(text):
+    assert list(iter_json_array(chunked(text, 2))) == []
+
+
+@pytest.mark.parametrize("text", ["[1,,,2]", "[,1]", "[1,]", "[1 2]", "[1,2", '[{"id": 1}'])
+def test_malformed_arrays_are_rejected(text):
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunked(text, 2)))
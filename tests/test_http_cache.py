@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+from data.fetch_data import _request_json
+from data.http_cache import ResponseCache
+from stub_upstream import StubUpstream
+
+
+def loader(url, headers):
+    return _request_json(url, headers, timeout=5, retries=0, backoff=0)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.01)
+
+
+def test_miss_then_hit(stub_upstream, tmp_path):
+    stub_upstream.payloads["/data"] = [{"id": 1}]
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    url = stub_upstream.url("/data")
+
+    assert cache.get(url, loader, ttl=60) == [{"id": 1}]
+    assert cache.get(url, loader, ttl=60) == [{"id": 1}]
+
+    assert len(stub_upstream.requests) == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_disk_tier_survives_restart(stub_upstream, tmp_path):
+    stub_upstream.payloads["/data"] = {"quiz": 1}
+    url = stub_upstream.url("/data")
+    ResponseCache(cache_dir=str(tmp_path)).get(url, loader, ttl=60)
+
+    restarted = ResponseCache(cache_dir=str(tmp_path))
+    assert restarted.get(url, loader, ttl=60) == {"quiz": 1}
+    assert restarted.stats()["disk_hits"] == 1
+    assert len(stub_upstream.requests) == 1
+
+
+@pytest.mark.parametrize("etag_header", ["ETag", "etag"])
+def test_stale_entry_is_revalidated_with_304(tmp_path, etag_header):
+    with StubUpstream(etag_header=etag_header) as stub:
+        stub.payloads["/data"] = [1, 2, 3]
+        cache = ResponseCache(cache_dir=str(tmp_path))
+        url = stub.url("/data")
+
+        cache.get(url, loader, ttl=0)
+        assert cache.get(url, loader, ttl=0) == [1, 2, 3]
+
+        assert stub.requests[1][1].get("If-None-Match") == stub.etag(b"[1, 2, 3]")
+        assert stub.not_modified == 1
+        assert cache.stats()["not_modified"] == 1
+
+
+def test_changed_upstream_replaces_entry(stub_upstream, tmp_path):
+    stub_upstream.payloads["/data"] = [1]
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    url = stub_upstream.url("/data")
+
+    cache.get(url, loader, ttl=0)
+    stub_upstream.payloads["/data"] = [2]
+    assert cache.get(url, loader, ttl=0) == [2]
+    assert stub_upstream.not_modified == 0
+
+
+def test_stale_while_revalidate_serves_stale_then_refreshes(stub_upstream, tmp_path):
+    stub_upstream.payloads["/data"] = ["old"]
+    cache = ResponseCache(cache_dir=str(tmp_path), stale_while_revalidate=True)
+    url = stub_upstream.url("/data")
+
+    cache.get(url, loader, ttl=0)
+    stub_upstream.payloads["/data"] = ["new"]
+
+    # The stale copy is returned at once; the refresh happens in the background
+    assert cache.get(url, loader, ttl=0) == ["old"]
+    assert cache.stats()["stale_served"] == 1
+    wait_for(lambda: len(stub_upstream.requests) == 2 and not cache._refreshing)
+    assert cache.get(url, loader, ttl=60) == ["new"]
+
+
+def test_upstream_failure_serves_stale_copy(stub_upstream, tmp_path):
+    stub_upstream.payloads["/data"] = {"ok": True}
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    url = stub_upstream.url("/data")
+
+    cache.get(url, loader, ttl=0)
+    del stub_upstream.payloads["/data"]
+    assert cache.get(url, loader, ttl=0) == {"ok": True}
+    assert cache.stats()["errors"] == 1
+
+
+def test_version_survives_304_and_changes_with_body(stub_upstream, tmp_path):
+    stub_upstream.payloads["/data"] = [1, 2, 3]
+    cache = ResponseCache(cache_dir=str(tmp_path))
+    url = stub_upstream.url("/data")
+
+    _, version = cache.get_versioned(url, loader, ttl=0)
+    assert cache.get_versioned(url, loader, ttl=0) == ([1, 2, 3], version)
+    assert stub_upstream.not_modified == 1
+
+    stub_upstream.payloads["/data"] = [4]
+    data, changed = cache.get_versioned(url, loader, ttl=0)
+    assert data == [4]
+    assert changed != version
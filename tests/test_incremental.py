@@ -0,0 +1,119 @@
+import json
+
+import pytest
+
+import analysis.incremental as incremental
+from analysis.incremental import AnalyticsState, build_state, ingest_submissions
+from benchmarks.synthetic_data import generate_submissions
+from data.fetch_data import process_data_to_df
+from data.preprocess_data import preprocess_historical_data
+
+
+def submission(submission_id, accuracy=" 80 %", topic="Genetics", submitted_at="2024-05-01T10:00:00+05:30"):
+    return {"id": submission_id, "accuracy": accuracy, "submitted_at": submitted_at,
+            "quiz": {"topic": topic, "difficulty_level": "easy"}}
+
+
+def test_apply_submission_updates_aggregates():
+    state = AnalyticsState()
+    assert state.apply_submission(submission(1, " 80 %"))
+    assert state.apply_submission(submission(2, 60, topic="Ecology"))
+    assert not state.apply_submission(submission(1))
+
+    assert state.topics == {"Genetics": [80.0, 1], "Ecology": [60.0, 1]}
+    assert state.difficulties == {"easy": [140.0, 2]}
+    assert state.cumulative_accuracy == 70.0
+    assert state.last_submitted_at == "2024-05-01T04:30:00+00:00"
+
+
+@pytest.mark.parametrize("bad", [
+    submission(1, accuracy="n/a"),
+    submission(1, submitted_at="not a date"),
+])
+def test_invalid_submission_leaves_state_untouched(bad):
+    state = AnalyticsState()
+    assert not state.apply_submission(bad)
+    assert state.to_dict() == AnalyticsState().to_dict()
+
+
+def test_matches_full_rebuild():
+    records = generate_submissions(500, n_users=20)
+    history = preprocess_historical_data(process_data_to_df(records[:400], "historical"))
+
+    state = build_state(history)
+    for record in records[400:]:
+        state.apply_submission(record)
+    rebuilt = build_state(preprocess_historical_data(process_data_to_df(records, "historical")))
+
+    assert state.total_count == rebuilt.total_count
+    assert state.total_sum == pytest.approx(rebuilt.total_sum)
+    assert state.topics.keys() == rebuilt.topics.keys()
+    for topic, (total, count) in rebuilt.topics.items():
+        assert state.topics[topic] == [pytest.approx(total), count]
+    assert state.last_submitted_at == rebuilt.last_submitted_at
+
+
+def test_ingest_journals_until_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(incremental, "COMPACT_EVERY", 3)
+    path = str(tmp_path / "state.json")
+    state = AnalyticsState()
+    state.save(path)
+
+    assert len(ingest_submissions(state, [submission(1), submission(2)], path)) == 2
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["total_count"] == 0
+    with open(f"{path}.journal", encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+
+    assert [record["id"] for record in ingest_submissions(state, submission(3), path)] == ["3"]
+    assert not (tmp_path / "state.json.journal").exists()
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["total_count"] == 3
+
+
+def test_load_replays_journal(tmp_path):
+    path = str(tmp_path / "state.json")
+    state = AnalyticsState()
+    state.apply_submission(submission(1))
+    state.save(path)
+    ingest_submissions(state, [submission(2, 40), submission(1)], path)
+    with open(f"{path}.journal", "a", encoding="utf-8") as f:
+        f.write('{"id": "3", "acc')
+
+    loaded = AnalyticsState.load(path)
+
+    assert loaded.topics == state.topics == {"Genetics": [120.0, 2]}
+    assert loaded.total_count == 2
+    assert loaded.applied_ids == {"1", "2"}
+    assert not (tmp_path / "state.json.journal").exists()
+
+
+def test_load_ignores_unreadable_state(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text("{not json", encoding="utf-8")
+    assert AnalyticsState.load(str(path)) is None
+    assert AnalyticsState.load(str(tmp_path / "missing.json")) is None
+
+
+def test_ingest_rejects_non_object_submissions(tmp_path):
+    path = str(tmp_path / "state.json")
+    state = AnalyticsState()
+
+    with pytest.raises(ValueError):
+        ingest_submissions(state, [submission(1), 2], path=path)
+
+    assert state.to_dict() == AnalyticsState().to_dict()
+    assert not (tmp_path / "state.json.journal").exists()
+
+
+def test_failed_journal_write_leaves_state_untouched(tmp_path):
+    path = str(tmp_path / "state.json")
+    (tmp_path / "state.json.journal").mkdir()
+    state = AnalyticsState()
+
+    with pytest.raises(OSError):
+        ingest_submissions(state, [submission(1), submission(2)], path=path)
+
+    assert state.total_count == 0
+    assert ingest_submissions(state, [submission(1), submission(1)], path=None) == [
+        incremental.parse_submission(submission(1))]
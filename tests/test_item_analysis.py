@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from analysis.item_analysis import answer_key, item_statistics, response_matrix
+from benchmarks.synthetic_data import generate_quiz_endpoint, generate_submissions
+from data.fetch_data import process_data_to_df
+from data.preprocess_data import preprocess_historical_data
+
+
+@pytest.fixture(scope="module")
+def history():
+    return preprocess_historical_data(process_data_to_df(generate_submissions(2000, n_users=40), "historical"))
+
+
+@pytest.fixture(scope="module")
+def key(history):
+    return answer_key(history["quiz"].tolist() + [generate_quiz_endpoint()["quiz"]])
+
+
+def test_anonymous_submissions_are_not_a_student(history, key):
+    anonymous = history.assign(user_id=history["user_id"].astype(object).where(history.index % 4 != 0))
+
+    matrix = response_matrix(anonymous, key)
+    expected = response_matrix(anonymous[anonymous["user_id"].notna()], key)
+
+    assert "nan" not in matrix.students
+    assert list(matrix.students) == list(expected.students)
+    for field in ("rows", "cols", "attempts", "correct"):
+        np.testing.assert_array_equal(getattr(matrix, field), getattr(expected, field))
+    assert item_statistics(matrix, key).equals(item_statistics(expected, key))
@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import analysis.pipeline as pipeline_module
+from analysis.analyze_performance import analyze_all
+from analysis.incremental import parse_submission
+from analysis.peers import add_submissions, build_peer_model, load_peer_model, peer_recommendations, save_peer_model
+from analysis.pipeline import AnalysisPipeline
+from benchmarks.synthetic_data import generate_current_submission, generate_quiz_endpoint, generate_submissions
+from data.fetch_data import payloads_to_frames, process_data_to_df
+from data.preprocess_data import preprocess_historical_data
+
+
+def peer_model_for(records, key=None):
+    history = preprocess_historical_data(process_data_to_df(records, "historical"))
+    return build_peer_model(analyze_all(history, by_student=True), history, key=key)
+
+
+@pytest.fixture(scope="module")
+def records():
+    return generate_submissions(2000, n_users=60)
+
+
+def test_save_and_load_round_trip(records, tmp_path):
+    path = str(tmp_path / "peers.npz")
+    model = peer_model_for(records, key="version:1")
+    save_peer_model(model, path)
+
+    loaded = load_peer_model(path, "version:1")
+    assert load_peer_model(path, "version:2") is None
+    assert loaded["index"].ids == model["index"].ids
+    np.testing.assert_array_equal(loaded["counts"], model["counts"])
+    user_id = model["index"].ids[0]
+    assert peer_recommendations(loaded, user_id) == peer_recommendations(model, user_id)
+
+
+def test_added_submissions_match_a_rebuild(records):
+    model = peer_model_for(records[:1800])
+    new = [dict(record, user_id="newcomer") if i % 2 else record for i, record in enumerate(records[1800:])]
+
+    inserted = add_submissions(model, [parse_submission(record) for record in new])
+
+    rebuilt = peer_model_for(records[:1800] + new)
+    assert inserted == len(new)
+    assert "newcomer" in model["index"]
+    for user_id in {"newcomer", str(new[0]["user_id"])}:
+        features = rebuilt["index"].features
+        added = dict(zip(model["index"].features, model["index"].vector(user_id)))
+        np.testing.assert_allclose([added[f] for f in features], rebuilt["index"].vector(user_id), rtol=1e-5)
+
+
+def test_pipeline_loads_persisted_peer_model(tmp_path, monkeypatch):
+    payloads = (generate_quiz_endpoint(), generate_current_submission(), generate_submissions(1000, n_users=30))
+    path = str(tmp_path / "peers.npz")
+
+    def run():
+        pipeline = AnalysisPipeline(fetcher=lambda: payloads_to_frames(*payloads), peer_model_path=path)
+        return pipeline.run(students=True)["peer_model"]
+
+    built = run()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("a persisted peer model must not be rebuilt")
+
+    monkeypatch.setattr(pipeline_module, "build_peer_model", fail)
+    assert run()["index"].ids == built["index"].ids
+
+
+def test_anonymous_submissions_get_no_improvement():
+    from analysis.peers import improvement_frame
+
+    history = pd.DataFrame({
+        "user_id": ["a", "b", None, "a", "b", None, "a", "b", None, "a", "b", None],
+        "submitted_at": pd.date_range("2024-01-01", periods=12, freq="D", tz="UTC"),
+        "accuracy_percentage": [50.0, 60.0, 0.0, 50.0, 60.0, 0.0, 70.0, 60.0, 100.0, 70.0, 60.0, 100.0],
+        "topic": ["Genetics"] * 12,
+        "difficulty_level": ["easy"] * 12,
+    })
+
+    improvements = improvement_frame(history, min_attempts=2)
+
+    pd.testing.assert_frame_equal(improvements, improvement_frame(history.dropna(subset=["user_id"]), min_attempts=2))
+    assert improvements.groupby("user_id")["improvement"].max().to_dict() == {"a": 20.0, "b": 0.0}
@@ -0,0 +1,56 @@
+import pytest
+
+import analysis.pipeline as pipeline_module
+from analysis.pipeline import AnalysisPipeline
+from benchmarks.synthetic_data import generate_current_submission, generate_quiz_endpoint, generate_submissions
+from data.fetch_data import payloads_to_frames
+
+
+@pytest.fixture(scope="module")
+def payloads():
+    return generate_quiz_endpoint(), generate_current_submission(), generate_submissions(2000, n_users=50)
+
+
+def test_versioned_frames_are_not_serialised(payloads, monkeypatch):
+    def fail(df):
+        raise AssertionError("versioned frames must not be fingerprinted")
+
+    monkeypatch.setattr(pipeline_module, "fingerprint_frame", fail)
+    pipeline = AnalysisPipeline()
+
+    first = pipeline.run(frames=payloads_to_frames(*payloads, versions=("etag:q", "etag:c", "etag:h")))
+    builds = pipeline.stats()["stage_builds"]
+    second = pipeline.run(frames=payloads_to_frames(*payloads, versions=("etag:q", "etag:c", "etag:h")))
+
+    assert pipeline.stats()["stage_builds"] == builds
+    assert second["fingerprint"] == first["fingerprint"]
+    assert second["analysis_results"] is first["analysis_results"]
+
+
+def test_new_version_rebuilds_dependent_stages(payloads):
+    pipeline = AnalysisPipeline()
+    first = pipeline.run(frames=payloads_to_frames(*payloads, versions=("etag:q", "etag:c", "etag:h1")))
+    second = pipeline.run(frames=payloads_to_frames(*payloads, versions=("etag:q", "etag:c", "etag:h2")))
+
+    assert second["fingerprint"] != first["fingerprint"]
+    assert second["quiz_df"] is first["quiz_df"]
+    assert second["historical_quiz_df"] is not first["historical_quiz_df"]
+
+
+def test_unversioned_frames_fall_back_to_fingerprint(payloads):
+    pipeline = AnalysisPipeline()
+    first = pipeline.run(frames=payloads_to_frames(*payloads))
+    second = pipeline.run(frames=payloads_to_frames(*payloads))
+
+    assert second["fingerprint"] == first["fingerprint"]
+    assert second["historical_quiz_df"] is first["historical_quiz_df"]
+
+
+def test_run_builds_analysis_only_when_read(payloads):
+    pipeline = AnalysisPipeline()
+    results = pipeline.run(frames=payloads_to_frames(*payloads), students=True)
+
+    assert not any(results.is_ready(key) for key in ("analysis_results", "item_analysis", "peer_model"))
+    results["recommendations"]
+    assert set(pipeline._stages) == {
+        "preprocess_quiz", "preprocess_current", "preprocess_historical", "analyze", "recommend"}
@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from analysis.analyze_performance import analyze_all
+from analysis.recommendations import generate_recommendations, recommendation_frame
+from benchmarks.synthetic_data import generate_submissions
+from data.fetch_data import process_data_to_df
+from data.preprocess_data import preprocess_historical_data
+
+
+def legacy_recommendations(analysis_results):
+    """The per-student rules as they were before recommendation_frame()."""
+    recommendations = {}
+    topic_accuracy = analysis_results.get("topic_accuracy")
+    if topic_accuracy is not None and not topic_accuracy.empty:
+        weak_topics = topic_accuracy[topic_accuracy["average_accuracy"] < 60]
+        strong_topics = topic_accuracy[topic_accuracy["average_accuracy"] >= 80]
+        if not weak_topics.empty:
+            recommendations["weak_topics"] = weak_topics["topic"].tolist()
+            recommendations["weak_topics_action"] = "Focus on these topics with additional practice."
+        if not strong_topics.empty:
+            recommendations["strong_topics"] = strong_topics["topic"].tolist()
+            recommendations["strong_topics_action"] = "Keep revising these topics to maintain your strength."
+
+    difficulty_performance = analysis_results.get("difficulty_performance")
+    if difficulty_performance is not None and not difficulty_performance.empty:
+        if (difficulty_performance["average_accuracy"] < 60).any():
+            recommendations["difficulty_focus"] = "Work on improving performance for specific difficulty levels."
+
+    improvement_trends = analysis_results.get("improvement_trends")
+    if improvement_trends is not None and not improvement_trends.empty:
+        final_accuracy = improvement_trends["cumulative_accuracy"].iloc[-1]
+        recommendations["overall_performance"] = (
+            f"Your current cumulative accuracy is {final_accuracy:.2f}%. "
+            "Keep working to maintain your upward trend."
+        )
+
+    recommendations["summary"] = "These recommendations are based on your recent performance trends and quiz data."
+    return recommendations
+
+
+@pytest.fixture(scope="module")
+def history():
+    return preprocess_historical_data(process_data_to_df(generate_submissions(3000, n_users=40), "historical"))
+
+
+def test_batched_recommendations_match_per_student_rules(history):
+    batched = generate_recommendations(analyze_all(history, by_student=True), by_student=True)
+
+    user_ids = history["user_id"].astype(str)
+    assert sorted(map(str, batched)) == sorted(user_ids.unique())
+    for user_id, recommendations in batched.items():
+        student_history = history[user_ids == str(user_id)]
+        assert recommendations == legacy_recommendations(analyze_all(student_history)), user_id
+
+
+def test_single_student_recommendations_match_rules(history):
+    analysis_results = analyze_all(history)
+
+    assert generate_recommendations(analysis_results) == legacy_recommendations(analysis_results)
+
+
+def test_empty_results_only_carry_the_summary():
+    empty = {"topic_accuracy": None, "difficulty_performance": None, "improvement_trends": None}
+
+    assert generate_recommendations(empty) == legacy_recommendations(empty)
+    assert list(recommendation_frame(empty).index) == [0]
+
+
+def test_rules_override_thresholds(history):
+    analysis_results = analyze_all(history)
+    row = recommendation_frame(analysis_results, rules={"weak_topic_below": 101, "strong_topic_from": 101}).iloc[0]
+
+    assert row["weak_topics"] == analysis_results["topic_accuracy"]["topic"].astype(object).tolist()
+    assert pd.isna(row["strong_topics"])
+    with pytest.raises(ValueError):
+        recommendation_frame(analysis_results, rules={"unknown": 1})
@@ -0,0 +1,106 @@
+import pandas as pd
+import pytest
+
+from data.schema import (
+    SUBMISSION_SCHEMA,
+    Field,
+    apply_field,
+    apply_schema,
+    parse_boolean,
+    parse_datetime,
+    parse_numeric,
+    parse_percent,
+)
+
+
+def test_parse_percent_mixed_column():
+    values = pd.Series([" 90 %", "75%", 60, "n/a", None, 12.5], dtype=object)
+
+    parsed = parse_percent(values)
+
+    assert parsed.tolist()[:3] == [90.0, 75.0, 60.0]
+    assert parsed.iloc[3:5].isna().all()
+    assert parsed.iloc[5] == 12.5
+
+
+def test_parse_numeric_coerces_unparseable_text():
+    parsed = parse_numeric(pd.Series(["1", "2.5", "x", None], dtype=object))
+
+    assert parsed.iloc[:2].tolist() == [1.0, 2.5]
+    assert parsed.iloc[2:].isna().all()
+
+
+def test_parse_datetime_uniform_offset_matches_per_element_parse():
+    values = pd.Series(["2024-01-15T10:30:00.123+05:30", "2024-01-16T00:00:00+05:30", None], dtype=object)
+
+    parsed = parse_datetime(values)
+
+    assert parsed.tolist()[:2] == [pd.Timestamp("2024-01-15T05:00:00.123Z"), pd.Timestamp("2024-01-15T18:30:00Z")]
+    assert pd.isna(parsed.iloc[2])
+    assert str(parsed.dt.tz) == "UTC"
+
+
+def test_parse_datetime_mixed_offsets():
+    parsed = parse_datetime(pd.Series(["2024-01-15T10:30:00+05:30", "2024-01-15T05:00:00Z", "garbage"]))
+
+    assert parsed.iloc[0] == parsed.iloc[1] == pd.Timestamp("2024-01-15T05:00:00Z")
+    assert pd.isna(parsed.iloc[2])
+
+
+def test_parse_boolean_strings():
+    parsed = parse_boolean(pd.Series(["true", " False ", 1, None], dtype=object))
+
+    assert parsed.dtype == "boolean"
+    assert parsed.iloc[:3].tolist() == [True, False, True]
+    assert pd.isna(parsed.iloc[3])
+
+
+@pytest.mark.parametrize("values, dtype", [([1, 2], "int16"), ([1, None], "Int16"), ([1.5, 2], "float64")])
+def test_integer_fields(values, dtype):
+    assert str(apply_field(pd.Series(values), Field("int16")).dtype) == dtype
+
+
+def test_non_nullable_field_is_default_filled():
+    field = Field("category", parser="category", nullable=False, default="Unknown")
+
+    typed = apply_field(pd.Series(["Physics", None]), field)
+
+    assert typed.tolist() == ["Physics", "Unknown"]
+    assert typed.dtype == "category"
+
+
+def test_apply_schema_types_columns_and_keeps_input():
+    raw = pd.DataFrame({
+        "id": ["1", "2"],
+        "accuracy": ["90 %", "45%"],
+        "submitted_at": ["2024-01-15T10:30:00+05:30", None],
+        "response_map": [{"1": 2}, {}],
+        "topic": [None, "Physics"],
+    })
+    report = {}
+
+    typed = apply_schema(raw, SUBMISSION_SCHEMA, report)
+
+    assert list(typed.columns) == ["id", "accuracy", "submitted_at", "response_map", "topic", "accuracy_percentage"]
+    assert typed["id"].dtype == "int64"
+    assert typed["accuracy_percentage"].dtype == "float32"
+    assert typed["accuracy_percentage"].tolist() == [90.0, 45.0]
+    assert typed["topic"].tolist() == ["Unknown", "Physics"]
+    assert typed["response_map"].tolist() == [{"1": 2}, {}]
+    assert raw["id"].tolist() == ["1", "2"]
+    assert set(report) == {"id", "submitted_at", "topic"}
+
+
+def test_apply_schema_leaves_a_failing_column_untouched(monkeypatch):
+    import data.schema as schema_module
+
+    def fail(values):
+        raise RuntimeError("boom")
+
+    monkeypatch.setitem(schema_module.PARSERS, "boolean", fail)
+    raw = pd.DataFrame({"flag": ["true"], "score": ["3"]})
+
+    typed = apply_schema(raw, {"flag": Field(None, parser="boolean"), "score": Field("float32")})
+
+    assert typed["flag"].tolist() == ["true"]
+    assert typed["score"].tolist() == [3.0]
@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+from analysis.pipeline import AnalysisPipeline
+from benchmarks.synthetic_data import generate_current_submission, generate_quiz_endpoint, generate_submissions
+from data.fetch_data import payloads_to_frames
+from data.preprocess_data import preprocess_all_data
+from data.snapshot import FRAME_NAMES, load_snapshot, save_snapshot
+
+
+@pytest.fixture(scope="module")
+def payloads():
+    return generate_quiz_endpoint(), generate_current_submission(), generate_submissions(1000, n_users=30)
+
+
+@pytest.fixture
+def snapshot_dir(payloads, tmp_path):
+    frames = preprocess_all_data(*payloads_to_frames(*payloads))
+    save_snapshot(dict(zip(FRAME_NAMES, frames)), str(tmp_path))
+    return str(tmp_path)
+
+
+def test_flattened_quiz_column_is_not_stored(snapshot_dir):
+    frames = load_snapshot(snapshot_dir, decode_json=False)
+
+    historical = frames["historical_quiz"]
+    assert "quiz" not in historical.columns
+    assert {"topic", "difficulty_level", "quiz_id"} <= set(historical.columns)
+    # Nested values without flattened columns are kept as JSON text until read
+    assert isinstance(historical["response_map"].iloc[0], str)
+    assert isinstance(frames["quiz"]["quiz"].iloc[0], str)
+
+
+def test_pipeline_on_snapshot_matches_fetched_data(payloads, snapshot_dir):
+    fetched = AnalysisPipeline(fetcher=lambda: payloads_to_frames(*payloads)).run()
+    snapshot = AnalysisPipeline(snapshot_dir=snapshot_dir).run()
+
+    pd.testing.assert_frame_equal(
+        snapshot["item_analysis"]["item_statistics"], fetched["item_analysis"]["item_statistics"])
+    assert snapshot["recommendations"] == fetched["recommendations"]
@@ -0,0 +1,12 @@
+import pytest
+
+from benchmarks.startup_profile import DEFAULT_BUDGET_SECONDS, DEFAULT_MODULES, format_profile, profile_import
+
+
+@pytest.mark.parametrize("module", DEFAULT_MODULES)
+def test_cold_import_within_budget(module):
+    # Each run imports the module in a fresh interpreter
+    profile = profile_import(module)
+
+    assert profile["heavy_modules"] == [], format_profile(module, profile)
+    assert profile["total_seconds"] <= DEFAULT_BUDGET_SECONDS, format_profile(module, profile)
@@ -0,0 +1,264 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from monitoring.metrics import stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Kept in sync with generate_charts.CHART_TYPES; duplicated so the API does not import matplotlib
+CHART_TYPES = [
+    'performance_summary',
+    'accuracy_trend',
+    'speed_vs_accuracy',
+    'mistakes_distribution',
+    'topic_accuracy',
+    'difficulty_performance',
+    'improvement_trends',
+]
+
+# Worker processes used for rendering; 0 renders on the calling thread instead
+CHART_WORKERS = int(os.environ.get("QUIZ_CHART_WORKERS", "2"))
+MAX_CACHED_CHARTS = 64
+
+# Large-N rendering: above these sizes charts are drawn from reduced data
+MAX_TREND_POINTS = 2000
+MAX_SCATTER_POINTS = 5000
+SCATTER_BINS = 60
+MISTAKE_BINS = 10
+
+
+def chart_etag(fingerprint, chart_type):
+    """
+    Strong ETag for a chart: it only depends on the data fingerprint and the chart type,
+    so conditional requests can be answered without rendering anything.
+    """
+    return hashlib.sha256(f"{fingerprint}:{chart_type}".encode("utf-8")).hexdigest()[:32]
+
+
+def _numeric(values):
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=float)
+
+
+def _datetimes(values):
+    # Naive UTC datetime64 values sort and pickle cheaply, unlike tz-aware objects
+    return pd.to_datetime(values, utc=True).dt.tz_convert(None).to_numpy()
+
+
+def downsample_minmax(values, max_points=MAX_TREND_POINTS):
+    """
+    Pick indices that preserve the visual shape of a line with at most ~max_points points.
+    Keeps the first and last point plus the min and max of each equal-width bucket,
+    so spikes and dips survive (unlike plain striding).
+    :param values: np.ndarray - Series values in plotting order.
+    :param max_points: int - Target number of points.
+    :return: np.ndarray - Sorted indices into values.
+    """
+    n = len(values)
+    if n <= max_points or n < 3:
+        return np.arange(n)
+
+    inner = np.asarray(values[1:-1], dtype=float)
+    m = len(inner)
+    buckets = max(1, (max_points - 2) // 2)
+    size = -(-m // buckets)
+    missing = np.isnan(inner)
+
+    low = np.full(buckets * size, np.inf)
+    low[:m] = np.where(missing, np.inf, inner)
+    high = np.full(buckets * size, -np.inf)
+    high[:m] = np.where(missing, -np.inf, inner)
+
+    offsets = np.arange(buckets) * size
+    picks = np.concatenate([
+        low.reshape(buckets, size).argmin(axis=1) + offsets,
+        high.reshape(buckets, size).argmax(axis=1) + offsets,
+    ])
+    picks = picks[picks < m] + 1
+    return np.unique(np.concatenate([[0], picks, [n - 1]]))
+
+
+def reduce_chart_data(data, max_points=MAX_TREND_POINTS, max_scatter_points=MAX_SCATTER_POINTS):
+    """
+    Replace raw arrays with compact equivalents so render time stays flat as N grows:
+    the trend is min/max downsampled, the scatter becomes a 2D histogram and the
+    mistakes histogram is reduced to bin counts.
+    :param data: dict - Output of chart_data before reduction; not modified.
+    :return: dict - Data render_chart can draw directly.
+    """
+    data = dict(data)
+    accuracy = data.get('accuracy_percentage')
+
+    if 'speed' in data:
+        speed = data.pop('speed')
+        if len(speed) > max_scatter_points:
+            valid = ~(np.isnan(speed) | np.isnan(accuracy))
+            data['speed_accuracy_hist'] = np.histogram2d(speed[valid], accuracy[valid], bins=SCATTER_BINS)
+        else:
+            data['scatter'] = (speed, accuracy)
+
+    if 'incorrect_answers' in data:
+        mistakes = data.pop('incorrect_answers')
+        counts, edges = np.histogram(mistakes[~np.isnan(mistakes)], bins=MISTAKE_BINS)
+        data['mistake_hist'] = (counts, edges)
+
+    if 'submitted_at' in data and len(data['submitted_at']) > max_points:
+        keep = downsample_minmax(accuracy, max_points)
+        for key in ('submitted_at', 'accuracy_percentage', 'cumulative_accuracy'):
+            if key in data:
+                data[key] = data[key][keep]
+    return data
+
+
+def chart_data(chart_type, historical_df, analysis_results):
+    """
+    Extract the plain arrays a chart needs, so only those are sent to a worker process.
+    :param chart_type: str - One of CHART_TYPES.
+    :param historical_df: pd.DataFrame - Preprocessed historical quiz data.
+    :param analysis_results: dict - Output of analyze_all.
+    :return: dict - Picklable arrays keyed by what render_chart expects, reduced for large N.
+    """
+    if chart_type in ('topic_accuracy', 'difficulty_performance'):
+        report = analysis_results.get(chart_type)
+        if report is None or report.empty:
+            raise ValueError(f"No data available for {chart_type}")
+        label_column = 'topic' if chart_type == 'topic_accuracy' else 'difficulty_level'
+        return {
+            'labels': report[label_column].astype(str).tolist(),
+            'values': _numeric(report['average_accuracy']),
+        }
+
+    if chart_type == 'improvement_trends':
+        trends = analysis_results.get('improvement_trends')
+        if trends is None or trends.empty:
+            raise ValueError("No data available for improvement_trends")
+        return reduce_chart_data({
+            'submitted_at': _datetimes(trends['submitted_at']),
+            'accuracy_percentage': _numeric(trends['accuracy_percentage']),
+            'cumulative_accuracy': _numeric(trends['cumulative_accuracy']),
+        })
+
+    if historical_df is None or historical_df.empty:
+        raise ValueError(f"No data available for {chart_type}")
+
+    data = {'accuracy_percentage': _numeric(historical_df['accuracy_percentage'])}
+    if chart_type in ('performance_summary', 'speed_vs_accuracy'):
+        data['speed'] = _numeric(historical_df['speed'])
+    if chart_type in ('performance_summary', 'mistakes_distribution'):
+        data['incorrect_answers'] = _numeric(historical_df['incorrect_answers'])
+    if chart_type in ('performance_summary', 'accuracy_trend'):
+        # Chronological order without sorting the shared frame; only the trend needs it,
+        # and parsing timestamps is the most expensive step, so scatter/histogram skip it
+        submitted_at = _datetimes(historical_df['submitted_at'])
+        order = np.argsort(submitted_at, kind='stable')
+        data = {key: values[order] for key, values in data.items()}
+        data['submitted_at'] = submitted_at[order]
+    return reduce_chart_data(data)
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _render_in_worker(chart_type, data):
+    # Imported here so only the worker processes load matplotlib
+    from visualizations.generate_charts import render_chart
+
+    return render_chart(chart_type, data)
+
+
+class ChartService:
+    """
+    Renders charts on demand in a headless worker pool and caches the PNGs
+    by (data fingerprint, chart type). Concurrent requests for the same
+    chart share one render.
+    """
+
+    def __init__(self, workers=CHART_WORKERS, max_cached=MAX_CACHED_CHARTS):
+        self.workers = workers
+        self.max_cached = max_cached
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def get_chart(self, fingerprint, chart_type, data_loader):
+        """
+        Return PNG bytes for a chart, rendering it only if it is not cached.
+        :param fingerprint: str - Fingerprint of the data the chart is drawn from.
+        :param chart_type: str - One of CHART_TYPES.
+        :param data_loader: callable - Returns chart_data(...) output; only called on a cache miss.
+        :return: bytes - PNG image.
+        """
+        if chart_type not in CHART_TYPES:
+            raise ValueError(f"Unknown chart type: {chart_type}")
+
+        key = (fingerprint, chart_type)
+        with self._lock:
+            future = self._cache.get(key)
+            if future is not None:
+                # Cached, or being rendered by another request: share its result
+                self._cache.move_to_end(key)
+                owner = False
+            else:
+                future = Future()
+                self._cache[key] = future
+                while len(self._cache) > self.max_cached:
+                    self._cache.popitem(last=False)
+                owner = True
+        if not owner:
+            return future.result()
+
+        try:
+            with stage_timer("render_chart"):
+                data = data_loader()
+                if self.workers > 0:
+                    png = self._get_executor().submit(_render_in_worker, chart_type, data).result()
+                else:
+                    _init_worker()
+                    png = _render_in_worker(chart_type, data)
+            future.set_result(png)
+            logger.info(f"Rendered chart '{chart_type}' ({len(png)} bytes)")
+        except Exception as e:
+            with self._lock:
+                self._cache.pop(key, None)
+            future.set_exception(e)
+        return future.result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+
+_chart_service = None
+_chart_service_lock = threading.Lock()
+
+
+def get_chart_service():
+    """
+    Return the process-wide chart service used by the API.
+    """
+    global _chart_service
+    with _chart_service_lock:
+        if _chart_service is None:
+            _chart_service = ChartService()
+        return _chart_service
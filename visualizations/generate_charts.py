@@ -1,60 +1,206 @@
 import matplotlib.pyplot as plt
-import seaborn as sns
 import pandas as pd
+import io
+import multiprocessing
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 # Add project root to Python path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from data.fetch_data import fetch_all_data
-from data.preprocess_data import preprocess_all_data
-
-# Create a directory for saving visualizations
+# Directory for saving visualizations; created when something is written to it
 OUTPUT_DIR = "visualizations/output_visuals"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-def generate_performance_visualizations(historical_df):
+# Above this many submissions, charts are drawn from reduced data
+LARGE_N_THRESHOLD = 5000
+
+# Chart types that can be rendered on their own (see render_chart)
+CHART_TYPES = [
+    'performance_summary',
+    'accuracy_trend',
+    'speed_vs_accuracy',
+    'mistakes_distribution',
+    'topic_accuracy',
+    'difficulty_performance',
+    'improvement_trends',
+]
+
+def _draw_accuracy_trend(ax, submitted_at, accuracy):
+    ax.plot(submitted_at, accuracy)
+    ax.set_title('Accuracy Trend Over Time')
+    ax.tick_params(axis='x', labelrotation=45)
+
+def _draw_speed_vs_accuracy(ax, speed, accuracy):
+    ax.scatter(speed, accuracy)
+    ax.set_title('Speed vs Accuracy')
+
+def _draw_speed_vs_accuracy_density(ax, counts, speed_edges, accuracy_edges):
+    # Binned version of the scatter for large N: one cell per bin instead of one marker per row
+    mesh = ax.pcolormesh(speed_edges, accuracy_edges, counts.T, cmap='Blues')
+    ax.figure.colorbar(mesh, ax=ax, label='Submissions')
+    ax.set_title('Speed vs Accuracy')
+
+def _draw_mistakes_distribution(ax, incorrect_answers):
+    ax.hist(incorrect_answers, bins=10)
+    ax.set_title('Distribution of Mistakes')
+
+def _draw_mistakes_counts(ax, counts, edges):
+    # Same histogram drawn from precomputed bin counts
+    ax.hist(edges[:-1], bins=edges, weights=counts)
+    ax.set_title('Distribution of Mistakes')
+
+def _draw_scatter_panel(ax, data):
+    if 'speed_accuracy_hist' in data:
+        _draw_speed_vs_accuracy_density(ax, *data['speed_accuracy_hist'])
+    elif 'scatter' in data:
+        _draw_speed_vs_accuracy(ax, *data['scatter'])
+    else:
+        _draw_speed_vs_accuracy(ax, data['speed'], data['accuracy_percentage'])
+
+def _draw_mistakes_panel(ax, data):
+    if 'mistake_hist' in data:
+        _draw_mistakes_counts(ax, *data['mistake_hist'])
+    else:
+        _draw_mistakes_distribution(ax, data['incorrect_answers'])
+
+def _draw_bar_report(ax, labels, values, title):
+    ax.barh(labels, values)
+    ax.set_xlim(0, 100)
+    ax.set_xlabel('Average Accuracy (%)')
+    ax.set_title(title)
+
+def _draw_improvement_trends(ax, submitted_at, accuracy, cumulative_accuracy):
+    ax.plot(submitted_at, accuracy, alpha=0.4, label='Accuracy')
+    ax.plot(submitted_at, cumulative_accuracy, label='Cumulative Accuracy')
+    ax.set_title('Improvement Trend')
+    ax.tick_params(axis='x', labelrotation=45)
+    ax.legend()
+
+def render_chart(chart_type, data):
+    """
+    Render one chart to PNG bytes.
+    :param chart_type: str - One of CHART_TYPES.
+    :param data: dict - Plain arrays for the chart, as built by visualizations.chart_service.chart_data.
+    :return: bytes - PNG image.
+    """
+    if chart_type not in CHART_TYPES:
+        raise ValueError(f"Unknown chart type: {chart_type}")
+
+    if chart_type == 'performance_summary':
+        fig, axes = plt.subplots(1, 3, figsize=(15, 5))
+        _draw_accuracy_trend(axes[0], data['submitted_at'], data['accuracy_percentage'])
+        _draw_scatter_panel(axes[1], data)
+        _draw_mistakes_panel(axes[2], data)
+    else:
+        fig, ax = plt.subplots(figsize=(7, 5))
+        if chart_type == 'accuracy_trend':
+            _draw_accuracy_trend(ax, data['submitted_at'], data['accuracy_percentage'])
+        elif chart_type == 'speed_vs_accuracy':
+            _draw_scatter_panel(ax, data)
+        elif chart_type == 'mistakes_distribution':
+            _draw_mistakes_panel(ax, data)
+        elif chart_type == 'topic_accuracy':
+            _draw_bar_report(ax, data['labels'], data['values'], 'Topic-wise Accuracy')
+        elif chart_type == 'difficulty_performance':
+            _draw_bar_report(ax, data['labels'], data['values'], 'Accuracy by Difficulty Level')
+        elif chart_type == 'improvement_trends':
+            _draw_improvement_trends(ax, data['submitted_at'], data['accuracy_percentage'],
+                                     data['cumulative_accuracy'])
+
+    try:
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png')
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+def _render_to_file(chart_type, data, output_path):
+    with open(output_path, 'wb') as f:
+        f.write(render_chart(chart_type, data))
+    return output_path
+
+def generate_large_n_visualizations(historical_df, parallel=False, workers=None):
+    """
+    Large-N rendering mode: each chart is drawn from reduced data (downsampled trend,
+    binned scatter, precomputed histogram counts) as its own figure, optionally in parallel.
+    :param historical_df: pd.DataFrame - Preprocessed historical quiz data; not modified.
+    :param parallel: bool - Render the figures in separate worker processes (worth it once
+        rendering, not process start-up, dominates).
+    :param workers: int - Worker process count; defaults to one per chart.
+    :return: list - Paths of the written PNG files.
+    """
+    from visualizations.chart_service import chart_data
+
+    # One extraction pass serves all three charts; each worker only receives the reduced arrays
+    data = chart_data('performance_summary', historical_df, {})
+    charts = ['accuracy_trend', 'speed_vs_accuracy', 'mistakes_distribution']
+    jobs = [(chart_type, data, os.path.join(OUTPUT_DIR, f'{chart_type}.png')) for chart_type in charts]
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+    if not parallel:
+        paths = [_render_to_file(*job) for job in jobs]
+    else:
+        from visualizations.chart_service import _init_worker
+
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers or len(jobs), mp_context=context,
+                                 initializer=_init_worker) as executor:
+            paths = list(executor.map(_render_to_file, *zip(*jobs)))
+
+    for path in paths:
+        print(f"Visualizations saved to: {path}")
+    return paths
+
+def generate_performance_visualizations(historical_df, large_n_threshold=LARGE_N_THRESHOLD):
     """Generate basic performance visualizations."""
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
     
+    # Very large histories are reduced before plotting so render time stays flat
+    if historical_df is not None and len(historical_df) > large_n_threshold:
+        from visualizations.chart_service import chart_data
+        try:
+            output_path = os.path.join(OUTPUT_DIR, 'performance_summary.png')
+            with open(output_path, 'wb') as f:
+                f.write(render_chart('performance_summary', chart_data('performance_summary', historical_df, {})))
+            print(f"Visualizations saved to: {output_path}")
+        except Exception as e:
+            print(f"Error generating visualizations: {e}")
+        return
+
     # Set basic style instead of seaborn
     plt.style.use('default')
     
     # Create figure with multiple subplots (now 1x3 instead of 2x2)
-    fig = plt.figure(figsize=(15, 5))
+    fig, axes = plt.subplots(1, 3, figsize=(15, 5))
     
     try:
         # 1. Accuracy Trend
-        plt.subplot(1, 3, 1)
-        historical_df['submitted_at'] = pd.to_datetime(historical_df['submitted_at'])
-        plt.plot(historical_df['submitted_at'], historical_df['accuracy_percentage'])
-        plt.title('Accuracy Trend Over Time')
-        plt.xticks(rotation=45)
+        submitted_at = pd.to_datetime(historical_df['submitted_at'])
+        _draw_accuracy_trend(axes[0], submitted_at, historical_df['accuracy_percentage'])
         
         # 2. Speed vs Accuracy (moved to middle)
-        plt.subplot(1, 3, 2)
-        plt.scatter(historical_df['speed'], historical_df['accuracy_percentage'])
-        plt.title('Speed vs Accuracy')
+        _draw_speed_vs_accuracy(axes[1], historical_df['speed'], historical_df['accuracy_percentage'])
         
         # 3. Mistakes Distribution (moved to right)
-        plt.subplot(1, 3, 3)
-        plt.hist(historical_df['incorrect_answers'], bins=10)
-        plt.title('Distribution of Mistakes')
+        _draw_mistakes_distribution(axes[2], historical_df['incorrect_answers'])
         
-        plt.tight_layout()
+        fig.tight_layout()
         output_path = os.path.join(OUTPUT_DIR, 'performance_summary.png')
-        plt.savefig(output_path)
-        plt.close()
+        fig.savefig(output_path)
+        plt.close(fig)
         print(f"Visualizations saved to: {output_path}")
         
     except Exception as e:
         print(f"Error generating visualizations: {e}")
-        plt.close()
+        plt.close(fig)
 
 def save_text_report(analysis_results, filepath='visualizations/output_visuals/report.txt'):
     """Save analysis results as a formatted text file."""
     try:
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
         with open(filepath, 'w') as f:
             f.write("QUIZ PERFORMANCE ANALYSIS REPORT\n")
             f.write("=" * 30 + "\n\n")
@@ -80,6 +226,9 @@ def save_text_report(analysis_results, filepath='visualizations/output_visuals/r
         print(f"Error saving report: {e}")
 
 def main():
+    from data.fetch_data import fetch_all_data
+    from data.preprocess_data import preprocess_all_data
+
     try:
         # Fetch and process data
         quiz_df, current_df, historical_df = fetch_all_data()